@@ -1,22 +1,34 @@
+import argparse
 import asyncio
+from typing import Optional
 from src.core.conversation_coordinator import ConversationCoordinator
-from src.agents.vision_agent import VisionAgent
-from src.agents.background_agent import BackgroundAgent
+from src.utils.claude_client import close_shared_http_client
+from src.agents.vision_principal import VisionPrincipal
+from src.agents.background_principal import BackgroundPrincipal
+from src.agents.financial_principal import FinancialPrincipal
 
-async def main():
+async def main(resume: Optional[str] = None):
     # Initialize the conversation coordinator
     coordinator = ConversationCoordinator()
+    if resume:
+        # Only the interview questions and steps missing from the journal are run
+        coordinator.resume(resume)
     
-    # Add principals (agents)
-    vision_agent = VisionAgent("Vision Principal")
-    background_agent = BackgroundAgent("Background Principal")
-    
-    coordinator.add_principal(vision_agent)
-    coordinator.add_principal(background_agent)
+    # Add principals
+    coordinator.add_principal(VisionPrincipal())
+    coordinator.add_principal(BackgroundPrincipal())
+    coordinator.add_principal(FinancialPrincipal())
     
     # Start the conversation
-    await coordinator.start_conversation()
+    try:
+        await coordinator.start_conversation()
+    finally:
+        await close_shared_http_client()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Principals Network career planning session")
+    parser.add_argument("--resume", metavar="SESSION_ID", help="Continue an interrupted session from its journal")
+    args = parser.parse_args()
+
     # Run the async main function
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main(args.resume)) 
\ No newline at end of file
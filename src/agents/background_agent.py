@@ -1,13 +1,13 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from src.agents.base_agent import BaseAgent
 from src.utils.claude_client import ClaudeClient
+from src.utils.prompt_cache import cached_context_message, format_session_context
 import json
 import logging
 
 class BackgroundPrincipal(BaseAgent):
-    def __init__(self):
-        super().__init__("Background Principal")
-        self.claude = ClaudeClient()
+    def __init__(self, claude: Optional[ClaudeClient] = None):
+        super().__init__("Background Principal", claude)
         self.system_prompt = """You are a Background Principal at Principals Network, 
         specializing in analyzing skills, experience, and qualifications. Your expertise includes:
         - Skills assessment and gap analysis
@@ -22,12 +22,10 @@ class BackgroundPrincipal(BaseAgent):
         conversation_history = data.get("conversation_history", [])
         user_info = data.get("user_info", {})
         
+        shared_context = data.get("shared_context") or format_session_context(user_info, conversation_history)
         prompt = f"""
-        Based on this user information and conversation history:
-        User Info: {json.dumps(user_info, indent=2)}
-        Conversation: {json.dumps(conversation_history, indent=2)}
-        
-        Provide a comprehensive background analysis in this exact JSON format:
+        Based on the user information and conversation history above, provide a comprehensive
+        background analysis in this exact JSON format:
         {{
             "skills_assessment": [
                 {{
@@ -59,7 +57,9 @@ class BackgroundPrincipal(BaseAgent):
         
         try:
             response = await self.claude.get_response(
-                messages=[{"role": "user", "content": prompt}]
+                messages=[cached_context_message([shared_context], prompt)],
+                call_site="BackgroundPrincipal.analyze",
+                system=self.system_prompt
             )
             return json.loads(response)
         except Exception as e:
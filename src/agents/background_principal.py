@@ -1,13 +1,21 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from src.agents.base_agent import BaseAgent
+from src.utils.claude_client import ClaudeClient
 import logging
 
 class BackgroundPrincipal(BaseAgent):
     """Background Principal specializes in analyzing experience and skills"""
     
-    def __init__(self, name: str = "Background Principal"):
-        super().__init__(name)
+    def __init__(self, name: str = "Background Principal", claude: Optional[ClaudeClient] = None):
+        super().__init__(name, claude)
         self.logger = logging.getLogger(__name__)
+        self.system_prompt = """You are the Background Principal at Principals Network,
+        specializing in analyzing skills, experience, and qualifications. Your expertise includes:
+        - Skills assessment and gap analysis
+        - Experience evaluation
+        - Educational background analysis
+        - Professional development planning
+        """
         
     def _get_agent_specialties(self) -> Dict[str, str]:
         """Get agent's areas of specialty"""
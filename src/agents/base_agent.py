@@ -1,18 +1,24 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from abc import ABC, abstractmethod
 import logging
 from datetime import datetime
 import json
 from src.utils.claude_client import ClaudeClient
+from src.utils.client_registry import get_claude_client
+from src.utils.usage_ledger import usage_context
+from src.utils.prompt_cache import cached_context_message, format_session_context
 
 class BaseAgent(ABC):
     """Base class for all principal agents"""
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, claude: Optional[ClaudeClient] = None):
         self.name = name
         self.logger = logging.getLogger(__name__)
         self.conversation_history = []
-        self.claude = ClaudeClient()
+        # Agents share one client (and its connection pool) unless given their own
+        self.claude = claude or get_claude_client()
+        # Subclasses set this; it is sent as the cached `system` prompt
+        self.system_prompt = None
         
     @abstractmethod
     def _get_agent_specialties(self) -> Dict[str, str]:
@@ -21,23 +27,17 @@ class BaseAgent(ABC):
         
     async def analyze(self, context: Dict) -> Dict:
         """Analyze the conversation context and provide insights"""
+        # Profile and transcript go first as a prefix cached across principals
+        shared_context = context.get('shared_context') or format_session_context(
+            context['user_info'], context['conversation_history']
+        )
         prompt = f"""
-        As {self.name}, analyze this career conversation:
-        
-        Basic Information:
-        - Name: {context['user_info'].get('name')}
-        - Current Role: {context['user_info'].get('current_role')}
-        - Experience: {context['user_info'].get('experience_years')} years
-        - Education: {context['user_info'].get('education')}
-        - Industry: {context['user_info'].get('industry')}
+        As {self.name}, analyze the career conversation above.
         
         {context.get('career_vision_summary', 'Career Vision not yet discussed')}
         
         Total Responses: {context.get('response_count', 0)}
         
-        Conversation History:
-        {json.dumps(context['conversation_history'], indent=2)}
-        
         Provide a structured analysis focusing on:
         1. Career Vision Analysis
            - Clarity of goals
@@ -61,9 +61,12 @@ class BaseAgent(ABC):
         """
         
         try:
-            response = await self.claude.get_response(
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with usage_context(principal=self.name):
+                response = await self.claude.get_response(
+                    messages=[cached_context_message([shared_context], prompt)],
+                    call_site="BaseAgent.analyze",
+                    system=self.system_prompt
+                )
             return json.loads(response)
         except Exception as e:
             self.logger.error(f"Error in analysis: {e}")
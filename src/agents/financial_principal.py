@@ -1,13 +1,16 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from src.agents.base_agent import BaseAgent
+from src.utils.claude_client import ClaudeClient
+import hashlib
+import json
 import logging
 from datetime import datetime
 
 class FinancialPrincipal(BaseAgent):
     """Financial Principal specializes in PNET token distribution and educational investment planning"""
     
-    def __init__(self, name: str = "Financial Principal"):
-        super().__init__(name)
+    def __init__(self, name: str = "Financial Principal", claude: Optional[ClaudeClient] = None):
+        super().__init__(name, claude)
         self.logger = logging.getLogger(__name__)
         self.wallet_balance = 1000000  # Initial PNET token balance
         self.token_symbol = "PNET"
@@ -104,9 +107,13 @@ class FinancialPrincipal(BaseAgent):
     def _generate_user_wallet(self, user_info: Dict) -> Dict:
         """Generate a user wallet with unique identifier"""
         # In production, this would integrate with actual blockchain wallet creation
-        user_id = hash(f"{user_info.get('name', 'user')}_{datetime.now().isoformat()}")
+        # Derived from the profile alone, so the same user keeps the same wallet across sessions
+        profile = json.dumps(
+            {key: user_info.get(key) for key in ("name", "current_role", "industry", "education")}, sort_keys=True
+        )
+        user_id = hashlib.sha256(profile.encode("utf-8")).hexdigest()[:16]
         return {
-            "wallet_id": f"PN{user_id:x}",
+            "wallet_id": f"PN{user_id}",
             "network": "Principals Network",
             "token_symbol": self.token_symbol,
             "status": "active"
@@ -1,13 +1,12 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from src.agents.base_agent import BaseAgent
 from src.utils.claude_client import ClaudeClient
 import json
 import logging
 
 class VisionPrincipal(BaseAgent):
-    def __init__(self):
-        super().__init__("Vision Principal")
-        self.claude = ClaudeClient()
+    def __init__(self, claude: Optional[ClaudeClient] = None):
+        super().__init__("Vision Principal", claude)
         self.system_prompt = """You are a Vision Principal at Principals Network, 
         specializing in understanding and shaping career aspirations. Your expertise includes:
         - Long-term career vision development
@@ -77,7 +76,9 @@ class VisionPrincipal(BaseAgent):
         
         try:
             response = await self.claude.get_response(
-                messages=[{"role": "user", "content": prompt}]
+                messages=[{"role": "user", "content": prompt}],
+                call_site="VisionPrincipal.analyze",
+                system=self.system_prompt
             )
             return json.loads(response)
         except Exception as e:
@@ -113,7 +114,9 @@ class VisionPrincipal(BaseAgent):
         
         try:
             analysis = await self.claude.get_response(
-                messages=[{"role": "user", "content": prompt}]
+                messages=[{"role": "user", "content": prompt}],
+                call_site="VisionPrincipal._update_user_profile",
+                system=self.system_prompt
             )
             # Parse the JSON response
             parsed_analysis = json.loads(analysis)
@@ -136,7 +139,9 @@ class VisionPrincipal(BaseAgent):
 
         try:
             return await self.claude.get_response(
-                messages=self.conversation_messages + [{"role": "user", "content": prompt}]
+                messages=self.conversation_messages + [{"role": "user", "content": prompt}],
+                call_site="VisionPrincipal._generate_vision_summary",
+                system=self.system_prompt
             )
         except Exception as e:
             self.logger.error(f"Error generating vision summary: {e}")
@@ -187,7 +192,9 @@ class VisionPrincipal(BaseAgent):
         
         try:
             response = await self.claude.get_response(
-                messages=[{"role": "user", "content": prompt}]
+                messages=[{"role": "user", "content": prompt}],
+                call_site="VisionPrincipal.generate_followup_questions",
+                system=self.system_prompt
             )
             questions = json.loads(response)
             return questions
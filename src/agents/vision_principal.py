@@ -1,11 +1,19 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from src.agents.base_agent import BaseAgent
+from src.utils.claude_client import ClaudeClient
 
 class VisionPrincipal(BaseAgent):
     """Vision Principal specializes in analyzing career vision and aspirations"""
     
-    def __init__(self, name: str = "Vision Principal"):
-        super().__init__(name)
+    def __init__(self, name: str = "Vision Principal", claude: Optional[ClaudeClient] = None):
+        super().__init__(name, claude)
+        self.system_prompt = """You are the Vision Principal at Principals Network,
+        specializing in understanding and shaping career aspirations. Your expertise includes:
+        - Long-term career vision development
+        - Goal alignment and strategic planning
+        - Value and motivation analysis
+        - Career trajectory optimization
+        """
         
     def _get_agent_specialties(self) -> Dict[str, str]:
         """Get agent's areas of specialty"""
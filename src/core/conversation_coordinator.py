@@ -1,47 +1,208 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from src.agents.base_agent import BaseAgent
 import logging
 import json
 import asyncio
+import os
+import uuid
 from datetime import datetime
-from src.utils.response_cache import ResponseCache
+from src.core.pipeline import Pipeline
+from src.utils.response_cache import get_response_cache
+from src.utils.claude_client import ClaudeClient, normalize_prompt
+from src.utils.client_registry import get_claude_client
+from src.utils.log_config import configure_logging
+from src.utils.metrics import get_metrics
+from src.utils.tracing import traced, get_tracer, export_session_trace
+from src.utils.memoization import get_memoizer, format_savings
+from src.utils.session_journal import SessionJournal
+from src.utils.usage_ledger import usage_context, get_usage_ledger
+from src.utils.token_budget import context_field
+from src.utils.prompt_cache import cached_context_message, format_session_context, without_volatile_fields
+
+# Shared by every coordinator call so they all hit the same cached prefix
+COORDINATOR_SYSTEM_PROMPT = """You are the coordinator of the Principals Network, a team of AI principals
+specializing in career development and guidance. You facilitate the principals' analyses, discussions and
+consensus, and turn them into clear, specific and actionable career guidance grounded in the user's own
+profile and interview responses."""
+
+# Bump whenever the personalized response prompt changes, so cached responses to the old one are not reused
+PERSONALIZED_RESPONSE_PROMPT_VERSION = "1"
+
+# Basic information gathered before the interview, in the order it is asked
+BASIC_INFO_KEYS = ["name", "current_role", "experience_years", "education", "industry"]
+
+# Core interview questions, asked in order
+INTERVIEW_SECTIONS = [
+    {
+        "title": "Career Vision",
+        "questions": [
+            "What impact would you like to make in your career?",
+            "Where do you see yourself in 5-10 years?",
+            "What excites you most about your field?"
+        ]
+    },
+    {
+        "title": "Skills & Experience",
+        "questions": [
+            "What are your key strengths and skills?",
+            "What achievements are you most proud of?",
+            "What areas would you like to develop?"
+        ]
+    },
+    {
+        "title": "Values & Preferences",
+        "questions": [
+            "What are your core values in work and life?",
+            "What type of work environment helps you thrive?",
+            "What motivates you the most?"
+        ]
+    }
+]
+
+# Independent topics: the principals discuss them concurrently
+DISCUSSION_FRAMEWORK = [
+    {
+        "topic": "Career Direction",
+        "aspects": [
+            "Long-term vision alignment",
+            "Short-term objectives",
+            "Potential challenges"
+        ]
+    },
+    {
+        "topic": "Skills Assessment",
+        "aspects": [
+            "Current capabilities",
+            "Critical gaps",
+            "Development priorities"
+        ]
+    },
+    {
+        "topic": "Market Alignment",
+        "aspects": [
+            "Industry trends",
+            "Opportunity areas",
+            "Competitive advantages"
+        ]
+    },
+    {
+        "topic": "Development Strategy",
+        "aspects": [
+            "Learning priorities",
+            "Experience building",
+            "Network development"
+        ]
+    }
+]
+
+# Independent sections: generated concurrently once the consensus is reached
+ROADMAP_SECTIONS = [
+    "Executive Summary",
+    "Career Vision & Goals",
+    "Skills Development Plan",
+    "Action Steps & Timeline",
+    "Resources & Support"
+]
+
 
 class ConversationCoordinator:
-    def __init__(self):
-        # Configure logging to write to file only
-        logging.basicConfig(
-            filename='career_planner.log',
-            level=logging.DEBUG,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
-        # Configure logging to only show errors and suppress HTTP request logs
-        logging.getLogger("httpx").setLevel(logging.WARNING)
-        logging.getLogger("anthropic").setLevel(logging.WARNING)
-        
+    def __init__(self, claude: Optional[ClaudeClient] = None):
+        # Log to the rotating file only, through the shared background listener
+        configure_logging()
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
-        
-        # Remove any existing handlers
-        for handler in self.logger.handlers[:]:
-            self.logger.removeHandler(handler)
-            
-        # Add file handler
-        file_handler = logging.FileHandler('career_planner.log')
-        file_handler.setLevel(logging.DEBUG)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
         
         self.conversation_history = []
         self.principals = {}
         self.current_context = {}
         self.user_info = {}
-        self.response_cache = ResponseCache()
+        # One cache (and its background writer) for the process, however many sessions run
+        self.response_cache = get_response_cache()
+        self.shared_context_by_phase: Dict[str, str] = {}
+        self.session_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        # Answers and completed pipeline steps, so a crashed session can be resumed
+        self.journal = SessionJournal(self.session_id)
+        self.interview_complete = False
+        self.completed_steps: Dict[str, Any] = {}
+        # Where the finished roadmap is saved; None keeps it in memory only
+        self.report_filename: Optional[str] = "career_roadmap.txt"
+        self.career_report: Optional[Dict] = None
+        self.pipeline_report = None
+        # Coordinator calls go through the same shared client as the principals
+        self.claude = claude or get_claude_client()
+        self.phase_duration = get_metrics().summary("session_phase_duration_seconds", "Wall time of each session phase")
+        # At most this many principals work on their analysis at once in this session
+        self.principal_slots = asyncio.Semaphore(int(os.getenv("PRINCIPAL_CONCURRENCY", "3")))
         
     def add_principal(self, principal: BaseAgent):
         """Add a principal to the team"""
         self.principals[principal.name] = principal
+
+    def resume(self, session_id: str):
+        """Restore an interrupted session from its journal so only the missing steps run again"""
+        journal = SessionJournal(session_id)
+        if not journal.exists():
+            raise ValueError(f"No journal for session {session_id} in {journal.journal_dir}")
+        self.session_id = session_id
+        self.journal = journal
+        for entry in journal.load():
+            event = entry["event"]
+            if event == "user_info":
+                self.user_info[entry["key"]] = entry["value"]
+            elif event == "user_info_removed":
+                self.user_info.pop(entry["key"], None)
+            elif event == "answer":
+                self.conversation_history.append(entry["entry"])
+            elif event == "interview_complete":
+                self.interview_complete = True
+            elif event == "step":
+                self.completed_steps[entry["name"]] = entry["result"]
+        if "consensus" in self.completed_steps:
+            # Roadmap sections read the consensus from the context
+            self.current_context['consensus'] = self.completed_steps["consensus"]
+        self.logger.info(
+            f"Resumed session {session_id}: {len(self.user_info)} profile answers, "
+            f"{len(self.conversation_history)} interview answers, {len(self.completed_steps)} completed steps"
+        )
+
+    def load_intake(self, profile: Dict[str, Any], answers: Any):
+        """Record a stored intake form as this session's interview, so the session runs without input()
+
+        `profile` holds the basic information answers (name, current_role,
+        experience_years, education, industry). `answers` maps interview
+        questions to responses, or lists responses in question order;
+        unanswered questions are skipped as if the user had quit.
+        """
+        missing = [key for key in BASIC_INFO_KEYS if not str(profile.get(key, "")).strip()]
+        if missing:
+            raise ValueError(f"Intake profile is missing {', '.join(missing)}")
+        # Same rule as the interactive question
+        years = str(profile["experience_years"]).strip()
+        if not (years.isdigit() and 0 <= int(years) <= 50):
+            raise ValueError(f"Intake experience_years must be a number between 0 and 50, got {years!r}")
+        profile = {**profile, "experience_years": years}
+        for key in BASIC_INFO_KEYS:
+            self.user_info[key] = str(profile[key])
+            self.journal.append("user_info", key=key, value=self.user_info[key])
+
+        questions = [(section['title'], question) for section in INTERVIEW_SECTIONS for question in section['questions']]
+        if isinstance(answers, list):
+            answers = {question: response for (_, question), response in zip(questions, answers)}
+        for title, question in questions:
+            response = answers.get(question)
+            if response is None:
+                continue
+            entry = {"phase": "interview", "section": title, "question": question, "response": str(response)}
+            self.conversation_history.append(entry)
+            self.journal.append("answer", entry=entry)
+        self.interview_complete = True
+        self.journal.append("interview_complete")
+
+    def _journal_step(self, name: str, result: Any):
+        """Record a completed pipeline step; a failed write is logged rather than failing the step"""
+        try:
+            self.journal.append("step", name=name, result=result)
+        except OSError as e:
+            self.logger.error(f"Error writing session journal {self.journal.path}: {e}")
         
     async def start_conversation(self):
         """Execute the three-phase career planning process"""
@@ -50,16 +211,40 @@ class ConversationCoordinator:
         print("Phase 1: Interview - Understanding your background and aspirations")
         print("Phase 2: Principal Discussion - Our experts analyze and discuss your profile")
         print("Phase 3: Career Roadmap - Detailed recommendations and action plan\n")
+        print(f"Session {self.session_id} (continue it later with: python main.py --resume {self.session_id})")
         
-        # Phase 1: Interview
-        await self._conduct_interview_phase()
-        
-        # Phase 2: Principal Discussion
-        await self._conduct_discussion_phase()
-        
-        # Phase 3: Generate Report
-        await self._generate_roadmap_phase()
+        try:
+            with usage_context(session=self.session_id), get_tracer().span("session", session=self.session_id):
+                # Phase 1: Interview
+                if self.interview_complete:
+                    print("\nYour interview answers are already recorded.")
+                else:
+                    with usage_context(phase="interview"), self.phase_duration.time(phase="interview"):
+                        await self._conduct_interview_phase()
+                    self.interview_complete = True
+                    self.journal.append("interview_complete")
+                
+                # Phases 2 and 3: Principal Discussion and Report, as one dependency graph
+                await self._run_planning_pipeline()
+        finally:
+            trace_path = export_session_trace(self.session_id)
+            if trace_path:
+                self.logger.info(f"Wrote session trace to {trace_path}")
+            memoizer = get_memoizer()
+            if memoizer.policy.enabled:
+                self.logger.info(f"Session {self.session_id} {format_savings(memoizer.session_savings(self.session_id))}")
+
+    def close(self):
+        """Release what the shared budget, ledger and memoizer hold for this session
+
+        Call once the session's usage has been read; a process running many
+        sessions otherwise keeps every finished session's totals.
+        """
+        self.claude.budget.reset_session(self.session_id)
+        get_usage_ledger().release_session(self.session_id)
+        get_memoizer().release_session(self.session_id)
 
+    @traced()
     async def _conduct_interview_phase(self):
         """Phase 1: Interview Phase"""
         print("\n=== Phase 1: Interview ===")
@@ -68,36 +253,20 @@ class ConversationCoordinator:
         # Gather basic information
         await self._gather_basic_info()
         
-        # Core interview questions
-        interview_sections = [
-            {
-                "title": "Career Vision",
-                "questions": [
-                    "What impact would you like to make in your career?",
-                    "Where do you see yourself in 5-10 years?",
-                    "What excites you most about your field?"
-                ]
-            },
-            {
-                "title": "Skills & Experience",
-                "questions": [
-                    "What are your key strengths and skills?",
-                    "What achievements are you most proud of?",
-                    "What areas would you like to develop?"
-                ]
-            },
-            {
-                "title": "Values & Preferences",
-                "questions": [
-                    "What are your core values in work and life?",
-                    "What type of work environment helps you thrive?",
-                    "What motivates you the most?"
-                ]
-            }
-        ]
+        interview_sections = INTERVIEW_SECTIONS
 
-        current_section_index = 0
-        current_question_index = 0
+        # A resumed session continues at the first question not answered yet
+        answered = {
+            (entry.get("section"), entry.get("question"))
+            for entry in self.conversation_history if entry.get("phase") == "interview"
+        }
+        positions = [
+            (section_index, question_index)
+            for section_index, section in enumerate(interview_sections)
+            for question_index, question in enumerate(section['questions'])
+            if (section['title'], question) not in answered
+        ]
+        current_section_index, current_question_index = positions[0] if positions else (len(interview_sections), 0)
 
         while current_section_index < len(interview_sections):
             section = interview_sections[current_section_index]
@@ -120,12 +289,14 @@ class ConversationCoordinator:
                 continue
             
             # Save response
-            self.conversation_history.append({
+            entry = {
                 "phase": "interview",
                 "section": section['title'],
                 "question": question,
                 "response": response
-            })
+            }
+            self.conversation_history.append(entry)
+            self.journal.append("answer", entry=entry)
             
             # Move to next question
             current_question_index += 1
@@ -135,23 +306,80 @@ class ConversationCoordinator:
 
         print("\nThank you for sharing. Our principals will now analyze this information.")
 
-    async def _conduct_discussion_phase(self):
-        """Phase 2: Principals' Discussion Phase"""
-        print("\n=== Phase 2: Principal Discussion ===")
-        print("Our principals will now analyze and discuss your profile.")
-        
-        # Step 1: Individual Analysis
-        analyses = await self._gather_individual_analyses()
-        
-        # Step 2: Structured Discussion
-        discussion_points = await self._conduct_structured_discussion(analyses)
-        
-        # Step 3: Consensus Building
-        consensus = await self._build_consensus(discussion_points)
-        
-        # Store consensus for roadmap generation
-        self.current_context['consensus'] = consensus
+    async def _run_planning_pipeline(self):
+        """Run the discussion and roadmap phases, logging per-node timings and the critical path"""
+        pipeline = self._build_planning_pipeline()
+        try:
+            await pipeline.run(completed=self.completed_steps, on_complete=self._journal_step)
+        finally:
+            report = self.pipeline_report = pipeline.report
+            for phase, seconds in report.phase_times().items():
+                self.phase_duration.observe(seconds, phase=phase)
+            self.logger.info(f"Planning pipeline timings:\n{report.format()}")
+
+    def _build_planning_pipeline(self) -> Pipeline:
+        """Phases 2 and 3 as a DAG: analyses -> topics -> consensus -> sections -> report -> financial
+
+        Discussion topics only depend on the analyses, and roadmap sections only
+        on the consensus, so each group runs concurrently.
+        """
+        pipeline = Pipeline()
+
+        async def analyses() -> Dict:
+            print("\n=== Phase 2: Principal Discussion ===")
+            print("Our principals will now analyze and discuss your profile.")
+            return await self._gather_individual_analyses()
+
+        pipeline.add("analyses", analyses, phase="discussion")
+
+        topics = []
+        for index, framework in enumerate(DISCUSSION_FRAMEWORK):
+            async def discuss(analyses: Dict, topic: str = framework["topic"],
+                              aspects: List[str] = framework["aspects"], first: bool = index == 0) -> Dict:
+                if first:
+                    print("\n--- Step 2: Structured Discussion ---")
+                print(f"\nDiscussing: {topic}")
+                return await self._discuss_topic(topic, aspects, analyses)
 
+            topics.append(pipeline.add(f"discuss:{framework['topic']}", discuss, ["analyses"], phase="discussion"))
+
+        async def consensus(*discussions: Dict) -> Dict:
+            discussion_points = {
+                framework["topic"]: points for framework, points in zip(DISCUSSION_FRAMEWORK, discussions)
+            }
+            consensus = await self._build_consensus(discussion_points)
+            # Store consensus for roadmap generation
+            self.current_context['consensus'] = consensus
+            return consensus
+
+        pipeline.add("consensus", consensus, topics, phase="discussion")
+
+        sections = []
+        for index, section in enumerate(ROADMAP_SECTIONS):
+            async def generate(consensus: Dict, section: str = section, first: bool = index == 0) -> str:
+                if first:
+                    print("\n=== Phase 3: Your Career Roadmap ===")
+                    print("Based on our discussion, we're creating your personalized career roadmap.")
+                    # Sections are streamed to the terminal as they are generated
+                    print("\n=== Your Personalized Career Roadmap ===")
+                return await self._generate_report_section(section)
+
+            sections.append(pipeline.add(f"section:{section}", generate, ["consensus"], phase="roadmap"))
+
+        async def save_report(*contents: str) -> Dict:
+            report = dict(zip(ROADMAP_SECTIONS, contents))
+            if self.report_filename:
+                self.save_report(report, self.report_filename)
+            self.career_report = report
+            return report
+
+        pipeline.add("report", save_report, sections, phase="roadmap")
+
+        # Financial Principal Analysis
+        pipeline.add("financial", self._conduct_financial_analysis, ["report"], phase="roadmap")
+        return pipeline
+
+    @traced()
     async def _gather_individual_analyses(self) -> Dict:
         """Each principal conducts their individual analysis"""
         print("\n--- Step 1: Individual Principal Analysis ---")
@@ -167,88 +395,69 @@ class ConversationCoordinator:
         for entry in career_vision_responses:
             vision_summary += f"\n- {entry['question']}: {entry['response']}"
         
-        for name, principal in self.principals.items():
-            print(f"\n{name} is analyzing your profile...")
+        analysis_context = {
+            "conversation_history": self.conversation_history,
+            "user_info": self.user_info,
+            "career_vision_summary": vision_summary,
+            "response_count": len(self.conversation_history),
+            "shared_context": self._get_shared_context("discussion")
+        }
+
+        async def analyze(name: str, principal: BaseAgent, output: asyncio.Queue):
+            """Analyze and present one principal's insights, queueing what to print"""
             try:
-                analysis_context = {
-                    "conversation_history": self.conversation_history,
-                    "user_info": self.user_info,
-                    "career_vision_summary": vision_summary,
-                    "response_count": len(self.conversation_history)
-                }
-                
-                analysis = await principal.analyze(analysis_context)
-                analyses[name] = analysis
-                
-                # Present initial insights
-                print(f"\n{name}'s Key Insights:")
-                await self._present_principal_insights(name, analysis)
-                
+                async with self.principal_slots:
+                    with usage_context(principal=name), get_tracer().span("principal.analyze", principal=name):
+                        analysis = await principal.analyze(analysis_context)
+                        analyses[name] = analysis
+                        
+                        # Present initial insights
+                        insights = await self._present_principal_insights(name, analysis)
+                        output.put_nowait(f"\n{name}'s Key Insights:")
+                        if insights is not None:
+                            output.put_nowait(insights)
             except Exception as e:
                 self.logger.error(f"Error in {name}'s analysis: {e}")
-        
-        return analyses
-
-    async def _conduct_structured_discussion(self, analyses: Dict) -> Dict:
-        """Facilitate structured discussion between principals"""
-        print("\n--- Step 2: Structured Discussion ---")
-        
-        discussion_framework = [
-            {
-                "topic": "Career Direction",
-                "aspects": [
-                    "Long-term vision alignment",
-                    "Short-term objectives",
-                    "Potential challenges"
-                ]
-            },
-            {
-                "topic": "Skills Assessment",
-                "aspects": [
-                    "Current capabilities",
-                    "Critical gaps",
-                    "Development priorities"
-                ]
-            },
-            {
-                "topic": "Market Alignment",
-                "aspects": [
-                    "Industry trends",
-                    "Opportunity areas",
-                    "Competitive advantages"
-                ]
-            },
-            {
-                "topic": "Development Strategy",
-                "aspects": [
-                    "Learning priorities",
-                    "Experience building",
-                    "Network development"
-                ]
-            }
+            finally:
+                output.put_nowait(None)
+
+        # Every principal works concurrently, but their output is printed in principal order
+        outputs = {name: asyncio.Queue() for name in self.principals}
+        for name in self.principals:
+            outputs[name].put_nowait(f"\n{name} is analyzing your profile...")
+        workers = [
+            asyncio.create_task(analyze(name, principal, outputs[name]), name=f"principal:{name}")
+            for name, principal in self.principals.items()
         ]
-
-        discussion_points = {}
-        for framework in discussion_framework:
-            print(f"\nDiscussing: {framework['topic']}")
-            discussion_points[framework['topic']] = await self._discuss_topic(
-                framework['topic'],
-                framework['aspects'],
-                analyses
-            )
-            
-        return discussion_points
-
+        try:
+            for name in self.principals:
+                while (line := await outputs[name].get()) is not None:
+                    print(line)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+        finally:
+            # One principal's failure is logged in its worker and never cancels the others
+            await asyncio.gather(*workers, return_exceptions=True)
+        
+        # Analyses in principal order, whatever order they finished in
+        return {name: analyses[name] for name in self.principals if name in analyses}
+
+    @traced()
     async def _discuss_topic(self, topic: str, aspects: List[str], analyses: Dict) -> Dict:
         """Facilitate discussion on a specific topic"""
-        prompt = f"""
+        # The analyses are identical for every topic, so they form a cached block ahead of the topic
+        analyses_template = """
+        Principal analyses:
+        {analyses}
+        """
+        prompt_template = """
         Topic for discussion: {topic}
         
-        Based on these principal analyses:
-        {json.dumps(analyses, indent=2)}
-        
-        Generate a focused discussion between principals addressing these aspects:
-        {json.dumps(aspects, indent=2)}
+        Based on the principal analyses above, generate a focused discussion between principals
+        addressing these aspects:
+        {aspects}
         
         Format the discussion to show:
         1. Each principal's perspective
@@ -260,23 +469,36 @@ class ConversationCoordinator:
         """
         
         try:
-            first_principal = list(self.principals.values())[0]
-            discussion = await first_principal.claude.get_response(
-                messages=[{"role": "user", "content": prompt}]
+            # Principal analyses are trimmed before the aspects if the prompt is over budget
+            shared_context = self._get_shared_context("discussion")
+            context = self._fit_prompt_context(
+                [context_field("aspects", aspects, priority=3)]
+                + [context_field(f"analysis:{name}", without_volatile_fields(analysis), priority=2)
+                   for name, analysis in analyses.items()],
+                shared_context + analyses_template + prompt_template
+            )
+            analyses_block = analyses_template.format(
+                analyses="\n".join(f"{name}: {context[f'analysis:{name}']}" for name in analyses)
+            )
+            prompt = prompt_template.format(topic=topic, aspects=context["aspects"])
+            discussion = await self._stream_to_terminal(
+                messages=[cached_context_message([shared_context, analyses_block], prompt)],
+                call_site="_discuss_topic",
+                max_tokens=1500
             )
-            print(discussion)
             return {"discussion": discussion, "aspects": aspects}
         except Exception as e:
             self.logger.error(f"Error in topic discussion: {e}")
             return {"error": str(e)}
 
+    @traced()
     async def _build_consensus(self, discussion_points: Dict) -> Dict:
         """Build consensus among principals"""
         print("\n--- Step 3: Building Consensus ---")
         
-        consensus_prompt = f"""
+        consensus_template = """
         Based on the principal discussions:
-        {json.dumps(discussion_points, indent=2)}
+        {discussions}
         
         Generate a consensus document that includes:
         
@@ -304,14 +526,22 @@ class ConversationCoordinator:
         """
         
         try:
-            first_principal = list(self.principals.values())[0]
-            consensus = await first_principal.claude.get_response(
-                messages=[{"role": "user", "content": consensus_prompt}]
+            shared_context = self._get_shared_context("discussion")
+            context = self._fit_prompt_context(
+                [context_field(topic, points, priority=2) for topic, points in discussion_points.items()],
+                shared_context + consensus_template
+            )
+            consensus_prompt = consensus_template.format(
+                discussions="\n".join(f"{topic}: {context[topic]}" for topic in discussion_points)
             )
             
             print("\nConsensus Reached:")
             print("=" * 50)
-            print(consensus)
+            consensus = await self._stream_to_terminal(
+                messages=[cached_context_message([shared_context], consensus_prompt)],
+                call_site="_build_consensus",
+                max_tokens=2500
+            )
             print("=" * 50)
             
             return {
@@ -324,11 +554,12 @@ class ConversationCoordinator:
             self.logger.error(f"Error building consensus: {e}")
             return {"error": str(e)}
 
-    async def _present_principal_insights(self, name: str, analysis: Dict):
-        """Present a principal's key insights"""
+    @traced()
+    async def _present_principal_insights(self, name: str, analysis: Dict) -> Optional[str]:
+        """Generate a principal's key insights for presentation"""
         insight_prompt = f"""
         As {name}, present your key insights from this analysis:
-        {json.dumps(analysis, indent=2)}
+        {json.dumps(without_volatile_fields(analysis), indent=2)}
         
         The user has provided specific career vision responses:
         {analysis.get('career_vision_summary', '')}
@@ -342,43 +573,22 @@ class ConversationCoordinator:
         Present in a clear, professional manner, directly referencing the user's actual responses.
         """
         
+        # The principal speaks in its own voice; its system prompt is the cached prefix of its calls
+        principal = self.principals.get(name)
+        system = getattr(principal, "system_prompt", None) or COORDINATOR_SYSTEM_PROMPT
         try:
-            first_principal = list(self.principals.values())[0]
-            insights = await first_principal.claude.get_response(
-                messages=[{"role": "user", "content": insight_prompt}]
+            insights = await self.claude.get_response(
+                messages=[cached_context_message([self._get_shared_context("discussion")], insight_prompt)],
+                call_site="_present_principal_insights",
+                system=system
             )
-            print(insights)
+            return insights
         except Exception as e:
             self.logger.error(f"Error presenting insights: {e}")
+            return None
 
-    async def _generate_roadmap_phase(self):
-        """Phase 3: Career Roadmap Generation"""
-        print("\n=== Phase 3: Your Career Roadmap ===")
-        print("Based on our discussion, we're creating your personalized career roadmap.")
-        
-        roadmap_sections = [
-            "Executive Summary",
-            "Career Vision & Goals",
-            "Skills Development Plan",
-            "Action Steps & Timeline",
-            "Resources & Support"
-        ]
-        
-        report = {}
-        for section in roadmap_sections:
-            print(f"\nGenerating {section}...")
-            report[section] = await self._generate_report_section(section)
-        
-        # Present the final roadmap
-        await self._present_career_roadmap(report)
-        
-        # Save the report
-        self.save_report(report)
-
-        # Financial Principal Analysis
-        await self._conduct_financial_analysis(report)
-
-    async def _conduct_financial_analysis(self, career_report: Dict):
+    @traced()
+    async def _conduct_financial_analysis(self, career_report: Dict) -> Optional[Dict]:
         """Phase 4: PNET Token Allocation and Educational Investment Planning"""
         print("\n=== Phase 4: Educational Investment Planning ===")
         print("Our Financial Principal will now analyze your career plan and allocate PNET tokens for your educational journey.")
@@ -403,10 +613,13 @@ class ConversationCoordinator:
             }
 
             # Get financial analysis
-            financial_analysis = await financial_principal.analyze(financial_context)
+            with usage_context(phase="financial", principal=financial_principal.name), \
+                    get_tracer().span("principal.analyze", principal=financial_principal.name):
+                financial_analysis = await financial_principal.analyze(financial_context)
 
             # Present token allocation and investment plan
             await self._present_financial_analysis(financial_analysis)
+            return financial_analysis
 
         except Exception as e:
             self.logger.error(f"Error in financial analysis: {e}")
@@ -510,8 +723,11 @@ class ConversationCoordinator:
             }
         }
         
-        current_question_index = 0
         question_keys = list(questions.keys())
+        # A resumed session continues at the first question not answered yet
+        current_question_index = next(
+            (index for index, key in enumerate(question_keys) if key not in self.user_info), len(question_keys)
+        )
         
         while current_question_index < len(questions):
             key = question_keys[current_question_index]
@@ -528,11 +744,13 @@ class ConversationCoordinator:
                         prev_key = question_keys[current_question_index]
                         if prev_key in self.user_info:
                             del self.user_info[prev_key]
+                            self.journal.append("user_info_removed", key=prev_key)
                     break
                 
                 # Validate response
                 if question_data['validation'](response):
                     self.user_info[key] = response
+                    self.journal.append("user_info", key=key, value=response)
                     
                     # For name question, use the response template
                     if key == "name":
@@ -586,8 +804,7 @@ class ConversationCoordinator:
             if key.endswith('_insight'):
                 category = key.replace('_insight', '')
                 insights[category] = {
-                    "observation": self.current_context[key],
-                    "timestamp": datetime.now().isoformat()
+                    "observation": self.current_context[key]
                 }
         return insights
 
@@ -883,56 +1100,69 @@ class ConversationCoordinator:
 
     async def _show_personalized_response(self, key: str, response: str):
         """Get personalized response from Claude based on user input"""
-        cache_key = f"{key}_{response.lower().strip()}"
-        cached_response = self.response_cache.get(cache_key)
-        
-        if cached_response:
-            print(f"\n{cached_response}.")
-            self.current_context[f"{key}_insight"] = cached_response
-            return
+        # One sentence: a small limit, and stop at the first paragraph break
+        max_tokens = 120
+        stop_sequences = ["\n\n"]
+
+        # Keyed on what the prompt is built from rather than the rendered text, so identical
+        # inputs hit whenever they are seen; the context is derived from these alone
+        cache_key = self.claude.template_cache_key(
+            "personalized_response",
+            {
+                "question_type": key,
+                "response": normalize_prompt(response),
+                "profile": self.user_info,
+                "answers": [
+                    [entry.get("section"), entry.get("question"), normalize_prompt(entry.get("response", ""))]
+                    for entry in self.conversation_history if entry.get("phase") == "interview"
+                ],
+                "insights": {k: v for k, v in self.current_context.items() if k.endswith("_insight")}
+            },
+            PERSONALIZED_RESPONSE_PROMPT_VERSION,
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences
+        )
 
-        # Build rich context
-        context = await self._build_context(key)
-        
-        prompt = f"""
-        You are a Principal at Principals Network, specializing in career development and guidance.
-        
-        Current Context:
-        {json.dumps(context, indent=2)}
-        
-        User Response: "{response}"
-        Question Type: {key}
-        
-        Based on this context, provide a personalized, insightful response that:
-        1. Shows deep understanding of the user's situation
-        2. Connects their response to broader career implications
-        3. Demonstrates expertise in career development
-        4. Provides forward-looking perspective
-        
-        Additional Guidelines:
-        - Keep response to one impactful sentence
-        - Be specific and actionable
-        - Show understanding of current market dynamics
-        - Maintain professional but encouraging tone
-        - Base insights on latest industry trends and data
-        
-        Format: Provide a single, well-crafted sentence that captures key insights and next steps.
-        """
+        async def fetch() -> str:
+            # Built only on a miss: the role context makes its own Claude call
+            context = await self._build_context(key)
+            prompt = f"""
+            You are a Principal at Principals Network, specializing in career development and guidance.
+            
+            Current Context:
+            {json.dumps(context, indent=2)}
+            
+            User Response: "{response}"
+            Question Type: {key}
+            
+            Based on this context, provide a personalized, insightful response that:
+            1. Shows deep understanding of the user's situation
+            2. Connects their response to broader career implications
+            3. Demonstrates expertise in career development
+            4. Provides forward-looking perspective
+            
+            Additional Guidelines:
+            - Keep response to one impactful sentence
+            - Be specific and actionable
+            - Show understanding of current market dynamics
+            - Maintain professional but encouraging tone
+            - Base insights on latest industry trends and data
+            
+            Format: Provide a single, well-crafted sentence that captures key insights and next steps.
+            """
+            response_text = await self.claude.get_response(
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                call_site="_show_personalized_response",
+                stop_sequences=stop_sequences
+            )
+            return response_text.strip().rstrip('.')
 
         try:
-            first_principal = list(self.principals.values())[0]
-            response_text = await first_principal.claude.get_response(
-                messages=[{
-                    "role": "user", 
-                    "content": prompt
-                }]
-            )
-            
-            cleaned_response = response_text.strip().rstrip('.')
+            # A recently expired response is shown at once and refreshed in the background
+            cleaned_response = await self.response_cache.get_or_refresh(cache_key, fetch)
             print(f"\n{cleaned_response}.")
             
-            # Cache and store the response
-            self.response_cache.set(cache_key, cleaned_response)
             self.current_context[f"{key}_insight"] = cleaned_response
             
             # Update conversation context
@@ -987,25 +1217,55 @@ class ConversationCoordinator:
                 print(f"\n{entry['section']} - {entry['question']}")
                 print(f"Answer: {entry['response']}")
 
+    @traced()
     async def _generate_report_section(self, section: str) -> str:
         """Generate a specific section of the career roadmap"""
+        # The consensus is the same for every section, so it is a cached block ahead of the request;
+        # its timestamp is left out so a rerun of the same session sends the same block
+        consensus = without_volatile_fields(self.current_context.get('consensus', {}))
+        consensus_block = f"""
+        Consensus and discussion:
+        {json.dumps(consensus, sort_keys=True, separators=(",", ":"))}
+        """
         prompt = f"""
-        Based on the consensus and discussion:
-        {json.dumps(self.current_context.get('consensus', {}), indent=2)}
-        
-        Generate the {section} section of the career roadmap.
+        Based on the consensus and discussion above, generate the {section} section of the career roadmap.
         Make it detailed, actionable, and specific to the user's profile.
         """
         
+        print(f"\n{section}")
+        print("=" * len(section))
         try:
-            first_principal = list(self.principals.values())[0]
-            return await first_principal.claude.get_response(
-                messages=[{"role": "user", "content": prompt}]
+            return await self._stream_to_terminal(
+                messages=[cached_context_message([self._get_shared_context("roadmap"), consensus_block], prompt)],
+                call_site="_generate_report_section"
             )
         except Exception as e:
             self.logger.error(f"Error generating report section: {e}")
+            print(f"Unable to generate {section}")
             return f"Unable to generate {section}"
 
+    def _get_shared_context(self, phase: str) -> str:
+        """Serialize the user profile and interview transcript once per phase for all principals"""
+        if phase not in self.shared_context_by_phase:
+            self.shared_context_by_phase[phase] = format_session_context(self.user_info, self.conversation_history)
+        return self.shared_context_by_phase[phase]
+
+    def _fit_prompt_context(self, fields: List[Dict[str, Any]], template: str) -> Dict[str, str]:
+        """Serialize prompt context, trimming low-priority fields to fit the token budget"""
+        return self.claude.fit_context(fields, template, system=COORDINATOR_SYSTEM_PROMPT)
+
+    async def _stream_to_terminal(self, messages: List[Dict[str, Any]], call_site: str,
+                                  max_tokens: Optional[int] = None) -> str:
+        """Print a Claude response as it is generated and return the full text"""
+        chunks = []
+        async for delta in self.claude.stream_response(
+            messages, max_tokens=max_tokens, call_site=call_site, system=COORDINATOR_SYSTEM_PROMPT
+        ):
+            print(delta, end="", flush=True)
+            chunks.append(delta)
+        print()
+        return "".join(chunks)
+
     async def _present_career_roadmap(self, report: Dict):
         """Present the career roadmap to the user"""
         print("\n=== Your Personalized Career Roadmap ===")
@@ -1202,9 +1462,9 @@ class ConversationCoordinator:
         """
 
         try:
-            first_principal = list(self.principals.values())[0]
-            response = await first_principal.claude.get_response(
-                messages=[{"role": "user", "content": prompt}]
+            response = await self.claude.get_response(
+                messages=[{"role": "user", "content": prompt}],
+                call_site="_get_career_stage_analysis"
             )
             return json.loads(response)
         except Exception as e:
@@ -0,0 +1,163 @@
+from typing import Dict, List, Any, Optional, TextIO
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from src.core.conversation_coordinator import ConversationCoordinator
+from src.agents.vision_principal import VisionPrincipal
+from src.agents.background_principal import BackgroundPrincipal
+from src.agents.financial_principal import FinancialPrincipal
+from src.utils.claude_client import close_shared_http_client
+from src.utils.client_registry import get_client_registry
+from src.utils.metrics import get_metrics
+from src.utils.output_routing import redirect_output
+from src.utils.usage_ledger import get_usage_ledger
+
+logger = logging.getLogger(__name__)
+
+def parse_intake(line: str, line_number: int) -> Dict[str, Any]:
+    """Parse one input line: {"id": ..., "profile": {...}, "answers": {...} or [...]}"""
+    intake = json.loads(line)
+    if not isinstance(intake, dict) or not isinstance(intake.get("profile"), dict):
+        raise ValueError("expected an object with a \"profile\" object")
+    intake.setdefault("id", str(line_number))
+    intake.setdefault("answers", {})
+    return intake
+
+async def run_session(intake: Dict[str, Any], keep_transcript: bool = False) -> Dict[str, Any]:
+    """Run one full planning session from a stored intake, with its printed output captured"""
+    coordinator = ConversationCoordinator()
+    coordinator.add_principal(VisionPrincipal())
+    coordinator.add_principal(BackgroundPrincipal())
+    coordinator.add_principal(FinancialPrincipal())
+    # Batch results go to the output file, not to one shared career_roadmap.txt
+    coordinator.report_filename = None
+
+    transcript: List[str] = []
+    result: Dict[str, Any] = {"id": intake["id"], "session_id": coordinator.session_id}
+    started = time.perf_counter()
+    try:
+        try:
+            with redirect_output(transcript.append):
+                coordinator.load_intake(intake["profile"], intake["answers"])
+                await coordinator.start_conversation()
+            result["status"] = "ok"
+        except Exception as e:
+            logger.error(f"Headless session {intake['id']} ({coordinator.session_id}) failed: {e}")
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["wall_time"] = round(time.perf_counter() - started, 3)
+
+        report = coordinator.pipeline_report
+        if report is not None:
+            result["critical_path"] = report.critical_path
+            result["critical_path_time"] = round(report.critical_path_time, 3)
+            result["phase_times"] = {phase: round(seconds, 3) for phase, seconds in report.phase_times().items()}
+        usage = result["usage"] = get_usage_ledger().session_totals(coordinator.session_id)
+        result["report"] = coordinator.career_report
+        if keep_transcript:
+            result["transcript"] = "".join(transcript)
+    finally:
+        coordinator.close()
+
+    # Principals and pipeline steps log a failed call and carry on, so a session can finish without raising
+    if result["status"] == "ok" and usage["failed_calls"]:
+        if usage["calls"] == 0:
+            result["status"] = "error"
+            result["error"] = f"All {usage['failed_calls']} Claude calls failed"
+        else:
+            result["status"] = "degraded"
+            result["error"] = f"{usage['failed_calls']} of {usage['calls'] + usage['failed_calls']} Claude calls failed"
+    elif result["status"] == "ok" and report is not None and report.errors:
+        result["status"] = "degraded"
+        result["error"] = f"Failed steps: {', '.join(report.errors)}"
+    return result
+
+async def run_batch(input_file: TextIO, output_file: TextIO, concurrency: int,
+                    keep_transcript: bool = False) -> Dict[str, Any]:
+    """Run a session for every intake in `input_file`, at most `concurrency` at a time
+
+    Intakes are read only as fast as workers take them, so memory stays
+    bounded however long the input is. Results are written to `output_file`
+    as each session finishes, so they are in completion order.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    sessions = get_metrics().counter("headless_sessions_total", "Headless sessions run, by status")
+    stats = {"sessions": 0, "failed": 0, "degraded": 0, "cost_usd": 0.0}
+
+    def write(result: Dict[str, Any]):
+        output_file.write(json.dumps(result, default=str) + "\n")
+        output_file.flush()
+        stats["sessions"] += 1
+        if result["status"] == "error":
+            stats["failed"] += 1
+        elif result["status"] == "degraded":
+            stats["degraded"] += 1
+        stats["cost_usd"] += result.get("usage", {}).get("cost_usd", 0.0)
+        sessions.inc(status=result["status"])
+
+    async def read():
+        line_number = 0
+        # A pipe or slow disk must not stall the sessions already running
+        while raw_line := await asyncio.to_thread(input_file.readline):
+            line_number += 1
+            line = raw_line.strip()
+            if not line:
+                continue
+            try:
+                intake = parse_intake(line, line_number)
+            except ValueError as e:  # json.JSONDecodeError is a ValueError
+                write({"id": str(line_number), "status": "error", "error": f"Invalid intake on line {line_number}: {e}"})
+                continue
+            # Blocks while every worker is busy and the queue is full
+            await queue.put(intake)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while (intake := await queue.get()) is not None:
+            write(await run_session(intake, keep_transcript))
+
+    started = time.perf_counter()
+    await asyncio.gather(read(), *(work() for _ in range(concurrency)))
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+def main():
+    """Run many career planning sessions non-interactively from a JSON-lines intake file"""
+    parser = argparse.ArgumentParser(description="Run career planning sessions in bulk from stored intake forms")
+    parser.add_argument("--input", required=True, help="JSON-lines file of intakes, or - for stdin")
+    parser.add_argument("--output", required=True, help="JSON-lines file to write results to, or - for stdout")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("HEADLESS_CONCURRENCY", "4")),
+                        help="Sessions run at once")
+    parser.add_argument("--transcript", action="store_true", help="Include each session's printed output")
+    parser.add_argument("--batch", action="store_true",
+                        help="Send Claude calls through Message Batches (half price, minutes of latency); same as CLAUDE_BATCH=1")
+    args = parser.parse_args()
+    if args.batch:
+        # Clients are created on first use, after this
+        get_client_registry().batch = True
+
+    async def run() -> Dict[str, Any]:
+        input_file = sys.stdin if args.input == "-" else open(args.input, "r")
+        output_file = sys.stdout if args.output == "-" else open(args.output, "a")
+        try:
+            return await run_batch(input_file, output_file, max(1, args.concurrency), args.transcript)
+        finally:
+            await close_shared_http_client()
+            for f in (input_file, output_file):
+                if f not in (sys.stdin, sys.stdout):
+                    f.close()
+
+    stats = asyncio.run(run())
+    print(
+        f"Ran {stats['sessions']} sessions ({stats['failed']} failed, {stats['degraded']} degraded) in {stats['elapsed']:.1f}s, "
+        f"${stats['cost_usd']:.4f}",
+        file=sys.stderr
+    )
+
+if __name__ == "__main__":
+    main()
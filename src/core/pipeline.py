@@ -0,0 +1,201 @@
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+import asyncio
+import logging
+import os
+import sys
+import time
+from src.utils.metrics import get_metrics
+from src.utils.output_routing import redirect_output, routed_stdout
+from src.utils.tracing import get_tracer
+from src.utils.usage_ledger import usage_context
+
+class PipelineTask:
+    """One node of a pipeline: an async function of the results of the nodes it depends on"""
+
+    def __init__(self, name: str, func: Callable[..., Awaitable[Any]], inputs: List[str], tags: Dict[str, str]):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.tags = tags
+
+class PipelineReport:
+    """Per-node timings of a pipeline run and its critical path"""
+
+    def __init__(self, tasks: Dict[str, PipelineTask], started: Dict[str, float], finished: Dict[str, float],
+                 errors: Dict[str, BaseException], wall_time: float, restored: Optional[List[str]] = None):
+        self.tasks = tasks
+        self.started = started
+        self.finished = finished
+        self.errors = errors
+        self.wall_time = wall_time
+        self.restored = restored or []
+        self.critical_path = self._critical_path()
+
+    def duration(self, name: str) -> float:
+        return self.finished[name] - self.started[name] if name in self.finished else 0.0
+
+    def _critical_path(self) -> List[str]:
+        """The dependency chain with the longest total duration, which bounds the wall time"""
+        longest: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        # Tasks are stored in insertion order, which is a topological order
+        for name, task in self.tasks.items():
+            before = max(task.inputs, key=lambda input_name: longest[input_name], default=None)
+            previous[name] = before
+            longest[name] = (longest[before] if before else 0.0) + self.duration(name)
+        end = max(longest, key=longest.get, default=None)
+        path = []
+        while end is not None:
+            path.append(end)
+            end = previous[end]
+        return path[::-1]
+
+    @property
+    def critical_path_time(self) -> float:
+        return sum(self.duration(name) for name in self.critical_path)
+
+    def phase_times(self) -> Dict[str, float]:
+        """Wall time from the first start to the last finish of the nodes in each phase"""
+        spans: Dict[str, List[float]] = {}
+        for name, task in self.tasks.items():
+            phase = task.tags.get("phase")
+            if phase and name in self.finished:
+                span = spans.setdefault(phase, [self.started[name], self.finished[name]])
+                span[0] = min(span[0], self.started[name])
+                span[1] = max(span[1], self.finished[name])
+        return {phase: end - start for phase, (start, end) in spans.items()}
+
+    def format(self) -> str:
+        """Format the node timings and critical path as a plain-text table"""
+        origin = min(self.started.values(), default=0.0)
+        header = f"{'node':<40} {'start_s':>8} {'dur_s':>8}  status"
+        lines = [header, "-" * len(header)]
+        for name in self.tasks:
+            if name in self.errors:
+                status = f"failed: {type(self.errors[name]).__name__}"
+            elif name in self.restored:
+                status = "restored"
+            elif name not in self.started:
+                status = "skipped"
+            else:
+                status = "critical" if name in self.critical_path else "ok"
+            start = self.started.get(name, origin) - origin
+            lines.append(f"{name[:40]:<40} {start:>8.2f} {self.duration(name):>8.2f}  {status}")
+        lines.append(
+            f"wall time {self.wall_time:.2f}s, critical path {self.critical_path_time:.2f}s: "
+            + " -> ".join(self.critical_path)
+        )
+        return "\n".join(lines)
+
+class Pipeline:
+    """A DAG of async tasks, run with every ready task in flight at once (up to a concurrency limit)
+
+    Tasks are added after the tasks they depend on, and their printed output is
+    presented in that order: each task's output appears as soon as it and all
+    tasks added before it have produced it, however the work interleaved.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("PIPELINE_CONCURRENCY", "4"))
+        self.tasks: Dict[str, PipelineTask] = {}
+        self.logger = logging.getLogger(__name__)
+        self.node_duration = get_metrics().summary("pipeline_node_duration_seconds", "Wall time of each pipeline node")
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], inputs: Optional[List[str]] = None,
+            **tags: str) -> str:
+        """Add a task called with the results of `inputs`, in order; tags apply to its usage records"""
+        inputs = inputs or []
+        if name in self.tasks:
+            raise ValueError(f"Duplicate pipeline task: {name}")
+        missing = [input_name for input_name in inputs if input_name not in self.tasks]
+        if missing:
+            raise ValueError(f"Pipeline task {name} depends on tasks not added yet: {missing}")
+        self.tasks[name] = PipelineTask(name, func, inputs, tags)
+        return name
+
+    async def run(self, completed: Optional[Dict[str, Any]] = None,
+                  on_complete: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """Run every task, returning their results; the first failure is raised once the rest are done
+
+        Tasks in `completed` (results of an earlier, interrupted run) are not run
+        again, and print nothing. `on_complete` is called with each task's name
+        and result as it finishes. Tasks depending on a failed task are skipped.
+        The run's report is left in `self.report`.
+        """
+        restored = [name for name in self.tasks if name in (completed or {})]
+        results: Dict[str, Any] = {name: completed[name] for name in restored}
+        started: Dict[str, float] = {}
+        finished: Dict[str, float] = {}
+        errors: Dict[str, BaseException] = {}
+        outputs = {name: asyncio.Queue() for name in self.tasks}
+        slots = asyncio.Semaphore(self.max_concurrency)
+        run_started = time.perf_counter()
+
+        async def run_task(task: PipelineTask):
+            try:
+                # Printed output is held until every task added before this one has been presented
+                with redirect_output(outputs[task.name].put_nowait):
+                    async with slots:
+                        started[task.name] = time.perf_counter()
+                        try:
+                            with usage_context(**task.tags), get_tracer().span(f"pipeline:{task.name}", "pipeline"):
+                                results[task.name] = await task.func(*(results[name] for name in task.inputs))
+                        finally:
+                            finished[task.name] = time.perf_counter()
+                            self.node_duration.observe(finished[task.name] - started[task.name], node=task.name)
+                if on_complete is not None:
+                    on_complete(task.name, results[task.name])
+            except Exception as e:
+                errors[task.name] = e
+                self.logger.error(f"Pipeline task {task.name} failed: {e}")
+            finally:
+                outputs[task.name].put_nowait(None)
+
+        pending = {name: task for name, task in self.tasks.items() if name not in results}
+        for name in restored:
+            outputs[name].put_nowait(None)
+        running: Dict[asyncio.Task, str] = {}
+        skipped = set()
+
+        def launch_ready():
+            # Insertion order is topological, so skips cascade to dependents within one pass
+            for name, task in list(pending.items()):
+                if any(input_name in errors or input_name in skipped for input_name in task.inputs):
+                    del pending[name]
+                    skipped.add(name)
+                    outputs[name].put_nowait(None)
+                elif all(input_name in results for input_name in task.inputs):
+                    del pending[name]
+                    running[asyncio.create_task(run_task(task), name=f"pipeline:{name}")] = name
+
+        async def schedule():
+            launch_ready()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for finished_task in done:
+                    del running[finished_task]
+                launch_ready()
+
+        async def present():
+            # Runs in the caller's context, so this goes wherever the caller's output goes
+            for name in self.tasks:
+                while (text := await outputs[name].get()) is not None:
+                    sys.stdout.write(text)
+                sys.stdout.flush()
+
+        try:
+            with routed_stdout():
+                await asyncio.gather(schedule(), present())
+        except BaseException:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+        finally:
+            self.report = PipelineReport(
+                self.tasks, started, finished, errors, time.perf_counter() - run_started, restored
+            )
+
+        if self.report.errors:
+            raise next(iter(self.report.errors.values()))
+        return results
@@ -0,0 +1,166 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from src.utils.batch_backend import BatchBackend, BatchRequestError, LocalBatchesStandIn
+from src.utils.claude_client import ClaudeClient, DEFAULT_MODEL
+from src.utils.token_budget import TokenBudget
+from src.utils.usage_ledger import UsageLedger, estimate_cost
+
+def message(text):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text=text)],
+        usage=SimpleNamespace(input_tokens=1000, output_tokens=200, cache_read_input_tokens=0,
+                              cache_creation_input_tokens=0),
+        stop_reason="end_turn",
+        model=DEFAULT_MODEL
+    )
+
+async def echo(params):
+    return message(f"answer to {params['messages'][0]['content']}")
+
+def request(question):
+    return {"model": DEFAULT_MODEL, "max_tokens": 100, "messages": [{"role": "user", "content": question}]}
+
+def backend(stand_in, **options):
+    return BatchBackend(stand_in, **{"max_batch_size": 100, "flush_interval": 0.01, "poll_interval": 0.01, **options})
+
+def test_requests_from_many_callers_share_one_batch():
+    async def run():
+        batches = backend(LocalBatchesStandIn(echo))
+        responses = await asyncio.gather(*(batches.submit(request(f"q{i}")) for i in range(3)))
+        return [response.content[0].text for response in responses], batches.stats
+
+    texts, stats = asyncio.run(run())
+    assert texts == ["answer to q0", "answer to q1", "answer to q2"]
+    assert stats == {"batches": 1, "requests": 3, "succeeded": 3, "failed": 0}
+
+def test_a_full_batch_is_submitted_without_waiting_for_the_interval():
+    async def run():
+        batches = backend(LocalBatchesStandIn(echo), max_batch_size=2, flush_interval=60)
+        await asyncio.wait_for(asyncio.gather(batches.submit(request("a")), batches.submit(request("b"))), 1)
+        return batches.stats["batches"]
+
+    assert asyncio.run(run()) == 1
+
+def test_results_are_routed_once_polling_sees_the_batch_end():
+    answered = asyncio.Event()
+    polls = []
+
+    async def slow(params):
+        await answered.wait()
+        return await echo(params)
+
+    async def run():
+        stand_in = LocalBatchesStandIn(slow)
+        retrieve = stand_in.retrieve
+
+        async def counting_retrieve(batch_id):
+            batch = await retrieve(batch_id)
+            polls.append(batch.processing_status)
+            return batch
+
+        stand_in.retrieve = counting_retrieve
+        batches = backend(stand_in)
+        waiting = asyncio.ensure_future(batches.submit(request("q")))
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        answered.set()
+        return (await asyncio.wait_for(waiting, 1)).content[0].text
+
+    assert asyncio.run(run()) == "answer to q"
+    assert polls[0] == "in_progress" and polls[-1] == "ended"
+
+def test_errored_and_expired_requests_fail_only_their_own_caller():
+    async def responder(params):
+        question = params["messages"][0]["content"]
+        if question == "bad":
+            raise ValueError("invalid request")
+        if question == "slow":
+            await asyncio.sleep(10)
+        return await echo(params)
+
+    async def run():
+        batches = backend(LocalBatchesStandIn(responder, expire_after=0.05))
+        results = await asyncio.gather(
+            *(batches.submit(request(question)) for question in ["ok", "bad", "slow"]), return_exceptions=True
+        )
+        return results, batches.stats
+
+    (ok, bad, slow), stats = asyncio.run(run())
+    assert ok.content[0].text == "answer to ok"
+    assert isinstance(bad, BatchRequestError) and "errored" in str(bad)
+    assert isinstance(slow, BatchRequestError) and "expired" in str(slow)
+    assert stats["succeeded"] == 1 and stats["failed"] == 2
+
+def test_a_batch_that_cannot_be_created_fails_every_caller():
+    async def run():
+        stand_in = LocalBatchesStandIn(echo)
+
+        async def create(requests):
+            raise RuntimeError("batches unavailable")
+
+        stand_in.create = create
+        batches = backend(stand_in)
+        return await asyncio.gather(batches.submit(request("a")), batches.submit(request("b")), return_exceptions=True)
+
+    assert [str(result) for result in asyncio.run(run())] == ["batches unavailable"] * 2
+
+@pytest.fixture
+def batch_client(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+
+    def make(responder):
+        client = ClaudeClient(batch_backend=backend(LocalBatchesStandIn(responder, expire_after=0.05)))
+        client.ledger = UsageLedger(str(tmp_path))
+        client.budget = TokenBudget(session_limit=0, call_limit=0)
+        client.interactive = []
+
+        class Raw:
+            headers = {}
+
+            def parse(self):
+                return message("interactive answer")
+
+        async def create(**params):
+            client.interactive.append(params)
+            return Raw()
+
+        client.client = SimpleNamespace(base_url=client.client.base_url,
+                                        messages=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+        return client
+
+    return make
+
+def test_batched_calls_are_costed_at_the_batch_price(batch_client):
+    client = batch_client(echo)
+    text = asyncio.run(client.get_response([{"role": "user", "content": "q"}], 100, call_site="batch_price_test"))
+    assert text == "answer to q"
+    assert not client.interactive
+
+    [record] = client.ledger.load_records()
+    assert record["batch"] is True
+    interactive_cost = estimate_cost({**record, "batch": False})
+    assert interactive_cost > 0
+    assert record["cost_usd"] == pytest.approx(interactive_cost / 2, abs=1e-6)
+
+def test_a_request_that_fails_in_its_batch_is_sent_interactively(batch_client):
+    async def fail(params):
+        raise ValueError("errored in batch")
+
+    client = batch_client(fail)
+    text = asyncio.run(client.get_response([{"role": "user", "content": "q"}], 100, call_site="batch_fallback_test"))
+    assert text == "interactive answer"
+    assert len(client.interactive) == 1
+    # Billed once, at the interactive price
+    [record] = client.ledger.load_records()
+    assert record["batch"] is False
+
+def test_fallback_can_be_turned_off(batch_client):
+    async def expire(params):
+        await asyncio.sleep(10)
+
+    client = batch_client(expire)
+    client.batch_fallback = False
+    with pytest.raises(BatchRequestError, match="expired"):
+        asyncio.run(client.get_response([{"role": "user", "content": "q"}], 100, call_site="batch_no_fallback_test"))
+    assert not client.interactive
@@ -0,0 +1,96 @@
+import os
+import time
+import pytest
+from src.utils.cache_snapshot import CacheSnapshot, write_snapshot, snapshot_path
+from src.utils.response_cache import ResponseCache
+
+def entries(count):
+    return {f"key-{i}": (f"response {i} " * (i % 7 + 1), 1000.0 + i, None if i % 3 == 0 else 5000.0 + i)
+            for i in range(count)}
+
+def test_snapshot_returns_every_entry(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    expected = entries(500)
+    assert write_snapshot(expected.items(), path) == 500
+
+    snapshot = CacheSnapshot(path)
+    assert len(snapshot) == 500
+    for key, entry in expected.items():
+        assert snapshot.get(key) == entry
+    assert dict(snapshot.iter_entries()) == expected
+    snapshot.close()
+
+def test_snapshot_misses_unknown_keys(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    write_snapshot(entries(50).items(), path)
+    snapshot = CacheSnapshot(path)
+    # Probing runs until an empty slot; the table is never more than half full
+    assert all(snapshot.get(f"other-{i}") is None for i in range(200))
+    snapshot.close()
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    assert write_snapshot([], path) == 0
+    snapshot = CacheSnapshot(path)
+    assert snapshot.get("anything") is None
+    assert list(snapshot.iter_entries()) == []
+    snapshot.close()
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-snapshot"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        CacheSnapshot(str(path))
+
+def test_rewriting_a_snapshot_replaces_it_atomically(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    write_snapshot([("k", ("old", 1.0, None))], path)
+    write_snapshot([("k", ("new", 2.0, None))], path)
+    snapshot = CacheSnapshot(path)
+    assert snapshot.get("k") == ("new", 2.0, None)
+    snapshot.close()
+    assert os.listdir(tmp_path) == ["cache.snapshot"]
+
+def test_response_cache_falls_back_to_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_EXPIRY", "3600")
+    cache_dir = str(tmp_path)
+    write_snapshot([("warm", ("from snapshot", time.time(), None))], snapshot_path(cache_dir))
+    cache = ResponseCache(cache_dir)
+    try:
+        assert cache.get("warm") == "from snapshot"
+        assert cache.get("cold") is None
+    finally:
+        cache.close()
+
+def test_clear_stops_the_snapshot_serving_cleared_entries(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_EXPIRY", "3600")
+    cache_dir = str(tmp_path)
+    write_snapshot([("warm", ("from snapshot", time.time(), None))], snapshot_path(cache_dir))
+    cache = ResponseCache(cache_dir)
+    # Another process sharing the cache directory, with the same snapshot mapped
+    other = ResponseCache(cache_dir)
+    try:
+        cache.set("fresh", "from store")
+        cache.clear()
+        assert cache.get("warm") is None and cache.get("fresh") is None
+        assert not os.path.exists(snapshot_path(cache_dir))
+        assert other.get("warm") is None
+    finally:
+        cache.close()
+        other.close()
+
+def test_a_rebuilt_snapshot_is_picked_up(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_EXPIRY", "3600")
+    cache_dir = str(tmp_path)
+    write_snapshot([("old", ("old entry", time.time(), None))], snapshot_path(cache_dir))
+    cache = ResponseCache(cache_dir)
+    try:
+        assert cache.get("old") == "old entry"
+        write_snapshot([("new", ("new entry", time.time(), None))], snapshot_path(cache_dir))
+        assert cache.get("new") == "new entry"
+        # Still in the memory tier from the first read
+        assert cache.get("old") == "old entry"
+        cache.memory.clear()
+        assert cache.get("old") is None
+    finally:
+        cache.close()
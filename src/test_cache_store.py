@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from src.utils.cache_store import JsonCacheStore, SqliteCacheStore, CacheCompactor, MemoryTier, WriteBehindWriter
+
+def write_legacy_cache(path, entries):
+    with open(path, "w") as f:
+        json.dump({
+            key: {"response": response, "timestamp": datetime.fromtimestamp(created_at).isoformat()}
+            for key, (response, created_at) in entries.items()
+        }, f)
+
+def test_sqlite_store_imports_legacy_json_once(tmp_path):
+    json_path = str(tmp_path / "response_cache.json")
+    db_path = str(tmp_path / "response_cache.sqlite3")
+    created_at = time.time() - 60
+    write_legacy_cache(json_path, {"a": ("alpha", created_at), "b": ("beta", created_at)})
+
+    store = SqliteCacheStore(db_path, legacy_json_path=json_path)
+    response, migrated_at, expires_at = store.get("a")
+    assert response == "alpha"
+    assert abs(migrated_at - created_at) < 1e-3
+    assert expires_at is None
+    store.clear()
+    store.close()
+
+    # The JSON file is left in place but not imported again
+    assert os.path.exists(json_path)
+    reopened = SqliteCacheStore(db_path, legacy_json_path=json_path)
+    assert reopened.get("a") is None
+    reopened.close()
+
+def test_sqlite_store_round_trip_and_expiry(tmp_path):
+    store = SqliteCacheStore(str(tmp_path / "cache.sqlite3"))
+    now = time.time()
+    store.set_many({
+        "fresh": ("kept", now, now + 3600),
+        "expired": ("dropped", now - 7200, now - 1),
+        "default_ttl": ("old", now - 7200, None)
+    })
+    assert store.delete_expired(now, default_ttl=3600) == 2
+    assert dict(store.iter_entries()) == {"fresh": ("kept", now, now + 3600)}
+    store.close()
+
+def test_sqlite_store_connection_per_thread(tmp_path):
+    store = SqliteCacheStore(str(tmp_path / "cache.sqlite3"))
+    now = time.time()
+
+    def write(i):
+        store.set_many({f"k{i}": (str(i), now, None)})
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(key for key, _ in store.iter_entries()) == [f"k{i}" for i in range(8)]
+    store.close()
+
+class BlockingCompactionStore:
+    def __init__(self):
+        self.compacting = threading.Event()
+        self.release = threading.Event()
+        self.closed_while_compacting = False
+
+    def delete_expired(self, now, default_ttl):
+        self.compacting.set()
+        self.release.wait(5)
+        return 0
+
+    def close(self):
+        self.closed_while_compacting = self.compacting.is_set() and not self.release.is_set()
+
+def test_compactor_stop_waits_for_a_running_compaction():
+    store = BlockingCompactionStore()
+    compactor = CacheCompactor(store, default_ttl=3600, interval=0.01).start()
+    assert store.compacting.wait(5)
+    threading.Timer(0.1, store.release.set).start()
+    assert compactor.stop(timeout=5)
+    store.close()
+    assert not store.closed_while_compacting
+
+def test_compactor_stop_gives_up_after_the_timeout():
+    store = BlockingCompactionStore()
+    compactor = CacheCompactor(store, default_ttl=3600, interval=0.01).start()
+    assert store.compacting.wait(5)
+    started = time.monotonic()
+    assert not compactor.stop(timeout=0.05)
+    assert time.monotonic() - started < 1
+    store.release.set()
+    assert compactor.stop(timeout=5)
+
+class RecordingStore:
+    def __init__(self, release=None):
+        self.batches = []
+        self.release = release
+
+    def set_many(self, entries):
+        if self.release is not None:
+            self.release.wait(5)
+        self.batches.append(dict(entries))
+
+def test_writer_coalesces_writes_to_one_key():
+    store = RecordingStore()
+    writer = WriteBehindWriter(store, flush_interval=60)
+    release = store.release = threading.Event()
+    writer.submit("first", ("x", 0.0, None))
+    # Wait for the writer to be blocked on the first batch, so the next ones queue up
+    while not writer.writing:
+        time.sleep(0.001)
+    for i in range(3):
+        writer.submit("key", (str(i), 0.0, None))
+    assert writer.get_pending("first") == ("x", 0.0, None)
+    release.set()
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert store.batches == [{"first": ("x", 0.0, None)}, {"key": ("2", 0.0, None)}]
+
+def test_writer_drops_new_keys_when_full_instead_of_blocking():
+    release = threading.Event()
+    store = RecordingStore(release)
+    writer = WriteBehindWriter(store, flush_interval=60, max_pending=2)
+    writer.submit("busy", ("", 0.0, None))
+    while not writer.writing:
+        time.sleep(0.001)
+    assert writer.submit("a", ("1", 0.0, None))
+    assert writer.submit("b", ("1", 0.0, None))
+    started = time.monotonic()
+    assert not writer.submit("c", ("1", 0.0, None))
+    assert time.monotonic() - started < 0.5
+    # A key already waiting is still updated in place
+    assert writer.submit("a", ("2", 0.0, None))
+    release.set()
+    writer.close()
+    assert store.batches[-1] == {"a": ("2", 0.0, None), "b": ("1", 0.0, None)}
+
+def test_writer_close_persists_pending_writes(tmp_path):
+    store = JsonCacheStore(str(tmp_path / "cache.json"))
+    writer = WriteBehindWriter(store, flush_interval=60)
+    writer.submit("k", ("v", 1.0, None))
+    writer.close()
+    assert JsonCacheStore(str(tmp_path / "cache.json")).get("k") == ("v", 1.0, None)
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_entries=2, max_bytes=1000)
+    tier.put("a", "1", 0, 100)
+    tier.put("b", "2", 0, 100)
+    assert tier.get("a", now=1) == ("1", 100)
+    tier.put("c", "3", 0, 100)
+    assert tier.get("b", now=1) is None
+    assert tier.get("a", now=1) is not None and tier.get("c", now=1) is not None
+
+def test_memory_tier_bounds_total_size():
+    tier = MemoryTier(max_entries=100, max_bytes=10)
+    tier.put("a", "xxxx", 0, 100)
+    tier.put("b", "yyyy", 0, 100)
+    tier.put("c", "zzzz", 0, 100)
+    assert tier.size <= 10
+    assert list(tier.entries) == ["b", "c"]
+    # Too big to hold at all
+    tier.put("d", "w" * 20, 0, 100)
+    assert tier.get("d", now=1) is None
+
+def test_memory_tier_serves_expired_entries_within_grace():
+    tier = MemoryTier(max_entries=10, max_bytes=1000)
+    tier.put("k", "v", 0, 100)
+    assert tier.get("k", now=105, grace=10) == ("v", 100)
+    assert tier.get("k", now=111, grace=10) is None
+    assert tier.size == 0
@@ -1,5 +1,6 @@
 import asyncio
 from src.core.conversation_coordinator import ConversationCoordinator
+from src.utils.claude_client import close_shared_http_client
 from src.agents.vision_principal import VisionPrincipal
 from src.agents.background_principal import BackgroundPrincipal
 from src.agents.financial_principal import FinancialPrincipal
@@ -13,7 +14,10 @@ async def test_career_planning_session():
     coordinator.add_principal(FinancialPrincipal())
     
     # Start conversation
-    await coordinator.start_conversation()
+    try:
+        await coordinator.start_conversation()
+    finally:
+        await close_shared_http_client()
 
 if __name__ == "__main__":
     asyncio.run(test_career_planning_session()) 
\ No newline at end of file
@@ -0,0 +1,215 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from aiohttp import web
+from src.utils import claude_client
+from src.utils.claude_client import ClaudeClient
+from src.utils.memoization import Memoizer, MemoPolicy
+from src.utils.mock_messages_server import MockMessagesServer
+from src.utils.output_sizing import OutputSizer
+from src.utils.rate_limiter import AdaptiveRateLimiter
+from src.utils.token_budget import TokenBudget, TokenBudgetExceededError
+from src.utils.usage_ledger import UsageLedger, usage_context
+
+USAGE = SimpleNamespace(input_tokens=100, output_tokens=20, cache_read_input_tokens=0, cache_creation_input_tokens=0)
+MESSAGES = [{"role": "user", "content": "Summarize my career plan."}]
+
+@pytest.fixture
+def claude(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    client = ClaudeClient()
+    client.ledger = UsageLedger(str(tmp_path))
+    client.budget = TokenBudget(session_limit=0, call_limit=0)
+    client.sent = []
+    client.release = None
+
+    async def send(request, call_site, usage=None):
+        client.sent.append(call_site)
+        await client.release.wait()
+        if usage is not None:
+            claude_client.add_usage(usage, USAGE)
+        return "shared answer"
+
+    client._send = send
+    return client
+
+def test_identical_requests_share_one_call(claude):
+    async def run():
+        claude.release = asyncio.Event()
+        calls = [asyncio.create_task(claude.get_response(MESSAGES, call_site="test")) for _ in range(3)]
+        await asyncio.sleep(0)
+        claude.release.set()
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(run()) == ["shared answer"] * 3
+    assert claude.sent == ["test"]
+    assert not claude_client._inflight_requests
+
+def test_cancelling_the_first_caller_does_not_fail_the_others(claude):
+    async def run():
+        claude.release = asyncio.Event()
+        leader = asyncio.create_task(claude.get_response(MESSAGES, call_site="test"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(claude.get_response(MESSAGES, call_site="test"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        claude.release.set()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(run()) == ("shared answer", True)
+    assert claude.sent == ["test"]
+
+def test_call_is_cancelled_once_nobody_waits(claude):
+    async def run():
+        claude.release = asyncio.Event()
+        callers = [asyncio.create_task(claude.get_response(MESSAGES, call_site="test")) for _ in range(2)]
+        await asyncio.sleep(0)
+        shared = next(iter(claude_client._inflight_requests.values()))
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return shared.task.cancelled()
+
+    assert asyncio.run(run())
+    assert not claude_client._inflight_requests
+
+def test_followers_are_charged_to_their_own_session(claude):
+    claude.budget = TokenBudget(session_limit=100000, call_limit=0)
+
+    async def ask(session):
+        with usage_context(session=session):
+            return await claude.get_response(MESSAGES, call_site="test")
+
+    async def run():
+        claude.release = asyncio.Event()
+        calls = [asyncio.create_task(ask("a")), asyncio.create_task(ask("b"))]
+        await asyncio.sleep(0)
+        claude.release.set()
+        await asyncio.gather(*calls)
+
+    asyncio.run(run())
+    follower = claude.ledger.session_totals("b")
+    assert follower["calls"] == 1
+    assert follower["input_tokens"] == 100 and follower["output_tokens"] == 20
+    # The API call is billed once, to the session that made it
+    assert follower["cost_usd"] == 0.0
+    assert claude.budget.session_usage["b"] == 120
+
+def test_requests_for_different_accounts_are_not_shared(claude):
+    other = ClaudeClient(api_key="other-key")
+    other._send = claude._send
+    other.ledger = claude.ledger
+
+    async def run():
+        claude.release = asyncio.Event()
+        calls = [
+            asyncio.create_task(claude.get_response(MESSAGES, call_site="test")),
+            asyncio.create_task(other.get_response(MESSAGES, call_site="test"))
+        ]
+        await asyncio.sleep(0)
+        claude.release.set()
+        await asyncio.gather(*calls)
+
+    asyncio.run(run())
+    assert claude.sent == ["test", "test"]
+
+def test_concurrent_calls_cannot_overrun_the_session_budget(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    client = ClaudeClient()
+    client.ledger = UsageLedger(str(tmp_path))
+    client.budget = TokenBudget(session_limit=1500, call_limit=0)
+    release = asyncio.Event()
+
+    class Raw:
+        headers = {}
+
+        def parse(self):
+            return SimpleNamespace(content=[SimpleNamespace(text="ok")], usage=USAGE, stop_reason="end_turn",
+                                   model=client.model)
+
+    async def create(**request):
+        await release.wait()
+        return Raw()
+
+    client.client = SimpleNamespace(base_url=client.client.base_url,
+                                    messages=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+
+    async def ask(question):
+        with usage_context(session="s"):
+            return await client.get_response([{"role": "user", "content": question}], 1000,
+                                             call_site="budget_reservation_test")
+
+    async def run():
+        calls = [asyncio.create_task(ask(f"Question {i}")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    results = asyncio.run(run())
+    # Both passed a plain check while neither had been charged; the reservation stops the second
+    assert results.count("ok") == 1
+    assert sum(isinstance(result, TokenBudgetExceededError) for result in results) == 1
+    assert client.budget.session_usage["s"] == 120
+    assert not client.budget.session_reserved
+
+def against_mock_server(tmp_path, monkeypatch, test, **options):
+    """Run `test(client, server)` with a client talking to an in-process mock Messages API"""
+    server = MockMessagesServer(**{"latency_median": 0.001, "latency_sigma": 0, "token_interval": 0,
+                                   "requests_per_minute": 10000, "input_tokens_per_minute": 10 ** 7, **options})
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setattr(claude_client, "_shared_http_client", None)
+
+    async def run():
+        runner = web.AppRunner(server.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        client = ClaudeClient(base_url=f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}")
+        client.ledger = UsageLedger(str(tmp_path))
+        client.budget = TokenBudget(session_limit=0, call_limit=0)
+        client.rate_limiter = AdaptiveRateLimiter(requests_per_minute=10000, tokens_per_minute=10 ** 7)
+        client.sizer = OutputSizer(enabled=False)
+        client.memoizer = Memoizer(MemoPolicy(), cache_dir=str(tmp_path / "memo"))
+        try:
+            return await test(client, server)
+        finally:
+            await claude_client.close_shared_http_client()
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+def test_streamed_text_arrives_in_deltas_and_time_to_first_token_is_recorded(tmp_path, monkeypatch):
+    async def test(client, server):
+        deltas = [delta async for delta in client.stream_response(MESSAGES, 500, call_site="ttft_test")]
+        return deltas, client
+
+    deltas, client = against_mock_server(tmp_path, monkeypatch, test, latency_median=0.05, token_interval=0.005,
+                                         output_tokens=40)
+    assert len(deltas) > 1
+    [record] = client.ledger.load_records()
+    # The first delta arrives after the server's latency, well before the last one
+    assert 0.05 <= record["time_to_first_token"] < record["latency"]
+    assert record["output_tokens"] > 0 and record["call_site"] == "ttft_test"
+    assert client.call_ttft.quantile(0.5, call_site="ttft_test") == pytest.approx(record["time_to_first_token"], abs=1e-3)
+    assert client.call_latency.quantile(0.5, call_site="ttft_test") == pytest.approx(record["latency"], abs=1e-3)
+
+def test_a_truncated_stream_is_continued_as_one_sequence_of_deltas(tmp_path, monkeypatch):
+    async def test(client, server):
+        text = "".join([delta async for delta in client.stream_response(MESSAGES, 20, call_site="continue_test")])
+        return text, client, server.stats["streamed"]
+
+    text, client, streamed = against_mock_server(tmp_path, monkeypatch, test, output_tokens=100)
+    records = client.ledger.load_records()
+    assert streamed == len(records) > 1
+    assert [record["continuation"] for record in records] == list(range(len(records)))
+    assert "  " not in text and not text.startswith(" ")
+
+def test_an_unstreamed_call_has_no_time_to_first_token(tmp_path, monkeypatch):
+    async def test(client, server):
+        return await client.get_response(MESSAGES, 500, call_site="unstreamed_test"), client
+
+    text, client = against_mock_server(tmp_path, monkeypatch, test, latency_median=0.02, output_tokens=20)
+    [record] = client.ledger.load_records()
+    assert text and record["time_to_first_token"] is None and record["latency"] >= 0.02
@@ -0,0 +1,50 @@
+import threading
+import pytest
+from src.agents.vision_principal import VisionPrincipal
+from src.agents.background_principal import BackgroundPrincipal
+from src.utils.batch_backend import BatchBackend
+from src.utils.client_registry import ClientRegistry, get_claude_client
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.delenv("CLAUDE_BATCH", raising=False)
+
+def test_one_client_per_model_and_key():
+    registry = ClientRegistry()
+    client = registry.get_client()
+    assert registry.get_client() is client
+    assert registry.get_client(api_key="test-key") is client
+    assert registry.get_client(api_key="other-key") is not client
+    assert registry.get_client(model="claude-3-5-haiku-20241022") is not client
+
+def test_concurrent_lookups_build_one_client():
+    registry = ClientRegistry()
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(registry.get_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in clients}) == 1
+
+def test_principals_share_the_process_client():
+    vision, background = VisionPrincipal(), BackgroundPrincipal()
+    assert vision.claude is background.claude is get_claude_client()
+
+def test_batch_registry_gives_clients_a_batch_backend(monkeypatch):
+    assert ClientRegistry().get_client().batch_backend is None
+    assert isinstance(ClientRegistry(batch=True).get_client().batch_backend, BatchBackend)
+    monkeypatch.setenv("CLAUDE_BATCH", "1")
+    assert ClientRegistry().batch
+
+def test_missing_api_key_is_an_error(monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY")
+    with pytest.raises(ValueError):
+        ClientRegistry().get_client()
+
+def test_clear_builds_fresh_clients():
+    registry = ClientRegistry()
+    client = registry.get_client()
+    registry.clear()
+    assert registry.get_client() is not client
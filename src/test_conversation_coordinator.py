@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from src.core.conversation_coordinator import ConversationCoordinator
+
+class SlowPrincipal:
+    """Stands in for a principal whose analysis takes `seconds`, tracking how many run at once"""
+
+    running = 0
+    most_running = 0
+
+    def __init__(self, name, seconds, fail=False):
+        self.name = name
+        self.seconds = seconds
+        self.fail = fail
+
+    async def analyze(self, context):
+        SlowPrincipal.running += 1
+        SlowPrincipal.most_running = max(SlowPrincipal.most_running, SlowPrincipal.running)
+        try:
+            await asyncio.sleep(self.seconds)
+            if self.fail:
+                raise RuntimeError("API down")
+            return {"principal": self.name}
+        finally:
+            SlowPrincipal.running -= 1
+
+@pytest.fixture
+def coordinator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setattr(SlowPrincipal, "most_running", 0)
+    finished = []
+
+    async def present(name, analysis):
+        finished.append(name)
+        return f"{name} insights"
+
+    def make(*principals, concurrency="3"):
+        monkeypatch.setenv("PRINCIPAL_CONCURRENCY", concurrency)
+        coordinator = ConversationCoordinator()
+        coordinator.principals = {principal.name: principal for principal in principals}
+        monkeypatch.setattr(coordinator, "_present_principal_insights", present)
+        return coordinator
+
+    make.finished = finished
+    return make
+
+def printed(capsys):
+    return [line for line in capsys.readouterr().out.splitlines() if line]
+
+def test_insights_are_printed_in_principal_order_whatever_order_they_finish_in(coordinator, capsys):
+    analyses = asyncio.run(coordinator(SlowPrincipal("Vision", 0.03), SlowPrincipal("Background", 0.01),
+                                       SlowPrincipal("Skills", 0.02))._gather_individual_analyses())
+    assert coordinator.finished == ["Background", "Skills", "Vision"]
+    assert list(analyses) == ["Vision", "Background", "Skills"]
+    assert printed(capsys) == [
+        "--- Step 1: Individual Principal Analysis ---",
+        "Vision is analyzing your profile...", "Vision's Key Insights:", "Vision insights",
+        "Background is analyzing your profile...", "Background's Key Insights:", "Background insights",
+        "Skills is analyzing your profile...", "Skills's Key Insights:", "Skills insights"
+    ]
+
+def test_principals_analyze_concurrently_up_to_the_limit(coordinator):
+    principals = [SlowPrincipal(f"Principal {i}", 0.01) for i in range(5)]
+    analyses = asyncio.run(coordinator(*principals, concurrency="2")._gather_individual_analyses())
+    assert len(analyses) == 5
+    assert SlowPrincipal.most_running == 2
+
+def test_a_failed_analysis_does_not_stop_the_others(coordinator, capsys):
+    analyses = asyncio.run(coordinator(SlowPrincipal("Vision", 0.01, fail=True), SlowPrincipal("Background", 0.02),
+                                       SlowPrincipal("Skills", 0.01))._gather_individual_analyses())
+    assert list(analyses) == ["Background", "Skills"]
+    lines = printed(capsys)
+    assert "Vision's Key Insights:" not in lines
+    assert lines.index("Vision is analyzing your profile...") < lines.index("Background insights") < \
+        lines.index("Skills insights")
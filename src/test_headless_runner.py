@@ -0,0 +1,111 @@
+import asyncio
+import io
+import json
+import pytest
+from types import SimpleNamespace
+from src.core import headless_runner
+from src.core.conversation_coordinator import ConversationCoordinator
+from src.core.headless_runner import run_batch, run_session
+from src.utils import metrics, usage_ledger
+from src.utils.metrics import MetricsRegistry
+from src.utils.usage_ledger import UsageLedger, usage_context
+
+PROFILE = {"name": "Ada", "current_role": "Engineer", "experience_years": 5, "education": "BS", "industry": "Software"}
+USAGE = SimpleNamespace(input_tokens=100, output_tokens=10)
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("SESSION_JOURNAL_DIR", str(tmp_path / "sessions"))
+    monkeypatch.setattr(usage_ledger, "_default_ledger", UsageLedger(str(tmp_path / "usage")))
+    monkeypatch.setattr(metrics, "_default_registry", MetricsRegistry())
+
+def conversation(calls=0, failed_calls=0, failed_steps=(), exception=None):
+    """Stands in for a session whose Claude calls and pipeline steps succeed or fail as given"""
+    async def start_conversation(self):
+        print("Planning your career...")
+        with usage_context(session=self.session_id):
+            for _ in range(calls):
+                usage_ledger.get_usage_ledger().record(model="claude", call_site="_discuss_topic", usage=USAGE,
+                                                       latency=0.1)
+            for _ in range(failed_calls):
+                usage_ledger.get_usage_ledger().record_error()
+        self.pipeline_report = SimpleNamespace(errors=list(failed_steps), critical_path=["analyses"],
+                                               critical_path_time=0.1, phase_times=lambda: {"discussion": 0.1})
+        if exception is not None:
+            raise exception
+        self.career_report = {"Goals": "Lead a platform team"}
+
+    return start_conversation
+
+@pytest.mark.parametrize("session, status, error", [
+    (conversation(calls=3), "ok", None),
+    (conversation(calls=2, failed_calls=1), "degraded", "1 of 3 Claude calls failed"),
+    (conversation(calls=3, failed_steps=["section:Goals"]), "degraded", "Failed steps: section:Goals"),
+    (conversation(failed_calls=4), "error", "All 4 Claude calls failed"),
+    (conversation(calls=1, exception=RuntimeError("API down")), "error", "RuntimeError: API down")
+])
+def test_sessions_are_classified_by_what_failed(isolated, monkeypatch, session, status, error):
+    monkeypatch.setattr(ConversationCoordinator, "start_conversation", session)
+    result = asyncio.run(run_session({"id": "a", "profile": PROFILE, "answers": {}}, keep_transcript=True))
+    assert result["status"] == status
+    assert result.get("error") == error
+    assert result["critical_path"] == ["analyses"] and result["phase_times"] == {"discussion": 0.1}
+    assert "Planning your career..." in result["transcript"]
+
+class CountingInput(io.StringIO):
+    """Input file that counts the lines read from it"""
+
+    def __init__(self, lines):
+        super().__init__("".join(line + "\n" for line in lines))
+        self.lines_read = 0
+
+    def readline(self, *args):
+        line = super().readline(*args)
+        self.lines_read += bool(line)
+        return line
+
+def test_intakes_are_read_only_as_fast_as_sessions_start(isolated, monkeypatch):
+    intakes = CountingInput(json.dumps({"id": str(i), "profile": PROFILE}) for i in range(20))
+    output = io.StringIO()
+
+    async def run():
+        release = asyncio.Event()
+        started = []
+
+        async def session(intake, keep_transcript=False):
+            started.append(intake["id"])
+            await release.wait()
+            return {"id": intake["id"], "status": "ok", "usage": {"cost_usd": 0.01}}
+
+        monkeypatch.setattr(headless_runner, "run_session", session)
+        batch = asyncio.create_task(run_batch(intakes, output, concurrency=2))
+        await asyncio.sleep(0.1)
+        # Two sessions running, two intakes queued and one waiting to be queued
+        read_while_busy = intakes.lines_read
+        assert len(started) == 2
+        release.set()
+        return read_while_busy, await batch
+
+    read_while_busy, stats = asyncio.run(run())
+    assert read_while_busy == 5
+    assert stats["sessions"] == 20 and stats["failed"] == 0
+    assert stats["cost_usd"] == pytest.approx(0.2)
+    assert len(output.getvalue().splitlines()) == 20
+
+def test_invalid_lines_are_reported_and_skipped(isolated, monkeypatch):
+    async def session(intake, keep_transcript=False):
+        return {"id": intake["id"], "status": "degraded" if intake["id"] == "b" else "ok"}
+
+    monkeypatch.setattr(headless_runner, "run_session", session)
+    intakes = io.StringIO("\n".join([json.dumps({"id": "a", "profile": PROFILE}), "", "{not json",
+                                     json.dumps({"id": "b", "profile": PROFILE}), json.dumps({"id": "c"})]) + "\n")
+    output = io.StringIO()
+    stats = asyncio.run(run_batch(intakes, output, concurrency=3))
+    results = {result["id"]: result for result in map(json.loads, output.getvalue().splitlines())}
+    assert set(results) == {"a", "3", "b", "5"}
+    assert results["3"]["status"] == "error" and results["3"]["error"].startswith("Invalid intake on line 3")
+    assert "\"profile\" object" in results["5"]["error"]
+    assert (stats["sessions"], stats["failed"], stats["degraded"]) == (4, 2, 1)
+    assert metrics.get_metrics().counter("headless_sessions_total", "").value(status="error") == 2
@@ -0,0 +1,88 @@
+import json
+import logging
+import queue
+import pytest
+from src.utils import log_config
+from src.utils.log_config import DeferredQueueHandler, LazyJson, configure_logging, should_log_payload, stop_logging
+from src.utils.usage_ledger import usage_context
+
+@pytest.fixture
+def log_path(tmp_path):
+    stop_logging()
+    path = tmp_path / "planner.log"
+    configure_logging(str(path))
+    yield path
+    stop_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+
+def read_lines(path):
+    # Stopping the listener drains the queue to the file
+    stop_logging()
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_records_are_written_as_json_lines_with_usage_tags(log_path):
+    logger = logging.getLogger("test_log_config")
+    with usage_context(session="s1", phase="interview", principal="Vision Principal"):
+        logger.info("tagged %s", "message")
+    logger.warning("untagged")
+
+    tagged, untagged = read_lines(log_path)
+    assert tagged["message"] == "tagged message" and tagged["level"] == "INFO"
+    assert (tagged["session"], tagged["phase"], tagged["principal"]) == ("s1", "interview", "Vision Principal")
+    assert untagged["message"] == "untagged" and "session" not in untagged
+
+def test_records_are_queued_unformatted():
+    records = queue.SimpleQueue()
+    formatted = []
+
+    class Payload:
+        def __str__(self):
+            formatted.append(True)
+            return "payload"
+
+    with usage_context(session="s1"):
+        DeferredQueueHandler(records).emit(
+            logging.LogRecord("test_log_config", logging.INFO, __file__, 1, "sent %s", (Payload(),), None)
+        )
+    record = records.get_nowait()
+    # Formatting is left to the listener thread
+    assert not formatted and record.msg == "sent %s" and len(record.args) == 1
+    assert record.usage_tags == {"session": "s1"}
+
+def test_configure_logging_is_idempotent(log_path):
+    listener = log_config._listener
+    assert configure_logging() is listener
+    assert sum(isinstance(handler, DeferredQueueHandler) for handler in logging.getLogger().handlers) == 1
+
+def test_lazy_json_serializes_only_when_written(log_path):
+    serialized = []
+
+    class Payload:
+        # Not JSON serializable, so json.dumps falls back to str()
+        def __str__(self):
+            serialized.append(True)
+            return "payload"
+
+    logger = logging.getLogger("test_log_config")
+    logger.debug("skipped %s", LazyJson({"a": Payload()}))
+    assert not serialized
+    logger.info("kept %s", LazyJson({"a": Payload()}))
+    assert read_lines(log_path)[-1]["message"] == 'kept {"a": "payload"}'
+    assert serialized
+
+def test_payload_logging_is_opt_in(monkeypatch):
+    logger = logging.getLogger("test_log_config.payloads")
+    logger.setLevel(logging.DEBUG)
+    monkeypatch.delenv("LOG_PAYLOADS", raising=False)
+    assert not should_log_payload(logger)
+    monkeypatch.setenv("LOG_PAYLOADS", "true")
+    monkeypatch.setenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0")
+    assert should_log_payload(logger)
+    monkeypatch.setenv("LOG_PAYLOAD_SAMPLE_RATE", "0")
+    assert not should_log_payload(logger)
+    logger.setLevel(logging.INFO)
+    monkeypatch.setenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0")
+    assert not should_log_payload(logger)
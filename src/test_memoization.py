@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from aiohttp import web
+from src.agents.financial_principal import FinancialPrincipal
+from src.core.headless_runner import run_session
+from src.utils import claude_client, client_registry, memoization, rate_limiter
+from src.utils.client_registry import ClientRegistry
+from src.utils.memoization import Memoizer, MemoPolicy
+from src.utils.mock_messages_server import MockMessagesServer
+from src.utils.prompt_cache import without_volatile_fields
+from src.utils.rate_limiter import AdaptiveRateLimiter
+
+INTAKE = {
+    "id": "memo",
+    "profile": {"name": "Ada", "current_role": "Engineer", "experience_years": 5, "education": "BS", "industry": "Software"},
+    "answers": ["Lead a platform team", "Mentoring engineers"]
+}
+
+@pytest.fixture
+def memoized_process(tmp_path, monkeypatch):
+    """Fresh process-wide client, limiter and memoizer, with every call site memoized"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("SESSION_JOURNAL_DIR", str(tmp_path / "sessions"))
+    monkeypatch.delenv("CLAUDE_TRANSPORT", raising=False)
+    monkeypatch.setattr(client_registry, "_default_registry", ClientRegistry(batch=False))
+    monkeypatch.setattr(rate_limiter, "_default_limiter", AdaptiveRateLimiter(requests_per_minute=10000,
+                                                                             tokens_per_minute=10 ** 7))
+    monkeypatch.setattr(claude_client, "_shared_http_client", None)
+    memoizer = Memoizer(MemoPolicy(default_ttl=3600), cache_dir=str(tmp_path / "memo"))
+    monkeypatch.setattr(memoization, "_default_memoizer", memoizer)
+    return memoizer
+
+def test_a_rerun_of_the_same_session_is_served_from_the_memo(memoized_process, monkeypatch):
+    server = MockMessagesServer(latency_median=0.001, latency_sigma=0, token_interval=0,
+                                requests_per_minute=10000, input_tokens_per_minute=10 ** 7)
+
+    async def run():
+        runner = web.AppRunner(server.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", f"http://127.0.0.1:{port}")
+        try:
+            sessions = []
+            for _ in range(2):
+                # Read the savings before run_session releases them
+                monkeypatch.setattr(memoized_process, "release_session", lambda session: None)
+                result = await run_session(INTAKE)
+                sessions.append((result, memoized_process.session_savings(result["session_id"])))
+            return sessions
+        finally:
+            await claude_client.close_shared_http_client()
+            await runner.cleanup()
+
+    (first, first_savings), (second, second_savings) = asyncio.run(run())
+    assert first["status"] == second["status"] == "ok"
+    requests = server.stats["requests"]
+    assert requests > 0 and first_savings["misses"] == requests and first_savings["hits"] == 0
+    # Every call of the second run, including the discussion, consensus and roadmap sections, hits
+    assert second_savings["misses"] == 0 and second_savings["hits"] == requests
+    assert server.stats["requests"] == requests
+    assert second["report"] == first["report"]
+
+def test_the_same_user_keeps_the_same_wallet(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    principal = FinancialPrincipal()
+    wallet = principal._generate_user_wallet(INTAKE["profile"])
+    assert wallet == principal._generate_user_wallet(dict(INTAKE["profile"]))
+    assert wallet["wallet_id"] != principal._generate_user_wallet({**INTAKE["profile"], "name": "Grace"})["wallet_id"]
+
+def test_volatile_fields_are_left_out_of_prompts():
+    consensus = {"consensus_document": "agreed", "timestamp": "2026-01-01T00:00:00",
+                 "discussion_points": [{"topic": "growth", "timestamp": "2026-01-01T00:00:01"}]}
+    assert without_volatile_fields(consensus) == {"consensus_document": "agreed",
+                                                  "discussion_points": [{"topic": "growth"}]}
+    assert "timestamp" in consensus
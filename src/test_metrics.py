@@ -0,0 +1,114 @@
+import asyncio
+import math
+import urllib.error
+import urllib.request
+import pytest
+from types import SimpleNamespace
+from src.utils import metrics
+from src.utils.claude_client import ClaudeClient, DEFAULT_MODEL
+from src.utils.metrics import MetricsRegistry, start_metrics_server
+from src.utils.token_budget import TokenBudget
+from src.utils.usage_ledger import UsageLedger
+
+def test_render_follows_the_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("claude_requests_total", "Completed calls").inc(2, call_site="_discuss_topic")
+    registry.gauge("claude_requests_in_flight", "Calls holding a slot").set(3)
+    latency = registry.summary("claude_request_duration_seconds", "Call latency")
+    for value in range(1, 101):
+        latency.observe(value / 100, call_site="analyze")
+
+    lines = registry.render().splitlines()
+    assert lines[:3] == ["# HELP claude_requests_total Completed calls",
+                         "# TYPE claude_requests_total counter",
+                         'claude_requests_total{call_site="_discuss_topic"} 2']
+    assert "# TYPE claude_requests_in_flight gauge" in lines and "claude_requests_in_flight 3" in lines
+    assert "# TYPE claude_request_duration_seconds summary" in lines
+    assert 'claude_request_duration_seconds{call_site="analyze",quantile="0.5"} 0.5' in lines
+    assert 'claude_request_duration_seconds{call_site="analyze",quantile="0.99"} 0.99' in lines
+    assert 'claude_request_duration_seconds_sum{call_site="analyze"} 50.5' in lines
+    assert 'claude_request_duration_seconds_count{call_site="analyze"} 100' in lines
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors").inc(error_type='Bad "quote"\\\n')
+    assert 'errors_total{error_type="Bad \\"quote\\"\\\\\\n"} 1' in registry.render().splitlines()
+
+def test_the_summary_window_only_keeps_recent_observations():
+    summary = MetricsRegistry().summary("latency", "Latency", window=2)
+    assert math.isnan(summary.quantile(0.5))
+    for value in (10.0, 1.0, 2.0):
+        summary.observe(value)
+    assert summary.quantile(0.99) == 2.0
+    # The count and sum still cover every observation
+    assert summary.counts[()] == 3 and summary.sums[()] == 13.0
+
+def test_the_same_name_returns_the_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("calls_total", "Calls") is registry.counter("calls_total", "Calls")
+
+def test_dump_replaces_the_metrics_file(tmp_path):
+    registry = MetricsRegistry()
+    calls = registry.counter("calls_total", "Calls")
+    path = tmp_path / "metrics" / "claude.prom"
+    calls.inc()
+    registry.dump(str(path))
+    calls.inc()
+    registry.dump(str(path))
+    assert "calls_total 2" in path.read_text().splitlines()
+    assert not (tmp_path / "metrics" / "claude.prom.tmp").exists()
+
+def test_the_metrics_server_serves_only_metrics():
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Calls").inc()
+    server = start_metrics_server(registry, 0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "calls_total 1" in response.read().decode("utf-8").splitlines()
+        with pytest.raises(urllib.error.HTTPError) as missing:
+            urllib.request.urlopen(f"{base}/")
+        assert missing.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_claude_calls_are_counted_by_call_site(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics, "_default_registry", registry)
+    client = ClaudeClient()
+    client.ledger = UsageLedger(str(tmp_path))
+    client.budget = TokenBudget(session_limit=0, call_limit=0)
+    usage = SimpleNamespace(input_tokens=100, output_tokens=20, cache_read_input_tokens=300,
+                            cache_creation_input_tokens=0)
+
+    class Raw:
+        headers = {}
+
+        def parse(self):
+            return SimpleNamespace(content=[SimpleNamespace(text="ok")], usage=usage, stop_reason="end_turn",
+                                   model=DEFAULT_MODEL)
+
+    async def create(**request):
+        if request["messages"][0]["content"] == "fail":
+            raise RuntimeError("API down")
+        return Raw()
+
+    client.client = SimpleNamespace(base_url=client.client.base_url,
+                                    messages=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+
+    async def run():
+        for question in ("first", "second"):
+            await client.get_response([{"role": "user", "content": question}], 100, call_site="_discuss_topic")
+        with pytest.raises(RuntimeError):
+            await client.get_response([{"role": "user", "content": "fail"}], 100, call_site="_discuss_topic")
+
+    asyncio.run(run())
+    assert client.calls.value(call_site="_discuss_topic") == 2
+    assert client.call_errors.value(call_site="_discuss_topic", error_type="RuntimeError") == 1
+    assert client.call_tokens.value(call_site="_discuss_topic", kind="output") == 40
+    assert client.call_latency.counts[(("call_site", "_discuss_topic"),)] == 2
+    assert client.cache_hit_ratio.value(call_site="_discuss_topic") == 0.75
+    assert 'claude_requests_total{call_site="_discuss_topic"} 2' in registry.render().splitlines()
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from src.utils import claude_client, client_registry, memoization, rate_limiter
+from src.utils.client_registry import ClientRegistry
+from src.utils.load_test import format_report, percentile, run_load
+from src.utils.memoization import Memoizer, MemoPolicy
+from src.utils.mock_messages_server import MockMessagesServer
+from src.utils.rate_limiter import AdaptiveRateLimiter
+
+def fast_server(**options):
+    return MockMessagesServer(**{"latency_median": 0.001, "latency_sigma": 0, "token_interval": 0,
+                                 "requests_per_minute": 10000, "input_tokens_per_minute": 10 ** 7, **options})
+
+def serve(server, test):
+    async def run():
+        async with TestClient(TestServer(server.build_app())) as client:
+            return await test(client)
+
+    return asyncio.run(run())
+
+def body(**params):
+    return {"model": "claude", "max_tokens": 1000, "messages": [{"role": "user", "content": "Plan my career"}], **params}
+
+def test_messages_report_usage_and_rate_limit_headers():
+    async def test(client):
+        response = await client.post("/v1/messages", json=body())
+        return response.status, dict(response.headers), await response.json()
+
+    status, headers, message = serve(fast_server(output_tokens=50), test)
+    assert status == 200
+    assert message["stop_reason"] == "end_turn" and message["content"][0]["text"]
+    assert message["usage"]["input_tokens"] > 0 and 0 < message["usage"]["output_tokens"] <= 50
+    assert headers["anthropic-ratelimit-requests-limit"] == "10000"
+    assert int(headers["anthropic-ratelimit-requests-remaining"]) == 9999
+
+def test_answers_longer_than_max_tokens_are_cut_off():
+    async def test(client):
+        return await (await client.post("/v1/messages", json=body(max_tokens=5))).json()
+
+    message = serve(fast_server(output_tokens=200), test)
+    assert message["stop_reason"] == "max_tokens"
+    assert message["usage"]["output_tokens"] <= 5
+
+def test_a_repeated_cached_prefix_is_read_from_the_cache():
+    cached = body(system=[{"type": "text", "text": "You are a career coach. " * 50, "cache_control": {"type": "ephemeral"}}])
+
+    async def test(client):
+        first = await (await client.post("/v1/messages", json=cached)).json()
+        second = await (await client.post("/v1/messages", json=cached)).json()
+        return first["usage"], second["usage"]
+
+    first, second = serve(fast_server(), test)
+    assert first["cache_creation_input_tokens"] > 0 and first["cache_read_input_tokens"] == 0
+    assert second["cache_read_input_tokens"] == first["cache_creation_input_tokens"]
+    assert second["cache_creation_input_tokens"] == 0
+
+def test_streamed_deltas_add_up_to_the_message():
+    async def test(client):
+        response = await client.post("/v1/messages", json=body(stream=True))
+        return response.headers["content-type"], await response.text()
+
+    content_type, text = serve(fast_server(), test)
+    assert content_type.startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in text.strip().split("\n\n")
+    ]
+    names = [name for name, _ in events]
+    assert names[:2] == ["message_start", "content_block_start"]
+    assert names[-3:] == ["content_block_stop", "message_delta", "message_stop"]
+    deltas = "".join(data["delta"]["text"] for name, data in events if name == "content_block_delta")
+    assert deltas and len(deltas.split(" ")) == names.count("content_block_delta")
+    assert events[-2][1]["usage"]["output_tokens"] > 0
+
+@pytest.mark.parametrize("option, status, error_type", [
+    ("error_429_rate", 429, "rate_limit_error"),
+    ("error_529_rate", 529, "overloaded_error")
+])
+def test_injected_errors(option, status, error_type):
+    server = fast_server(**{option: 1.0})
+
+    async def test(client):
+        response = await client.post("/v1/messages", json=body())
+        return response.status, response.headers.get("retry-after"), await response.json()
+
+    got_status, retry_after, error = serve(server, test)
+    assert got_status == status and error["error"]["type"] == error_type
+    # Only a 429 says when to come back
+    assert (retry_after is not None) == (status == 429)
+
+def test_requests_over_the_per_minute_limit_are_rejected():
+    async def test(client):
+        return [(await client.post("/v1/messages", json=body())).status for _ in range(3)]
+
+    server = fast_server(requests_per_minute=2)
+    assert serve(server, test) == [200, 200, 429]
+    assert server.stats["rate_limited"] == 1
+
+def test_batches_end_and_return_one_result_per_request():
+    requests = [{"custom_id": f"req-{i}", "params": body()} for i in range(3)]
+
+    async def test(client):
+        batch = await (await client.post("/v1/messages/batches", json={"requests": requests})).json()
+        assert batch["processing_status"] == "in_progress"
+        assert batch["request_counts"]["processing"] == 3
+        early = await client.get(f"/v1/messages/batches/{batch['id']}/results")
+        assert early.status == 404
+        while batch["processing_status"] != "ended":
+            await asyncio.sleep(0.01)
+            batch = await (await client.get(f"/v1/messages/batches/{batch['id']}")).json()
+        results = await (await client.get(f"/v1/messages/batches/{batch['id']}/results")).text()
+        missing = await client.get("/v1/messages/batches/msgbatch_unknown")
+        return batch, [json.loads(line) for line in results.splitlines()], missing.status
+
+    batch, results, missing = serve(fast_server(), test)
+    assert batch["request_counts"]["succeeded"] == 3 and batch["results_url"].endswith("/results")
+    assert [result["custom_id"] for result in results] == ["req-0", "req-1", "req-2"]
+    assert all(result["result"]["type"] == "succeeded" for result in results)
+    assert missing == 404
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile([float(i) for i in range(1, 101)], 95) == 95.0
+    assert percentile([1.0, 2.0], 99) == 2.0
+
+@pytest.fixture
+def fresh_process(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.delenv("CLAUDE_TRANSPORT", raising=False)
+    monkeypatch.setattr(client_registry, "_default_registry", ClientRegistry(batch=False))
+    monkeypatch.setattr(rate_limiter, "_default_limiter", AdaptiveRateLimiter(requests_per_minute=10000,
+                                                                             tokens_per_minute=10 ** 7))
+    monkeypatch.setattr(memoization, "_default_memoizer", Memoizer(MemoPolicy(), cache_dir=str(tmp_path / "memo")))
+    monkeypatch.setattr(claude_client, "_shared_http_client", None)
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_load_test_against_the_mock_server(fresh_process, monkeypatch, stream):
+    server = fast_server(output_tokens=20)
+
+    async def run():
+        runner = web.AppRunner(server.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}")
+        try:
+            return await run_load(requests=12, concurrency=4, stream=stream, max_tokens=50)
+        finally:
+            await claude_client.close_shared_http_client()
+            await runner.cleanup()
+
+    report = asyncio.run(run())
+    assert report["requests"] == report["succeeded"] == 12 and not report["errors"]
+    assert server.stats["requests"] == 12 and server.stats["streamed"] == (12 if stream else 0)
+    assert report["latency"][50] <= report["latency"][99]
+    assert (report["ttft"] is not None) == stream
+    text = format_report(report)
+    assert text.startswith("Requests: 12/12 succeeded")
+    assert ("Time to first token" in text) == stream
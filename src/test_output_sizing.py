@@ -0,0 +1,95 @@
+import json
+import pytest
+from src.utils.output_sizing import OutputSizer, DEFAULT_MAX_TOKENS
+from src.utils.usage_ledger import UsageLedger
+
+@pytest.fixture(autouse=True)
+def live_transport(monkeypatch):
+    monkeypatch.delenv("CLAUDE_TRANSPORT", raising=False)
+    monkeypatch.delenv("OUTPUT_SIZING", raising=False)
+
+def sizer(**options):
+    return OutputSizer(**{"percentile": 95, "headroom": 1.25, "min_samples": 5, "ceiling": 8192, **options})
+
+def test_hint_is_used_until_enough_samples():
+    output_sizer = sizer()
+    for tokens in [100, 100, 100, 100]:
+        output_sizer.observe("site", tokens)
+    assert output_sizer.max_tokens_for("site", 700) == 700
+    assert output_sizer.max_tokens_for("other") == DEFAULT_MAX_TOKENS
+    output_sizer.observe("site", 100)
+    assert output_sizer.max_tokens_for("site", 700) == 128
+
+def test_limit_is_the_percentile_with_headroom_rounded_up_to_64():
+    output_sizer = sizer()
+    for tokens in range(1, 101):
+        output_sizer.observe("site", tokens)
+    # p95 of 1..100 is 95; 95 * 1.25 = 118.75, rounded up to 128
+    assert output_sizer.max_tokens_for("site", 1000) == 128
+    output_sizer = sizer(percentile=50)
+    for tokens in range(1, 101):
+        output_sizer.observe("site", tokens)
+    # p50 is 50; 62.5 rounds up to 64
+    assert output_sizer.max_tokens_for("site") == 64
+
+def test_limit_is_clamped():
+    small = sizer(floor=256)
+    large = sizer(ceiling=2048)
+    for _ in range(5):
+        small.observe("site", 10)
+        large.observe("site", 100000)
+    assert small.max_tokens_for("site") == 256
+    assert large.max_tokens_for("site") == 2048
+
+def test_window_keeps_only_recent_samples():
+    output_sizer = sizer(window=5)
+    for tokens in [4000] * 5 + [100] * 5:
+        output_sizer.observe("site", tokens)
+    assert output_sizer.max_tokens_for("site") == 128
+
+def test_sizing_is_off_when_recording_or_replaying(monkeypatch):
+    for mode in ["record", "replay"]:
+        monkeypatch.setenv("CLAUDE_TRANSPORT", mode)
+        output_sizer = sizer()
+        for _ in range(10):
+            output_sizer.observe("site", 100)
+        # The request body must be the same on every run
+        assert output_sizer.max_tokens_for("site", 1000) == 1000
+    monkeypatch.setenv("CLAUDE_TRANSPORT", "live")
+    monkeypatch.setenv("OUTPUT_SIZING", "false")
+    assert not sizer().enabled
+
+def test_seeding_skips_continuations_and_doubles_truncated_responses():
+    output_sizer = sizer(min_samples=1, headroom=1.0, percentile=100)
+    output_sizer.load_records([
+        {"call_site": "site", "output_tokens": 640, "stop_reason": "end_turn"},
+        {"call_site": "site", "output_tokens": 5000, "stop_reason": "end_turn", "continuation": 1},
+        {"call_site": "cut", "output_tokens": 640, "stop_reason": "max_tokens"}
+    ])
+    assert output_sizer.max_tokens_for("site") == 640
+    assert output_sizer.max_tokens_for("cut") == 1280
+
+def write_ledger(tmp_path, count):
+    ledger = UsageLedger(str(tmp_path))
+    with open(ledger.path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps({"call_site": "site", "output_tokens": i + 1}) + "\n")
+    return ledger
+
+def test_recent_records_skip_the_partial_first_line(tmp_path):
+    ledger = write_ledger(tmp_path, 100)
+    line_length = len(json.dumps({"call_site": "site", "output_tokens": 100}) + "\n")
+    # A window starting mid-line drops that line rather than misreading it
+    records = ledger.load_recent_records(3 * line_length - 5)
+    assert [record["output_tokens"] for record in records] == [99, 100]
+
+def test_recent_records_keep_a_line_the_window_starts_exactly_on(tmp_path):
+    ledger = write_ledger(tmp_path, 100)
+    line_length = len(json.dumps({"call_site": "site", "output_tokens": 100}) + "\n")
+    records = ledger.load_recent_records(3 * line_length)
+    assert [record["output_tokens"] for record in records] == [98, 99, 100]
+
+def test_recent_records_read_a_small_ledger_whole(tmp_path):
+    ledger = write_ledger(tmp_path, 5)
+    assert len(ledger.load_recent_records(10 ** 6)) == 5
+    assert UsageLedger(str(tmp_path / "empty")).load_recent_records(1000) == []
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import pytest
+from src.core.pipeline import Pipeline
+
+def sleeper(result, seconds=0.0, text=None, calls=None):
+    async def run(*inputs):
+        if calls is not None:
+            calls.append((result, inputs))
+        await asyncio.sleep(seconds)
+        if text is not None:
+            print(text)
+        return result
+    return run
+
+def test_independent_tasks_run_concurrently():
+    pipeline = Pipeline(max_concurrency=4)
+    calls = []
+    pipeline.add("a", sleeper("A", 0.2))
+    pipeline.add("b", sleeper("B", 0.2))
+    pipeline.add("joined", sleeper("AB", calls=calls), inputs=["a", "b"])
+
+    started = time.perf_counter()
+    results = asyncio.run(pipeline.run())
+    assert time.perf_counter() - started < 0.35
+    assert results == {"a": "A", "b": "B", "joined": "AB"}
+    # Inputs are passed in the order they were declared
+    assert calls == [("AB", ("A", "B"))]
+    assert pipeline.report.critical_path[-1] == "joined"
+
+def test_concurrency_limit_is_respected():
+    pipeline = Pipeline(max_concurrency=2)
+    running = []
+    peak = []
+
+    def task():
+        async def run():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+        return run
+
+    for i in range(6):
+        pipeline.add(f"t{i}", task())
+    asyncio.run(pipeline.run())
+    assert max(peak) == 2
+
+def test_output_is_presented_in_task_order(capsys):
+    pipeline = Pipeline(max_concurrency=4)
+    pipeline.add("slow", sleeper(None, 0.1, text="first"))
+    pipeline.add("fast", sleeper(None, 0.0, text="second"))
+    asyncio.run(pipeline.run())
+    assert capsys.readouterr().out == "first\nsecond\n"
+
+def test_failure_skips_dependents_and_is_raised_after_the_rest():
+    pipeline = Pipeline(max_concurrency=4)
+    calls = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    pipeline.add("broken", fail)
+    pipeline.add("dependent", sleeper("D", calls=calls), inputs=["broken"])
+    pipeline.add("transitive", sleeper("T", calls=calls), inputs=["dependent"])
+    pipeline.add("independent", sleeper("I", 0.05, calls=calls))
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(pipeline.run())
+    assert calls == [("I", ())]
+    assert list(pipeline.report.errors) == ["broken"]
+    assert "independent" in pipeline.report.finished
+
+def test_completed_tasks_are_not_run_again(capsys):
+    pipeline = Pipeline(max_concurrency=4)
+    calls = []
+    pipeline.add("done", sleeper("fresh", text="rerun", calls=calls))
+    pipeline.add("next", sleeper("N", text="next", calls=calls), inputs=["done"])
+    completed = []
+
+    results = asyncio.run(pipeline.run(
+        completed={"done": "restored"}, on_complete=lambda name, result: completed.append((name, result))
+    ))
+    assert results == {"done": "restored", "next": "N"}
+    assert calls == [("N", ("restored",))]
+    assert completed == [("next", "N")]
+    assert pipeline.report.restored == ["done"]
+    assert capsys.readouterr().out == "next\n"
+
+def test_tasks_must_follow_their_inputs():
+    pipeline = Pipeline()
+    with pytest.raises(ValueError):
+        pipeline.add("late", sleeper(None), inputs=["missing"])
+    pipeline.add("a", sleeper(None))
+    with pytest.raises(ValueError):
+        pipeline.add("a", sleeper(None))
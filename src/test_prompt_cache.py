@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from src.agents.background_principal import BackgroundPrincipal
+from src.agents.financial_principal import FinancialPrincipal
+from src.agents.vision_principal import VisionPrincipal
+from src.core.conversation_coordinator import ConversationCoordinator, COORDINATOR_SYSTEM_PROMPT
+from src.utils.prompt_cache import CACHE_CONTROL, cached_context_message
+
+@pytest.fixture
+def coordinator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    coordinator = ConversationCoordinator()
+    for principal in (VisionPrincipal(), BackgroundPrincipal(), FinancialPrincipal()):
+        coordinator.add_principal(principal)
+    coordinator.sent = []
+
+    async def get_response(messages, max_tokens=None, *, call_site, system=None, stop_sequences=None):
+        coordinator.sent.append(system)
+        return "insights"
+
+    monkeypatch.setattr(coordinator.claude, "get_response", get_response)
+    return coordinator
+
+def test_principal_insights_are_sent_with_that_principals_system_prompt(coordinator):
+    async def run():
+        for name in coordinator.principals:
+            await coordinator._present_principal_insights(name, {"career_vision_summary": "Lead a team"})
+
+    asyncio.run(run())
+    prompts = [principal.system_prompt for principal in coordinator.principals.values()]
+    assert all(prompts) and len(set(prompts)) == 3
+    assert coordinator.sent == prompts
+
+def test_unknown_principal_falls_back_to_the_coordinator_prompt(coordinator):
+    asyncio.run(coordinator._present_principal_insights("Guest Principal", {}))
+    assert coordinator.sent == [COORDINATOR_SYSTEM_PROMPT]
+
+def test_system_prompt_is_sent_as_a_cached_block(coordinator):
+    system = coordinator.principals["Vision Principal"].system_prompt
+    request = coordinator.claude._build_request([{"role": "user", "content": "hi"}], 100, system)
+    assert request["system"] == [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+
+def test_context_blocks_are_cached_ahead_of_the_prompt():
+    message = cached_context_message(["profile", "", "analyses"], "task")
+    assert [block["text"] for block in message["content"]] == ["profile", "analyses", "task"]
+    assert [("cache_control" in block) for block in message["content"]] == [True, True, False]
+    with pytest.raises(ValueError):
+        cached_context_message(["a", "b", "c", "d"], "task")
@@ -0,0 +1,88 @@
+import asyncio
+import time
+import pytest
+from src.utils.rate_limiter import TokenBucket, AdaptiveConcurrency, AdaptiveRateLimiter
+
+class Throttled(Exception):
+    status_code = 429
+
+def test_bucket_waits_for_refill_once_drained():
+    async def run():
+        bucket = TokenBucket(per_minute=600)  # 10 per second
+        await bucket.acquire(600)
+        started = time.monotonic()
+        await bucket.acquire(1)
+        return time.monotonic() - started
+
+    assert 0.05 <= asyncio.run(run()) < 1.0
+
+def test_bucket_request_larger_than_capacity_does_not_hang():
+    async def run():
+        bucket = TokenBucket(per_minute=6000)
+        await asyncio.wait_for(bucket.acquire(10 ** 9), timeout=1)
+        return bucket.tokens
+
+    assert asyncio.run(run()) < 1
+
+def test_bucket_sync_follows_reported_limits():
+    bucket = TokenBucket(per_minute=50)
+    bucket.sync(limit=1000, remaining=3)
+    assert bucket.capacity == 1000
+    assert bucket.rate == pytest.approx(1000 / 60)
+    assert bucket.tokens == 3
+
+def test_concurrency_grows_additively_and_shrinks_multiplicatively():
+    concurrency = AdaptiveConcurrency(initial=4, maximum=8)
+    for _ in range(4):
+        concurrency.increase()
+    # Roughly one slot per window of `limit` successes
+    grown = concurrency.limit
+    assert 4.5 < grown < 5.5
+    concurrency.decrease()
+    assert concurrency.limit == grown / 2
+    for _ in range(10):
+        concurrency.decrease()
+    assert concurrency.limit == concurrency.minimum
+    for _ in range(1000):
+        concurrency.increase()
+    assert concurrency.limit == concurrency.maximum
+
+def test_concurrency_holds_callers_over_the_limit():
+    async def run():
+        concurrency = AdaptiveConcurrency(initial=2, maximum=2)
+        await concurrency.acquire()
+        await concurrency.acquire()
+        waiter = asyncio.create_task(concurrency.acquire())
+        await asyncio.sleep(0.01)
+        blocked = not waiter.done()
+        await concurrency.release()
+        await asyncio.wait_for(waiter, timeout=1)
+        return blocked, concurrency.in_flight
+
+    assert asyncio.run(run()) == (True, 2)
+
+def test_throttled_call_halves_concurrency_and_frees_its_slot():
+    async def run():
+        limiter = AdaptiveRateLimiter(requests_per_minute=1000, tokens_per_minute=100000, max_concurrency=8)
+        before = limiter.concurrency.limit
+        with pytest.raises(Throttled):
+            async with limiter.slot(10):
+                raise Throttled()
+        return before, limiter.concurrency.limit, limiter.concurrency.in_flight, limiter.stats["throttled"]
+
+    before, after, in_flight, throttled = asyncio.run(run())
+    assert after == before / 2
+    assert (in_flight, throttled) == (0, 1)
+
+def test_exhausted_headers_back_off_before_a_429():
+    limiter = AdaptiveRateLimiter(requests_per_minute=1000, tokens_per_minute=100000, max_concurrency=8)
+    before = limiter.concurrency.limit
+    limiter.observe_headers({
+        "anthropic-ratelimit-requests-limit": "50",
+        "anthropic-ratelimit-requests-remaining": "0",
+        "anthropic-ratelimit-input-tokens-limit": "40000",
+        "anthropic-ratelimit-input-tokens-remaining": "100"
+    })
+    assert limiter.requests.capacity == 50 and limiter.requests.tokens == 0
+    assert limiter.tokens.tokens == 100
+    assert limiter.concurrency.limit == before * 0.75
@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+from src.core.conversation_coordinator import ConversationCoordinator
+from src.utils.response_cache import ResponseCache
+
+PROFILE = {"name": "Ada", "current_role": "Engineer", "experience_years": "5", "education": "BS", "industry": "Software"}
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    cache = ResponseCache(str(tmp_path / "cache"))
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def coordinator(cache, monkeypatch):
+    calls = []
+
+    async def get_response(messages, max_tokens=None, *, call_site, system=None, stop_sequences=None):
+        calls.append(call_site)
+        return '{"career_stage": "mid_career"}' if call_site == "_get_career_stage_analysis" else "Lead the platform."
+
+    def make():
+        coordinator = ConversationCoordinator()
+        coordinator.response_cache = cache
+        coordinator.user_info = dict(PROFILE)
+        monkeypatch.setattr(coordinator.claude, "get_response", get_response)
+        return coordinator
+
+    make.calls = calls
+    return make
+
+def test_a_cached_personalized_response_makes_no_claude_calls(coordinator, capsys):
+    asyncio.run(coordinator()._show_personalized_response("current_role", "Engineer"))
+    # The role context needs its own call, on a miss only
+    assert coordinator.calls == ["_get_career_stage_analysis", "_show_personalized_response"]
+
+    coordinator.calls.clear()
+    second = coordinator()
+    asyncio.run(second._show_personalized_response("current_role", "Engineer"))
+    assert coordinator.calls == []
+    assert second.current_context["current_role_insight"] == "Lead the platform"
+    assert capsys.readouterr().out.count("Lead the platform.") == 2
+
+def test_personalized_responses_are_keyed_on_the_answers(coordinator):
+    asyncio.run(coordinator()._show_personalized_response("industry", "Software"))
+    other = coordinator()
+    other.user_info["industry"] = "Healthcare"
+    asyncio.run(other._show_personalized_response("industry", "Healthcare"))
+    assert coordinator.calls == ["_show_personalized_response"] * 2
+
+def test_the_basic_info_interview_makes_no_claude_calls(coordinator, monkeypatch):
+    answers = iter(["Ada", "Engineer", "5", "BS Computer Science", "Software"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    interviewer = coordinator()
+    interviewer.user_info = {}
+    asyncio.run(interviewer._gather_basic_info())
+    assert interviewer.user_info["industry"] == "Software"
+    assert coordinator.calls == []
+
+@pytest.fixture
+def stale_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_STALE_GRACE", "3600")
+    cache = ResponseCache(str(tmp_path / "stale"))
+    yield cache
+    cache.close()
+
+def counting_fetch(value, started=None, release=None):
+    async def fetch():
+        fetch.calls += 1
+        if started is not None:
+            started.set()
+        if release is not None:
+            await release.wait()
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    fetch.calls = 0
+    return fetch
+
+def test_fresh_entries_are_served_without_fetching(stale_cache):
+    stale_cache.set("k", "cached")
+    fetch = counting_fetch("fetched")
+    assert asyncio.run(stale_cache.get_or_refresh("k", fetch)) == "cached"
+    assert fetch.calls == 0
+
+def test_a_miss_waits_for_one_shared_fetch(stale_cache):
+    async def run():
+        release = asyncio.Event()
+        fetch = counting_fetch("fetched", release=release)
+        waiting = asyncio.gather(*(stale_cache.get_or_refresh("k", fetch) for _ in range(3)))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await waiting, fetch.calls
+
+    assert asyncio.run(run()) == (["fetched"] * 3, 1)
+    assert stale_cache.get("k") == "fetched"
+
+def test_a_stale_entry_is_served_at_once_and_refreshed_in_the_background(stale_cache):
+    stale_cache.set("k", "old", ttl=0)
+    assert stale_cache.get("k") is None
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+        fetch = counting_fetch("new", started, release)
+        served = await asyncio.wait_for(stale_cache.get_or_refresh("k", fetch), 1)
+        await started.wait()
+        # Still stale while the refresh runs, and the refresh is not started twice
+        assert await stale_cache.get_or_refresh("k", fetch) == "old"
+        release.set()
+        await stale_cache._refreshes["k"]
+        return served, fetch.calls
+
+    assert asyncio.run(run()) == ("old", 1)
+    assert stale_cache.get("k") == "new"
+
+def test_a_failed_background_refresh_keeps_the_stale_entry(stale_cache):
+    stale_cache.set("k", "old", ttl=0)
+
+    async def run():
+        fetch = counting_fetch(RuntimeError("API down"))
+        served = await stale_cache.get_or_refresh("k", fetch)
+        await asyncio.sleep(0.01)
+        # The next caller still gets the stale entry and tries the refresh again
+        served_again = await stale_cache.get_or_refresh("k", fetch)
+        await asyncio.sleep(0.01)
+        return served, served_again, fetch.calls
+
+    assert asyncio.run(run()) == ("old", "old", 2)
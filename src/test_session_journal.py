@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from src.core.conversation_coordinator import ConversationCoordinator
+from src.core.pipeline import Pipeline
+from src.utils.session_journal import SessionJournal
+
+PROFILE = {"name": "Ada", "current_role": "Engineer", "experience_years": 5, "education": "BS", "industry": "Software"}
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SESSION_JOURNAL_DIR", str(tmp_path / "sessions"))
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+
+def test_journal_round_trip_ignores_torn_last_line():
+    journal = SessionJournal("s1")
+    assert not journal.exists()
+    journal.append("user_info", key="name", value="Ada")
+    journal.append("step", name="analyses", result={"Vision": "ok"})
+    with open(journal.path, "a") as f:
+        f.write('{"event": "step", "name": "consen')
+
+    entries = SessionJournal("s1").load()
+    assert [entry["event"] for entry in entries] == ["user_info", "step"]
+    assert entries[1]["result"] == {"Vision": "ok"}
+
+def test_resume_restores_the_interview_and_completed_steps():
+    first = ConversationCoordinator()
+    first.load_intake(PROFILE, ["Lead a platform team"])
+    first._journal_step("analyses", {"Vision": "analysis"})
+    first._journal_step("consensus", {"summary": "agreed"})
+
+    resumed = ConversationCoordinator()
+    resumed.resume(first.session_id)
+    assert resumed.session_id == first.session_id
+    assert resumed.user_info == {key: str(value) for key, value in PROFILE.items()}
+    assert [entry["response"] for entry in resumed.conversation_history] == ["Lead a platform team"]
+    assert resumed.interview_complete
+    assert resumed.completed_steps == {"analyses": {"Vision": "analysis"}, "consensus": {"summary": "agreed"}}
+    assert resumed.current_context["consensus"] == {"summary": "agreed"}
+
+def test_resume_of_unknown_session_fails():
+    with pytest.raises(ValueError):
+        ConversationCoordinator().resume("no-such-session")
+
+def test_resumed_pipeline_runs_only_missing_steps(monkeypatch):
+    first = ConversationCoordinator()
+    first.load_intake(PROFILE, [])
+    first._journal_step("analyses", "journaled analyses")
+
+    ran = []
+
+    def build_pipeline():
+        pipeline = Pipeline()
+
+        async def analyses():
+            ran.append("analyses")
+            return "fresh analyses"
+
+        async def report(analyses):
+            ran.append(("report", analyses))
+            return "report"
+
+        pipeline.add("analyses", analyses)
+        pipeline.add("report", report, ["analyses"])
+        return pipeline
+
+    resumed = ConversationCoordinator()
+    resumed.resume(first.session_id)
+    monkeypatch.setattr(resumed, "_build_planning_pipeline", build_pipeline)
+    asyncio.run(resumed._run_planning_pipeline())
+
+    assert ran == [("report", "journaled analyses")]
+    assert resumed.pipeline_report.restored == ["analyses"]
+    # The newly finished step is journaled, so a second crash would not redo it
+    steps = [entry["name"] for entry in resumed.journal.load() if entry["event"] == "step"]
+    assert steps == ["analyses", "report"]
@@ -0,0 +1,65 @@
+import pytest
+from src.utils.token_budget import (
+    TokenEstimator, TokenBudget, TokenBudgetExceededError, context_field, trim_context, TRUNCATED_SUFFIX, OMITTED_PLACEHOLDER
+)
+
+def total_tokens(serialized, estimator):
+    return sum(estimator.estimate(text) for text in serialized.values())
+
+def test_trimmed_field_fits_budget_including_suffix():
+    estimator = TokenEstimator()
+    trimmed = trim_context([context_field("history", "x" * 10000, 1)], 1000, estimator)
+    assert trimmed["history"].endswith(TRUNCATED_SUFFIX)
+    assert total_tokens(trimmed, estimator) <= 1000
+
+def test_two_trimmed_fields_fit_budget():
+    estimator = TokenEstimator()
+    fields = [context_field("a", "a" * 10000, 1), context_field("b", "b" * 10000, 2)]
+    trimmed = trim_context(fields, 2000, estimator)
+    assert total_tokens(trimmed, estimator) <= 2000
+    # The lower priority field goes first; the higher priority one is only shortened
+    assert trimmed["a"] == OMITTED_PLACEHOLDER
+    assert trimmed["b"].endswith(TRUNCATED_SUFFIX)
+
+@pytest.mark.parametrize("budget", [60, 100, 999, 1000, 1001, 2857])
+@pytest.mark.parametrize("chars_per_token", [2.0, 3.5, 4.1])
+def test_trimming_never_exceeds_budget(budget, chars_per_token):
+    estimator = TokenEstimator(chars_per_token=chars_per_token)
+    fields = [context_field(f"f{i}", "y" * (2000 * (i + 1)), i % 2) for i in range(3)]
+    trimmed = trim_context(fields, budget, estimator)
+    assert total_tokens(trimmed, estimator) <= budget
+
+def test_fitting_context_is_unchanged():
+    estimator = TokenEstimator()
+    trimmed = trim_context([context_field("profile", {"name": "Ada"}, 3)], 1000, estimator)
+    assert trimmed == {"profile": '{"name":"Ada"}'}
+
+def test_context_that_cannot_fit_raises():
+    estimator = TokenEstimator()
+    fields = [context_field(f"f{i}", "z" * 1000, 1) for i in range(5)]
+    with pytest.raises(TokenBudgetExceededError):
+        trim_context(fields, 5, estimator)
+
+def test_reservation_holds_tokens_until_settled():
+    budget = TokenBudget(session_limit=3000, call_limit=0)
+    first = budget.reserve("s", 600, 1000)
+    # The first call has not been charged yet, but its worst case is held
+    with pytest.raises(TokenBudgetExceededError):
+        budget.reserve("s", 600, 1000)
+    first.settle(600)
+    assert budget.session_usage["s"] == 600 and "s" not in budget.session_reserved
+    budget.reserve("s", 500, 1000).settle(700)
+    assert budget.session_usage["s"] == 1300
+
+def test_reservation_is_released_when_the_call_fails():
+    budget = TokenBudget(session_limit=3000, call_limit=0)
+    with pytest.raises(RuntimeError):
+        with budget.reserve("s", 500, 1000):
+            raise RuntimeError("call failed")
+    assert "s" not in budget.session_reserved and budget.session_usage.get("s", 0) == 0
+    # Settling twice, or releasing after settling, charges once
+    reservation = budget.reserve("s", 500, 1000)
+    reservation.settle(100)
+    reservation.settle(100)
+    reservation.release()
+    assert budget.session_usage["s"] == 100
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import pytest
+from src.utils import tracing
+from src.utils.tracing import Tracer, export_session_trace, get_tracer, traced
+from src.utils.usage_ledger import usage_context
+
+def spans(trace):
+    return [event for event in trace["traceEvents"] if event["ph"] == "X"]
+
+def track_names(trace):
+    return {event["tid"]: event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+
+@pytest.fixture
+def tracer(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRACE_DIR", str(tmp_path / "traces"))
+    monkeypatch.setattr(tracing, "_default_tracer", None)
+    return get_tracer()
+
+def test_each_session_exports_only_its_own_spans(tracer, tmp_path):
+    for session in ("s1", "s2"):
+        with usage_context(session=session):
+            with tracer.span("session", phase=session):
+                with tracer.span("_discuss_topic", "claude"):
+                    pass
+
+    path = export_session_trace("s1")
+    assert path == str(tmp_path / "traces" / "s1.trace.json")
+    with open(path) as f:
+        first = json.load(f)
+    assert [(span["name"], span["args"].get("phase")) for span in spans(first)] == \
+        [("_discuss_topic", None), ("session", "s1")]
+    # Every track a session uses is named in its own file
+    assert {span["tid"] for span in spans(first)} <= set(track_names(first))
+
+    # Exporting releases the session; the next one is unaffected
+    assert "s1" not in tracer.events
+    with open(export_session_trace("s2")) as f:
+        second = json.load(f)
+    assert [span["args"].get("phase") for span in spans(second)] == [None, "s2"]
+    assert set(track_names(second)) == set(track_names(first))
+    assert list(tracer.events) == [None]
+
+def test_concurrent_tasks_get_their_own_tracks(tracer, tmp_path):
+    @traced("analyze")
+    async def analyze(seconds):
+        await asyncio.sleep(seconds)
+
+    async def run():
+        with usage_context(session="s1"):
+            await asyncio.gather(asyncio.create_task(analyze(0.02), name="Vision"),
+                                 asyncio.create_task(analyze(0.01), name="Background"))
+
+    asyncio.run(run())
+    with open(export_session_trace("s1")) as f:
+        trace = json.load(f)
+    names = track_names(trace)
+    assert sorted(names[span["tid"]] for span in spans(trace)) == ["Background", "Vision"]
+
+def test_failed_spans_record_the_error(tracer):
+    with usage_context(session="s1"):
+        with pytest.raises(ValueError):
+            with tracer.span("_generate_report_section"):
+                raise ValueError("bad section")
+    assert spans({"traceEvents": tracer.events["s1"]})[0]["args"]["error"] == "ValueError"
+
+def test_spans_outside_a_session_are_capped(tmp_path):
+    tracer = Tracer(max_unscoped_events=5)
+    for _ in range(10):
+        with tracer.span("warmup"):
+            pass
+    assert len(tracer.events[None]) == 5
+    tracer.export(str(tmp_path / "unscoped.trace.json"))
+    # The unscoped events are not released, only capped
+    assert len(tracer.events[None]) == 5
+
+def test_tracing_is_off_without_a_trace_dir(monkeypatch):
+    monkeypatch.delenv("TRACE_DIR", raising=False)
+    monkeypatch.setattr(tracing, "_default_tracer", None)
+    with usage_context(session="s1"):
+        with get_tracer().span("session"):
+            pass
+    assert export_session_trace("s1") is None
+    assert "s1" not in get_tracer().events
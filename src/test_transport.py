@@ -0,0 +1,86 @@
+import asyncio
+import json
+import pytest
+from aiohttp import web
+from src.core.headless_runner import run_session
+from src.utils import claude_client, client_registry, memoization, output_sizing, rate_limiter
+from src.utils.client_registry import ClientRegistry
+from src.utils.memoization import Memoizer, MemoPolicy
+from src.utils.mock_messages_server import MockMessagesServer
+from src.utils.rate_limiter import AdaptiveRateLimiter
+from src.utils.sdk_http import http
+from src.utils.transport import RecordingStore, transport_request_key
+
+INTAKE = {
+    "id": "replay",
+    "profile": {"name": "Ada", "current_role": "Engineer", "experience_years": 5, "education": "BS", "industry": "Software"},
+    "answers": ["Lead a platform team", "Mentoring engineers"]
+}
+
+def message_request(**body):
+    body = {"model": "claude", "max_tokens": 100, "messages": [{"role": "user", "content": "hi"}], **body}
+    return http.Request("POST", "http://127.0.0.1/v1/messages", content=json.dumps(body).encode("utf-8"))
+
+def test_request_key_covers_only_the_fields_that_decide_the_response():
+    key = transport_request_key(message_request())
+    assert transport_request_key(message_request(metadata={"user_id": "run-2"})) == key
+    assert transport_request_key(message_request(max_tokens=200)) != key
+    assert transport_request_key(message_request(stream=True)) != key
+    assert transport_request_key(message_request(messages=[{"role": "user", "content": "bye"}])) != key
+
+def fresh_process(monkeypatch):
+    """Rebuild the process-wide clients so they pick up the current CLAUDE_TRANSPORT"""
+    monkeypatch.setattr(client_registry, "_default_registry", ClientRegistry(batch=False))
+    monkeypatch.setattr(output_sizing, "_default_sizer", None)
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("SESSION_JOURNAL_DIR", str(tmp_path / "sessions"))
+    monkeypatch.setenv("CLAUDE_RECORDING_PATH", str(tmp_path / "recording.jsonl"))
+    monkeypatch.setenv("CLAUDE_REPLAY_LATENCY", "false")
+    monkeypatch.setattr(rate_limiter, "_default_limiter", AdaptiveRateLimiter(requests_per_minute=10000,
+                                                                             tokens_per_minute=10 ** 7))
+    monkeypatch.setattr(memoization, "_default_memoizer", Memoizer(MemoPolicy(), cache_dir=str(tmp_path / "memo")))
+    monkeypatch.setattr(claude_client, "_shared_http_client", None)
+    return tmp_path
+
+def test_a_recorded_session_replays_without_the_server(isolated, monkeypatch):
+    server = MockMessagesServer(latency_median=0.001, latency_sigma=0, token_interval=0,
+                                requests_per_minute=10000, input_tokens_per_minute=10 ** 7)
+
+    async def record():
+        runner = web.AppRunner(server.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", f"http://127.0.0.1:{port}")
+        try:
+            return await run_session(INTAKE)
+        finally:
+            await claude_client.close_shared_http_client()
+            await runner.cleanup()
+
+    async def replay():
+        try:
+            return await run_session(INTAKE)
+        finally:
+            await claude_client.close_shared_http_client()
+
+    monkeypatch.setenv("CLAUDE_TRANSPORT", "record")
+    fresh_process(monkeypatch)
+    recorded = asyncio.run(record())
+    assert recorded["status"] == "ok"
+    recordings = RecordingStore(str(isolated / "recording.jsonl")).load()
+    assert sum(len(entries) for entries in recordings.values()) == server.stats["requests"] > 0
+
+    # The server is gone; every call of the rerun must find its recording
+    monkeypatch.setenv("CLAUDE_TRANSPORT", "replay")
+    fresh_process(monkeypatch)
+    replayed = asyncio.run(replay())
+    assert replayed["status"] == "ok", replayed.get("error")
+    assert replayed["usage"]["failed_calls"] == 0
+    assert replayed["usage"]["calls"] == recorded["usage"]["calls"]
+    assert replayed["report"] == recorded["report"]
@@ -0,0 +1,121 @@
+import asyncio
+import sys
+import pytest
+from types import SimpleNamespace
+from src.utils import usage_ledger
+from src.utils.claude_client import ClaudeClient, DEFAULT_MODEL
+from src.utils.token_budget import TokenBudget
+from src.utils.usage_ledger import UsageLedger, estimate_cost, get_usage_tags, summarize, usage_context
+
+USAGE = SimpleNamespace(input_tokens=1000, output_tokens=200, cache_read_input_tokens=3000,
+                        cache_creation_input_tokens=500)
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    client = ClaudeClient()
+    client.ledger = UsageLedger(str(tmp_path))
+    client.budget = TokenBudget(session_limit=0, call_limit=0)
+
+    class Raw:
+        headers = {}
+
+        def parse(self):
+            return SimpleNamespace(content=[SimpleNamespace(text="ok")], usage=USAGE, stop_reason="end_turn",
+                                   model=DEFAULT_MODEL)
+
+    async def create(**request):
+        return Raw()
+
+    client.client = SimpleNamespace(base_url=client.client.base_url,
+                                    messages=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+    return client
+
+def ask(client, question, call_site):
+    return client.get_response([{"role": "user", "content": question}], 100, call_site=call_site)
+
+def test_every_call_is_recorded_with_its_call_site_and_tags(client):
+    async def run():
+        with usage_context(session="s1", phase="discussion"):
+            with usage_context(principal="Vision Principal"):
+                await ask(client, "first", "BaseAgent.analyze")
+            await ask(client, "second", "_discuss_topic")
+        await ask(client, "third", "untagged")
+
+    asyncio.run(run())
+    first, second, third = client.ledger.load_records()
+    assert (first["session"], first["phase"], first["principal"], first["call_site"]) == \
+        ("s1", "discussion", "Vision Principal", "BaseAgent.analyze")
+    assert (second["principal"], second["call_site"]) == (None, "_discuss_topic")
+    assert third["session"] is None and third["call_site"] == "untagged"
+    assert (first["input_tokens"], first["output_tokens"], first["cache_read_tokens"], first["cache_write_tokens"]) == \
+        (1000, 200, 3000, 500)
+    assert first["model"] == DEFAULT_MODEL and first["latency"] >= 0
+    assert first["cost_usd"] == pytest.approx(estimate_cost(first))
+
+    totals = client.ledger.session_totals("s1")
+    assert totals["calls"] == 2 and totals["input_tokens"] == 2000 and totals["failed_calls"] == 0
+    client.ledger.release_session("s1")
+    assert client.ledger.session_totals("s1")["calls"] == 0
+
+def test_a_call_site_must_be_named(client):
+    with pytest.raises(TypeError):
+        asyncio.run(client.get_response([{"role": "user", "content": "hi"}]))
+
+def test_tags_stay_with_their_own_task():
+    async def tagged(principal):
+        with usage_context(principal=principal):
+            await asyncio.sleep(0.01)
+            return get_usage_tags()["principal"]
+
+    async def run():
+        with usage_context(session="s1"):
+            return await asyncio.gather(tagged("Vision"), tagged("Background")), get_usage_tags()
+
+    principals, outer = asyncio.run(run())
+    assert principals == ["Vision", "Background"]
+    assert outer == {"session": "s1"}
+
+def test_cost_estimate():
+    record = {"model": DEFAULT_MODEL, "input_tokens": 1_000_000, "output_tokens": 1_000_000,
+              "cache_write_tokens": 1_000_000, "cache_read_tokens": 1_000_000}
+    assert estimate_cost(record) == pytest.approx(3.00 + 15.00 + 3.75 + 0.30)
+    assert estimate_cost({**record, "batch": True}) == pytest.approx(estimate_cost(record) / 2)
+    assert estimate_cost({**record, "coalesced": True}) == 0.0
+    assert estimate_cost({**record, "model": "unknown"}) == 0.0
+
+RECORDS = [
+    {"session": "s1", "phase": "discussion", "call_site": "_discuss_topic", "input_tokens": 100, "output_tokens": 10,
+     "latency": 1.0, "cost_usd": 0.5},
+    {"session": "s1", "phase": "roadmap", "call_site": "_generate_report_section", "input_tokens": 300,
+     "output_tokens": 30, "latency": 3.0, "cost_usd": 2.0},
+    {"session": "s2", "phase": "roadmap", "call_site": "_generate_report_section", "input_tokens": 100,
+     "output_tokens": 10, "latency": 1.0, "cost_usd": 1.0}
+]
+
+def test_summaries_group_by_dimension_most_expensive_first():
+    by_call_site = summarize(RECORDS, "call_site")
+    assert list(by_call_site) == ["_generate_report_section", "_discuss_topic"]
+    sections = by_call_site["_generate_report_section"]
+    assert (sections["calls"], sections["input_tokens"], sections["cost_usd"]) == (2, 400, 3.0)
+    assert sections["avg_latency"] == 2.0
+    # Records without the tag are grouped together rather than dropped
+    by_principal = summarize(RECORDS, "principal")
+    assert list(by_principal) == ["unknown"] and by_principal["unknown"]["calls"] == 3
+
+def test_cli_summarizes_one_session(tmp_path, monkeypatch, capsys):
+    ledger = UsageLedger(str(tmp_path))
+    for record in RECORDS:
+        ledger.record(model=DEFAULT_MODEL, call_site=record["call_site"], latency=record["latency"],
+                      usage=SimpleNamespace(input_tokens=record["input_tokens"], output_tokens=record["output_tokens"]))
+    with usage_context(session="s9", phase="financial"):
+        ledger.record(model=DEFAULT_MODEL, call_site="FinancialPrincipal", latency=0.5,
+                      usage=SimpleNamespace(input_tokens=10, output_tokens=1))
+
+    monkeypatch.setattr(sys, "argv", ["usage_ledger", "--ledger-dir", str(tmp_path), "--session", "s9",
+                                      "--by", "phase", "call_site"])
+    usage_ledger.main()
+    out = capsys.readouterr().out
+    assert "=== Usage by phase ===" in out and "financial" in out
+    assert "FinancialPrincipal" in out and "_discuss_topic" not in out
+    assert "Total: 1 calls" in out
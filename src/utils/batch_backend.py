@@ -0,0 +1,180 @@
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Set, Tuple
+from types import SimpleNamespace
+import asyncio
+import itertools
+import logging
+import os
+import uuid
+
+class BatchRequestError(Exception):
+    """Raised to a waiting caller when its request in a batch did not succeed"""
+    pass
+
+class BatchBackend:
+    """Collects Claude requests from many sessions and runs them through the Message Batches API
+
+    `batches` is anything with async create/retrieve/results methods shaped like
+    `AsyncAnthropic().messages.batches`, e.g. LocalBatchesStandIn for offline runs.
+    """
+
+    def __init__(self, batches: Any, max_batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, poll_interval: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self.batches = batches
+        self.max_batch_size = max_batch_size or int(os.getenv("BATCH_MAX_SIZE", "1000"))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("BATCH_FLUSH_INTERVAL", "5"))
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+        self._pending: List[Tuple[str, Dict[str, Any], asyncio.Future]] = []
+        self._flush_timer: Optional[asyncio.Task] = None
+        self._pollers: Set[asyncio.Task] = set()
+        self._ids = itertools.count()
+        self._prefix = uuid.uuid4().hex[:8]
+        self.stats = {"batches": 0, "requests": 0, "succeeded": 0, "failed": 0}
+
+    async def submit(self, params: Dict[str, Any]) -> Any:
+        """Queue one Messages API request and wait for its result message"""
+        custom_id = f"req-{self._prefix}-{next(self._ids)}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((custom_id, params, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            await self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Submit every queued request as one batch"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        futures = {custom_id: future for custom_id, _, future in pending}
+        try:
+            batch = await self.batches.create(requests=[
+                {"custom_id": custom_id, "params": params} for custom_id, params, _ in pending
+            ])
+        except Exception as e:
+            self.logger.error(f"Error creating message batch: {e}")
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(pending)
+        self.logger.info(f"Submitted message batch {batch.id} with {len(pending)} requests")
+        poller = asyncio.create_task(self._poll(batch.id, futures))
+        self._pollers.add(poller)
+        poller.add_done_callback(self._pollers.discard)
+
+    async def _poll(self, batch_id: str, futures: Dict[str, asyncio.Future]):
+        """Wait for a batch to end and route each result to its caller"""
+        try:
+            while True:
+                batch = await self.batches.retrieve(batch_id)
+                if batch.processing_status == "ended":
+                    break
+                await asyncio.sleep(self.poll_interval)
+
+            async for entry in await self.batches.results(batch_id):
+                future = futures.pop(entry.custom_id, None)
+                if future is None or future.done():
+                    continue
+                if entry.result.type == "succeeded":
+                    self.stats["succeeded"] += 1
+                    future.set_result(entry.result.message)
+                else:
+                    self.stats["failed"] += 1
+                    future.set_exception(BatchRequestError(
+                        f"Batch request {entry.custom_id} {entry.result.type}: {getattr(entry.result, 'error', '')}"
+                    ))
+        except Exception as e:
+            self.logger.error(f"Error polling message batch {batch_id}: {e}")
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for custom_id, future in futures.items():
+            if not future.done():
+                future.set_exception(BatchRequestError(f"Batch {batch_id} returned no result for {custom_id}"))
+
+    async def close(self):
+        """Submit anything still queued and wait for every outstanding batch"""
+        await self.flush()
+        if self._pollers:
+            await asyncio.gather(*self._pollers, return_exceptions=True)
+
+def message_batches(client: Any) -> Any:
+    """The Message Batches endpoints of an AsyncAnthropic client (under client.beta in older SDKs)"""
+    batches = getattr(client.messages, "batches", None)
+    return batches if batches is not None else client.beta.messages.batches
+
+def batch_mode_enabled() -> bool:
+    """Whether CLAUDE_BATCH routes Claude calls through Message Batches"""
+    return os.getenv("CLAUDE_BATCH", "false").lower() in ("1", "true", "yes")
+
+class LocalBatchesStandIn:
+    """In-process stand-in for the Message Batches create/retrieve/results endpoints
+
+    Each request is answered by `responder(params)`, which returns a Message-like
+    object. Requests are processed concurrently in the background after create().
+    A request not answered within `expire_after` seconds comes back "expired",
+    as requests still unprocessed at the end of the API's 24 hour window do.
+    """
+
+    def __init__(self, responder: Callable[[Dict[str, Any]], Awaitable[Any]], expire_after: Optional[float] = None):
+        self.responder = responder
+        self.expire_after = expire_after
+        self._batches: Dict[str, SimpleNamespace] = {}
+        self._results: Dict[str, List[SimpleNamespace]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def create(self, requests: List[Dict[str, Any]]) -> SimpleNamespace:
+        batch_id = f"msgbatch_{uuid.uuid4().hex}"
+        batch = SimpleNamespace(
+            id=batch_id,
+            processing_status="in_progress",
+            request_counts=SimpleNamespace(processing=len(requests), succeeded=0, errored=0, expired=0)
+        )
+        self._batches[batch_id] = batch
+        task = asyncio.create_task(self._process(batch, requests))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return batch
+
+    async def _process(self, batch: SimpleNamespace, requests: List[Dict[str, Any]]):
+        async def run(request: Dict[str, Any]) -> SimpleNamespace:
+            try:
+                message = await asyncio.wait_for(self.responder(request["params"]), self.expire_after)
+                batch.request_counts.succeeded += 1
+                result = SimpleNamespace(type="succeeded", message=message)
+            except asyncio.TimeoutError:
+                batch.request_counts.expired += 1
+                result = SimpleNamespace(type="expired")
+            except Exception as e:
+                batch.request_counts.errored += 1
+                result = SimpleNamespace(type="errored", error=str(e))
+            batch.request_counts.processing -= 1
+            return SimpleNamespace(custom_id=request["custom_id"], result=result)
+
+        self._results[batch.id] = await asyncio.gather(*(run(request) for request in requests))
+        batch.processing_status = "ended"
+
+    async def retrieve(self, batch_id: str) -> SimpleNamespace:
+        return self._batches[batch_id]
+
+    async def results(self, batch_id: str):
+        async def iterate():
+            for entry in self._results[batch_id]:
+                yield entry
+        return iterate()
@@ -0,0 +1,153 @@
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+import argparse
+import hashlib
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+from src.utils.cache_store import CacheEntry, entry_expires_at
+
+# Read-only response cache snapshot:
+#   header   magic, slot count, entry count
+#   index    open-addressing hash table of (key hash, record offset) slots
+#   records  key length, compressed response length, created_at, expires_at, key, zlib(response)
+# The file is memory-mapped, so opening it costs nothing per entry, lookups only
+# touch the pages they need, and processes reading one snapshot share its pages.
+MAGIC = b"RCSNAP01"
+HEADER = struct.Struct("<8sQQ")
+SLOT = struct.Struct("<QQ")
+RECORD = struct.Struct("<IIdd")
+
+def _key_hash(key: bytes) -> int:
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+def write_snapshot(entries: Iterable[Tuple[str, CacheEntry]], path: str, compress_level: int = 6) -> int:
+    """Write cache entries to a snapshot file, replacing it atomically; returns the entry count"""
+    records: List[bytes] = []
+    hashes: List[int] = []
+    for key, (response, created_at, expires_at) in entries:
+        key_bytes = key.encode("utf-8")
+        value = zlib.compress(response.encode("utf-8"), compress_level)
+        records.append(
+            RECORD.pack(len(key_bytes), len(value), created_at, math.nan if expires_at is None else expires_at)
+            + key_bytes + value
+        )
+        hashes.append(_key_hash(key_bytes))
+
+    # Keep the table at most half full so probe sequences stay short
+    slots = 1
+    while slots < 2 * len(records):
+        slots *= 2
+    table = [(0, 0)] * slots
+    offset = HEADER.size + slots * SLOT.size
+    for key_hash, record in zip(hashes, records):
+        slot = key_hash & (slots - 1)
+        while table[slot][0]:
+            slot = (slot + 1) & (slots - 1)
+        table[slot] = (key_hash, offset)
+        offset += len(record)
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, slots, len(records)))
+        f.write(b"".join(SLOT.pack(key_hash, record_offset) for key_hash, record_offset in table))
+        for record in records:
+            f.write(record)
+    os.replace(tmp_path, path)
+    return len(records)
+
+class CacheSnapshot:
+    """Memory-mapped, read-only snapshot of a response cache, decoded one entry at a time on lookup"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        self._identity = (stat.st_ino, stat.st_mtime_ns)
+        magic, self.slots, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a response cache snapshot")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get (response, created_at, expires_at) for a key"""
+        key_bytes = key.encode("utf-8")
+        key_hash = _key_hash(key_bytes)
+        slot = key_hash & (self.slots - 1)
+        while True:
+            slot_hash, offset = SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)
+            if not slot_hash:
+                return None
+            if slot_hash == key_hash:
+                key_len, value_len, created_at, expires_at = RECORD.unpack_from(self._map, offset)
+                start = offset + RECORD.size
+                if self._map[start:start + key_len] == key_bytes:
+                    return (
+                        zlib.decompress(self._map[start + key_len:start + key_len + value_len]).decode("utf-8"),
+                        created_at,
+                        None if math.isnan(expires_at) else expires_at
+                    )
+            slot = (slot + 1) & (self.slots - 1)
+
+    def iter_entries(self) -> Iterator[Tuple[str, CacheEntry]]:
+        """Iterate over every (key, entry) pair, decoding each one"""
+        for slot in range(self.slots):
+            slot_hash, offset = SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)
+            if not slot_hash:
+                continue
+            key_len, value_len, created_at, expires_at = RECORD.unpack_from(self._map, offset)
+            start = offset + RECORD.size
+            yield self._map[start:start + key_len].decode("utf-8"), (
+                zlib.decompress(self._map[start + key_len:start + key_len + value_len]).decode("utf-8"),
+                created_at,
+                None if math.isnan(expires_at) else expires_at
+            )
+
+    def is_current(self) -> bool:
+        """Whether `path` still holds the file that is mapped, i.e. it was neither deleted nor rebuilt"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) == self._identity
+
+    def close(self):
+        self._map.close()
+
+def snapshot_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "response_cache.snapshot")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a read-only snapshot of the response cache for fast cold starts")
+    parser.add_argument("--cache-dir", default="cache", help="Cache directory to snapshot")
+    parser.add_argument("--output", help="Snapshot path (default: <cache-dir>/response_cache.snapshot)")
+    args = parser.parse_args()
+
+    # response_cache imports this module, so it is only imported when building
+    from src.utils.response_cache import ResponseCache
+    cache = ResponseCache(args.cache_dir)
+    # The store wins over an older snapshot; entries only in the snapshot are carried over
+    entries: Dict[str, CacheEntry] = {}
+    if cache.snapshot is not None:
+        entries.update(cache.snapshot.iter_entries())
+    entries.update(cache.store.iter_entries())
+    default_ttl = cache.cache_duration.total_seconds()
+    now = time.time()
+    live = ((key, entry) for key, entry in entries.items() if entry_expires_at(entry, default_ttl) > now)
+    output = args.output or snapshot_path(args.cache_dir)
+    count = write_snapshot(live, output)
+    cache.close()
+    print(f"Wrote {count} entries to {output} ({os.path.getsize(output)} bytes)")
+
+if __name__ == "__main__":
+    main()
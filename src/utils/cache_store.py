@@ -0,0 +1,354 @@
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+from collections import OrderedDict
+from datetime import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# (response, created_at, expires_at); expires_at is None for entries written without a TTL
+CacheEntry = Tuple[str, float, Optional[float]]
+
+def entry_expires_at(entry: CacheEntry, default_ttl: float) -> float:
+    """When an entry expires, falling back to the default TTL for entries stored without one"""
+    _, created_at, expires_at = entry
+    return expires_at if expires_at is not None else created_at + default_ttl
+
+class JsonCacheStore:
+    """Whole-file JSON storage for ResponseCache (the original format)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self.entries: Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                for key, value in json.load(f).items():
+                    self.entries[key] = (
+                        value["response"],
+                        datetime.fromisoformat(value["timestamp"]).timestamp(),
+                        value.get("expires_at")
+                    )
+        except Exception as e:
+            self.logger.error(f"Error loading cache {self.path}: {e}")
+            self.entries = {}
+
+    def _save(self):
+        data = {}
+        for key, (response, created_at, expires_at) in self.entries.items():
+            data[key] = {"response": response, "timestamp": datetime.fromtimestamp(created_at).isoformat()}
+            if expires_at is not None:
+                data[key]["expires_at"] = expires_at
+        try:
+            with open(self.path, "w") as f:
+                json.dump(data, f, indent=2)
+        except Exception as e:
+            self.logger.error(f"Error saving cache {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get (response, created_at, expires_at) for a key"""
+        return self.entries.get(key)
+
+    def iter_entries(self) -> Iterator[Tuple[str, CacheEntry]]:
+        """Iterate over every (key, entry) pair"""
+        return iter(list(self.entries.items()))
+
+    def set_many(self, entries: Dict[str, CacheEntry]):
+        """Store several entries with one write"""
+        with self._lock:
+            self.entries.update(entries)
+            self._save()
+
+    def delete_expired(self, now: float, default_ttl: float) -> int:
+        with self._lock:
+            expired = [key for key, entry in self.entries.items() if entry_expires_at(entry, default_ttl) <= now]
+            for key in expired:
+                del self.entries[key]
+            if expired:
+                self._save()
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+            self._save()
+
+    def close(self):
+        pass
+
+class SqliteCacheStore:
+    """SQLite (WAL mode) storage for ResponseCache, safe for many readers and writers across processes
+
+    Each thread gets its own connection. A JSON cache left by older versions in
+    the same directory is imported once, on first open.
+    """
+
+    def __init__(self, path: str, legacy_json_path: Optional[str] = None, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_created_at ON entries (created_at)")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(entries)")]
+            if "expires_at" not in columns:
+                connection.execute("ALTER TABLE entries ADD COLUMN expires_at REAL")
+        if legacy_json_path:
+            self._migrate_json(legacy_json_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Only this thread uses the connection, but close() may run on another
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _migrate_json(self, json_path: str):
+        """Import a legacy JSON cache once; the JSON file itself is left untouched"""
+        if not os.path.exists(json_path):
+            return
+        connection = self._connection()
+        if connection.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+        legacy = JsonCacheStore(json_path)
+        with connection:
+            # INSERT OR IGNORE keeps this idempotent if two processes migrate at once
+            connection.executemany(
+                "INSERT OR IGNORE INTO entries (key, response, created_at) VALUES (?, ?, ?)",
+                [(key, response, created_at) for key, (response, created_at, _) in legacy.entries.items()]
+            )
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                               (datetime.now().isoformat(),))
+        self.logger.info(f"Migrated {len(legacy.entries)} entries from {json_path} to {self.path}")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Get (response, created_at, expires_at) for a key"""
+        row = self._connection().execute(
+            "SELECT response, created_at, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return (row[0], row[1], row[2]) if row else None
+
+    def iter_entries(self) -> Iterator[Tuple[str, CacheEntry]]:
+        """Iterate over every (key, entry) pair"""
+        for key, response, created_at, expires_at in self._connection().execute(
+            "SELECT key, response, created_at, expires_at FROM entries"
+        ):
+            yield key, (response, created_at, expires_at)
+
+    def set_many(self, entries: Dict[str, CacheEntry]):
+        """Store several entries in one transaction"""
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, response, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                [(key, response, created_at, expires_at) for key, (response, created_at, expires_at) in entries.items()]
+            )
+
+    def delete_expired(self, now: float, default_ttl: float) -> int:
+        connection = self._connection()
+        with connection:
+            deleted = connection.execute(
+                "DELETE FROM entries WHERE COALESCE(expires_at, created_at + ?) <= ?", (default_ttl, now)
+            ).rowcount
+        # Fold the WAL back into the database so it does not grow without bound
+        connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return deleted
+
+    def clear(self):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM entries")
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+class CacheCompactor:
+    """Background thread that periodically deletes expired cache entries"""
+
+    def __init__(self, store: Any, default_ttl: float, interval: float, grace: float = 0.0):
+        self.store = store
+        self.default_ttl = default_ttl
+        self.interval = interval
+        # Expired entries are kept this much longer so they can still be served stale
+        self.grace = grace
+        self.logger = logging.getLogger(__name__)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cache-compactor", daemon=True)
+
+    def start(self) -> "CacheCompactor":
+        self._thread.start()
+        return self
+
+    def compact(self) -> int:
+        """Delete every expired entry"""
+        deleted = self.store.delete_expired(time.time() - self.grace, self.default_ttl)
+        if deleted:
+            self.logger.info(f"Compacted response cache: removed {deleted} expired entries")
+        return deleted
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.compact()
+            except Exception as e:
+                self.logger.error(f"Error compacting response cache: {e}")
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """Stop the thread, waiting up to `timeout` seconds for a compaction in progress to finish
+
+        Returns whether the thread has stopped; the store must not be closed under a running compaction.
+        """
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.logger.warning(f"Cache compaction still running {timeout}s after it was asked to stop")
+            return False
+        return True
+
+class MemoryTier:
+    """LRU cache bounded by entry count and total size, with per-entry expiry
+
+    An expired entry is kept until `grace` seconds after it expires, so it can
+    still be served stale while it is refreshed.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[str, float, float, int]]" = OrderedDict()
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float, grace: float = 0.0) -> Optional[Tuple[str, float]]:
+        """Get (response, expires_at) unless the entry expired more than `grace` seconds ago"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            response, _, expires_at, size = entry
+            if expires_at + grace <= now:
+                del self.entries[key]
+                self.size -= size
+                return None
+            self.entries.move_to_end(key)
+            return response, expires_at
+
+    def put(self, key: str, response: str, created_at: float, expires_at: float):
+        size = len(key) + len(response)
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[3]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (response, created_at, expires_at, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted[3]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+class WriteBehindWriter:
+    """Persists cache writes from a background thread so set() never waits on disk
+
+    Writes to the same key are coalesced, and each flush goes to the store as one
+    batch. If `max_pending` keys are already waiting, a write to another key is
+    dropped rather than waited for: callers run on the event loop, which must
+    never block, and the entry is still served from the memory tier.
+    """
+
+    def __init__(self, store: Any, flush_interval: float = 0.5, max_pending: int = 10000):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.logger = logging.getLogger(__name__)
+        self.pending: Dict[str, CacheEntry] = {}
+        # The batch currently being written, still readable until it is on disk
+        self.writing: Dict[str, CacheEntry] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="cache-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str, entry: CacheEntry) -> bool:
+        """Queue an entry for persistence; returns False if it was dropped because the queue is full"""
+        with self._condition:
+            if len(self.pending) >= self.max_pending and key not in self.pending:
+                return False
+            self.pending[key] = entry
+            self._condition.notify_all()
+            return True
+
+    def get_pending(self, key: str) -> Optional[CacheEntry]:
+        """An entry that has been set but not written yet"""
+        with self._condition:
+            return self.pending.get(key) or self.writing.get(key)
+
+    def discard_pending(self):
+        with self._condition:
+            self.pending = {}
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self.pending and not self._closed:
+                    self._condition.wait(self.flush_interval)
+                if not self.pending:
+                    if self._closed:
+                        return
+                    continue
+                batch, self.pending = self.pending, {}
+                self.writing = batch
+                self._condition.notify_all()
+            try:
+                self.store.set_many(batch)
+            except Exception as e:
+                self.logger.error(f"Error persisting {len(batch)} cache entries: {e}")
+            finally:
+                with self._condition:
+                    self.writing = {}
+                    self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything submitted so far has been written"""
+        with self._condition:
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self.pending and not self.writing, timeout)
+
+    def close(self):
+        """Write everything still pending and stop the thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
@@ -1,51 +1,626 @@
 import os
+import time
+import asyncio
+import hashlib
+import inspect
 import logging
 import anthropic
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from types import SimpleNamespace
+from contextlib import AsyncExitStack
 import json
+from src.utils.usage_ledger import get_usage_ledger, get_usage_tags
+from src.utils.token_budget import BudgetReservation, get_token_budget, get_token_estimator, trim_context
+from src.utils.rate_limiter import get_rate_limiter
+from src.utils.batch_backend import BatchBackend
+from src.utils.prompt_cache import system_blocks
+from src.utils.transport import build_transport
+from src.utils.sdk_http import http
+from src.utils.output_sizing import get_output_sizer
+from src.utils.metrics import get_metrics
+from src.utils.tracing import get_tracer
+from src.utils.memoization import get_memoizer, add_usage
+from src.utils.log_config import configure_logging, should_log_payload, LazyJson
 
-# Configure logging to write to a file instead of terminal
-logging.basicConfig(
-    filename='career_planner.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Log to a file instead of the terminal, off the calling thread
+configure_logging()
+
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+
+# One pooled HTTP client shared by every ClaudeClient in the process
+_shared_http_client: Optional[http.AsyncClient] = None
+
+coalescing_stats = {"api_calls": 0, "coalesced": 0}
+
+class _SharedCall:
+    """One in-flight API call and the callers waiting for its result
+
+    A caller that is cancelled just stops waiting; the call itself is only
+    cancelled once no caller is left waiting for it.
+    """
+
+    def __init__(self, key: str, task: asyncio.Task):
+        self.key = key
+        self.task = task
+        self.waiters = 0
+        task.add_done_callback(self._done)
+
+    async def wait(self) -> Any:
+        self.waiters += 1
+        try:
+            return await asyncio.shield(self.task)
+        finally:
+            self.waiters -= 1
+            if self.waiters == 0 and not self.task.done():
+                # Nobody may join a call that is being cancelled
+                self._forget()
+                self.task.cancel()
+
+    def _forget(self):
+        if _inflight_requests.get(self.key) is self:
+            del _inflight_requests[self.key]
+
+    def _done(self, task: asyncio.Task):
+        self._forget()
+        # Mark a failure retrieved in case every caller stopped waiting first
+        if not task.cancelled():
+            task.exception()
+
+# Identical requests in flight share one API call (single-flight)
+_inflight_requests: Dict[str, _SharedCall] = {}
+
+def get_pool_limits() -> http.Limits:
+    """Read connection pool limits from the environment"""
+    return http.Limits(
+        max_connections=int(os.getenv("CLAUDE_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("CLAUDE_MAX_KEEPALIVE_CONNECTIONS", "10")),
+        keepalive_expiry=float(os.getenv("CLAUDE_KEEPALIVE_EXPIRY", "30"))
+    )
+
+def get_shared_http_client() -> http.AsyncClient:
+    """Get the process-wide pooled HTTP client, creating it on first use"""
+    global _shared_http_client
+    if _shared_http_client is None or _shared_http_client.is_closed:
+        limits = get_pool_limits()
+        options: Dict[str, Any] = {}
+        # Record/replay runs swap in their own transport; live runs keep the SDK's default
+        transport = build_transport(limits)
+        if transport is not None:
+            options["transport"] = transport
+        _shared_http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=limits,
+            timeout=anthropic.Timeout(
+                float(os.getenv("CLAUDE_REQUEST_TIMEOUT", "600")),
+                connect=float(os.getenv("CLAUDE_CONNECT_TIMEOUT", "5"))
+            ),
+            **options
+        )
+    return _shared_http_client
+
+async def close_shared_http_client():
+    """Close the shared HTTP client and release its pooled connections"""
+    global _shared_http_client
+    if _shared_http_client is not None and not _shared_http_client.is_closed:
+        await _shared_http_client.aclose()
+    _shared_http_client = None
+
+def make_request_key(model: str, params: Dict[str, Any], messages: List[Dict[str, Any]]) -> str:
+    """Hash a request's model, parameters and messages into a stable key"""
+    canonical = json.dumps(
+        {"model": model, "params": params, "messages": messages},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def normalize_prompt(text: str) -> str:
+    """Collapse runs of whitespace so indentation and reflowing do not change a prompt's identity"""
+    return " ".join(text.split())
+
+def _normalize_content(content: Any) -> Any:
+    if isinstance(content, str):
+        return normalize_prompt(content)
+    if isinstance(content, list):
+        return [
+            {**block, "text": normalize_prompt(block["text"])}
+            if isinstance(block, dict) and isinstance(block.get("text"), str) else block
+            for block in content
+        ]
+    return content
+
+def get_coalescing_stats() -> Dict[str, int]:
+    """Get how many requests went to the API and how many joined an identical in-flight call"""
+    return dict(coalescing_stats)
+
+def continuation_request(request: Dict[str, Any], partial: str) -> Dict[str, Any]:
+    """Build a request that asks Claude to carry on from a truncated response"""
+    # The API rejects an assistant prefill that ends in whitespace
+    prefill = partial.rstrip()
+    messages = list(request["messages"])
+    last = messages[-1] if messages else None
+    if last and last.get("role") == "assistant" and isinstance(last.get("content"), str):
+        messages[-1] = {"role": "assistant", "content": last["content"] + prefill}
+    else:
+        messages.append({"role": "assistant", "content": prefill})
+    return {**request, "messages": messages}
+
+def _usage_args(usage: Any) -> Dict[str, int]:
+    """Token counts to attach to a trace span"""
+    return {
+        "input_tokens": usage.input_tokens or 0,
+        "output_tokens": usage.output_tokens or 0,
+        "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0
+    }
+
+def stitch_continuation(partial: str, continuation: str) -> str:
+    """Join a truncated response and its continuation"""
+    return partial.rstrip() + continuation
 
 class ClaudeClient:
     """Client for interacting with Claude API"""
-    
-    def __init__(self):
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None,
+                 batch_backend: Optional[BatchBackend] = None, base_url: Optional[str] = None):
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
         self.logger = logging.getLogger(__name__)
-        self.client = anthropic.Anthropic(api_key=self.api_key)
-        self.model = "claude-3-5-sonnet-20241022"
-        
-    async def get_response(self, messages: List[Dict[str, str]], max_tokens: int = 1000) -> str:
-        """Get a response from Claude"""
+        # Retries are owned by the shared rate limiter, not the SDK
+        # base_url defaults to ANTHROPIC_BASE_URL, e.g. the local mock server
+        self.client = anthropic.AsyncAnthropic(
+            api_key=self.api_key,
+            base_url=base_url,
+            http_client=get_shared_http_client(),
+            max_retries=0
+        )
+        self.model = model or DEFAULT_MODEL
+        self.ledger = get_usage_ledger()
+        self.budget = get_token_budget()
+        self.estimator = get_token_estimator()
+        self.rate_limiter = get_rate_limiter()
+        self.sizer = get_output_sizer()
+        self.max_continuations = int(os.getenv("MAX_CONTINUATIONS", "2"))
+        self.tracer = get_tracer()
+        # Opt-in replay of responses to identical requests (LLM_MEMOIZE_TTL / LLM_MEMOIZE_TTLS)
+        self.memoizer = get_memoizer()
+        metrics = get_metrics()
+        self.call_latency = metrics.summary("claude_request_duration_seconds", "Claude API call latency by call site")
+        self.call_ttft = metrics.summary("claude_time_to_first_token_seconds", "Time to first streamed token by call site")
+        self.call_throughput = metrics.summary("claude_output_tokens_per_second", "Output token generation rate by call site")
+        self.calls = metrics.counter("claude_requests_total", "Completed Claude API calls by call site")
+        self.call_errors = metrics.counter("claude_errors_total", "Failed Claude calls by call site and error type")
+        self.call_tokens = metrics.counter("claude_tokens_total", "Tokens by call site and kind")
+        self.cache_hit_ratio = metrics.gauge(
+            "claude_prompt_cache_hit_ratio", "Share of input tokens read from the prompt cache by call site"
+        )
+        self.coalesced_calls = metrics.counter(
+            "claude_coalesced_requests_total", "Requests that joined an identical in-flight call"
+        )
+        # When set, requests are queued into Message Batches instead of sent interactively
+        self.batch_backend = batch_backend
+        # A request that errored or expired in its batch is sent interactively instead of failing
+        self.batch_fallback = os.getenv("BATCH_INTERACTIVE_FALLBACK", "true").lower() in ("1", "true", "yes")
+        self.batch_fallbacks = metrics.counter(
+            "claude_batch_fallbacks_total", "Batched requests resent interactively after failing in their batch"
+        )
+
+    async def get_response(self, messages: List[Dict[str, Any]], max_tokens: Optional[int] = None, *,
+                           call_site: str, system: Optional[str] = None,
+                           stop_sequences: Optional[List[str]] = None) -> str:
+        """Get a response from Claude, sharing the result of any identical request already in flight
+
+        `max_tokens` is only a starting hint; once a call site has history its
+        limit is learned from the output lengths it actually produced. `call_site`
+        names the caller in the ledger, metrics and per-call-site settings.
+        """
+        memo_key = self._memo_key(call_site, messages, max_tokens, system, stop_sequences)
+        if memo_key is not None:
+            memoized = self.memoizer.lookup(memo_key, call_site)
+            if memoized is not None:
+                return memoized
+
+        max_tokens = self.sizer.max_tokens_for(call_site, max_tokens)
+        request = self._build_request(messages, max_tokens, system, stop_sequences)
+        request_key = make_request_key(
+            self.model,
+            {
+                "max_tokens": max_tokens,
+                "system": system,
+                "stop_sequences": stop_sequences,
+                # The same request to another account or endpoint is a different call
+                "api_key": self.api_key,
+                "base_url": str(self.client.base_url)
+            },
+            messages
+        )
+
+        shared = _inflight_requests.get(request_key)
+        if shared is None:
+            coalescing_stats["api_calls"] += 1
+            # The call runs in its own task so cancelling the caller that started it does not fail the others
+            shared = _SharedCall(request_key, asyncio.ensure_future(self._send_shared(request, call_site, memo_key)))
+            _inflight_requests[request_key] = shared
+            return (await shared.wait())[0]
+
+        coalescing_stats["coalesced"] += 1
+        self.coalesced_calls.inc(call_site=call_site)
+        self.logger.debug(f"Coalesced {call_site} request into in-flight call {request_key[:12]}")
+        started = time.perf_counter()
         try:
-            # Log request payload for debugging
-            request_payload = {
-                "model": self.model,
+            # A caller joining another's call is still held to its own session's budget
+            _, _, reservation = self._reserve_budget(request)
+            with reservation:
+                text, usage = await shared.wait()
+                self._record_coalesced(call_site, usage, time.perf_counter() - started, reservation)
+        except Exception:
+            # The call that failed is logged and counted once; this session failed with it
+            self.ledger.record_error()
+            raise
+        return text
+
+    async def _send_shared(self, request: Dict[str, Any], call_site: str,
+                           memo_key: Optional[str]) -> Tuple[str, Dict[str, int]]:
+        """Send a request on behalf of every caller sharing it; returns the text and the usage it took"""
+        usage: Dict[str, int] = {}
+        text = await self._send(request, call_site, usage)
+        if memo_key is not None:
+            self.memoizer.store(memo_key, call_site, text, self.model, usage, batch=self.batch_backend is not None)
+        return text, usage
+
+    def response_cache_key(self, messages: List[Dict[str, Any]], template_version: Optional[str] = None,
+                           max_tokens: Optional[int] = None, system: Optional[str] = None,
+                           stop_sequences: Optional[List[str]] = None) -> str:
+        """Content-addressed key for caching the response to a request
+
+        Covers the model, parameters, whitespace-normalized prompt and the
+        version of the template that produced it, so a hit is valid for any user
+        and bumping the version invalidates entries from an older prompt.
+        """
+        return make_request_key(
+            self.model,
+            {
                 "max_tokens": max_tokens,
-                "messages": messages
-            }
-            self.logger.debug(f"Request payload: {json.dumps(request_payload)}")
-            
-            # Make API call using the Anthropic SDK
-            response = self.client.messages.create(
+                "system": normalize_prompt(system) if system else None,
+                "stop_sequences": stop_sequences,
+                "template_version": template_version
+            },
+            [{**message, "content": _normalize_content(message["content"])} for message in messages]
+        )
+
+    def template_cache_key(self, template: str, inputs: Dict[str, Any], template_version: Optional[str] = None,
+                           max_tokens: Optional[int] = None, system: Optional[str] = None,
+                           stop_sequences: Optional[List[str]] = None) -> str:
+        """Content-addressed key for the response to a prompt template rendered from `inputs`
+
+        Only the template's name and version and the inputs it is rendered from
+        are hashed, not the rendered prompt, so volatile details added while
+        rendering (timestamps, derived statistics) cannot make every key unique.
+        """
+        return make_request_key(
+            self.model,
+            {
+                "template": template,
+                "template_version": template_version,
+                "max_tokens": max_tokens,
+                "system": normalize_prompt(system) if system else None,
+                "stop_sequences": stop_sequences
+            },
+            [inputs]
+        )
+
+    def _memo_key(self, call_site: str, messages: List[Dict[str, Any]], max_tokens: Optional[int],
+                  system: Optional[str], stop_sequences: Optional[List[str]]) -> Optional[str]:
+        """Memoization key for a request, or None if this call site is not memoized"""
+        if self.memoizer.policy.ttl_for(call_site) is None:
+            return None
+        # The caller's max_tokens hint rather than the learned limit, which drifts between runs
+        return self.response_cache_key(messages, max_tokens=max_tokens, system=system, stop_sequences=stop_sequences)
+
+    async def _send(self, request: Dict[str, Any], call_site: str, usage: Optional[Dict[str, int]] = None) -> str:
+        """Send a request, continuing it while the response stops at max_tokens
+
+        Token usage across every segment is added to `usage` when given.
+        """
+        try:
+            # Payloads are only serialized when payload logging is on and this call is sampled
+            log_payload = should_log_payload(self.logger)
+            text = ""
+            output_tokens = 0
+            for continuation in range(self.max_continuations + 1):
+                segment_request = continuation_request(request, text) if continuation else request
+                if log_payload:
+                    self.logger.debug("Request payload: %s", LazyJson(segment_request))
+                response = await self._send_once(segment_request, call_site, continuation)
+                if log_payload:
+                    self.logger.debug("Response: %s", response)
+                text = stitch_continuation(text, response.content[0].text) if continuation else response.content[0].text
+                output_tokens += response.usage.output_tokens or 0
+                if usage is not None:
+                    add_usage(usage, response.usage)
+                if response.stop_reason != "max_tokens":
+                    break
+            else:
+                self.logger.warning(f"{call_site} response still truncated after {self.max_continuations} continuations")
+
+            self.sizer.observe(call_site, output_tokens)
+            return text
+
+        except Exception as e:
+            self.logger.error(f"Error calling Claude API: {e}")
+            self.call_errors.inc(call_site=call_site, error_type=type(e).__name__)
+            self.ledger.record_error()
+            raise
+
+    async def _send_once(self, request: Dict[str, Any], call_site: str, continuation: int = 0) -> Any:
+        """Send one request to the Messages API and return the response message"""
+        prompt_chars, estimated_tokens, reservation = self._reserve_budget(request)
+
+        if self.batch_backend is not None:
+            with reservation:
+                try:
+                    return await self._send_batched(request, call_site, prompt_chars, reservation, continuation)
+                except Exception as e:
+                    if not self.batch_fallback:
+                        raise
+                    self.logger.warning(f"{call_site} request failed in its batch ({e}); sending it interactively")
+                    self.batch_fallbacks.inc(call_site=call_site)
+            # The batch's reservation was released on the way out; the interactive call holds its own
+            prompt_chars, estimated_tokens, reservation = self._reserve_budget(request)
+
+        with reservation, self.tracer.span("claude.messages.create", "llm", call_site=call_site, model=self.model,
+                                           continuation=continuation) as span:
+            # Make API call without blocking the event loop
+            started = time.perf_counter()
+            async for attempt in self.rate_limiter.retrying():
+                with attempt:
+                    async with self.rate_limiter.slot(estimated_tokens):
+                        raw_response = await self.client.messages.with_raw_response.create(**request)
+            self.rate_limiter.observe_headers(raw_response.headers)
+            response = raw_response.parse()
+            if inspect.isawaitable(response):
+                response = await response
+            timing = self._record_timing(started, None)
+            self._record_usage(
+                response, call_site, prompt_chars, len(request["messages"]), timing, reservation,
+                continuation=continuation
+            )
+            span.update(_usage_args(response.usage))
+        return response
+
+    async def stream_response(self, messages: List[Dict[str, Any]], max_tokens: Optional[int] = None, *,
+                              call_site: str, system: Optional[str] = None,
+                              stop_sequences: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """Stream a response from Claude, yielding text deltas as they arrive
+
+        A response that stops at max_tokens is continued in a new stream, so the
+        caller sees one uninterrupted sequence of deltas.
+        """
+        memo_key = self._memo_key(call_site, messages, max_tokens, system, stop_sequences)
+        if memo_key is not None:
+            memoized = self.memoizer.lookup(memo_key, call_site)
+            if memoized is not None:
+                yield memoized
+                return
+
+        max_tokens = self.sizer.max_tokens_for(call_site, max_tokens)
+        request = self._build_request(messages, max_tokens, system, stop_sequences)
+        usage: Dict[str, int] = {}
+        try:
+            if self.batch_backend is not None:
+                # Batches have no streaming; deliver the whole result as one delta
+                text = await self._send(request, call_site, usage)
+                if memo_key is not None:
+                    self.memoizer.store(memo_key, call_site, text, self.model, usage, batch=True)
+                yield text
+                return
+
+            log_payload = should_log_payload(self.logger)
+            text = ""
+            output_tokens = 0
+            for continuation in range(self.max_continuations + 1):
+                segment_request = continuation_request(request, text) if continuation else request
+                if log_payload:
+                    self.logger.debug("Request payload: %s", LazyJson({**segment_request, "stream": True}))
+                prompt_chars, estimated_tokens, reservation = self._reserve_budget(segment_request)
+
+                with reservation, self.tracer.span("claude.messages.stream", "llm", call_site=call_site,
+                                                   model=self.model, continuation=continuation) as span:
+                    started = time.perf_counter()
+                    first_token_at = None
+                    # Only opening the stream is retried; once text has been yielded it cannot be replayed
+                    async for attempt in self.rate_limiter.retrying():
+                        with attempt:
+                            async with AsyncExitStack() as attempt_stack:
+                                await attempt_stack.enter_async_context(self.rate_limiter.slot(estimated_tokens))
+                                stream = await attempt_stack.enter_async_context(
+                                    self.client.messages.stream(**segment_request)
+                                )
+                                stream_stack = attempt_stack.pop_all()
+
+                    async with stream_stack:
+                        self.rate_limiter.observe_headers(stream.response.headers)
+                        async for delta in stream.text_stream:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                                # The prefill dropped the trailing whitespace already shown to the caller
+                                if continuation and text[-1:].isspace():
+                                    delta = delta.lstrip()
+                            text += delta
+                            yield delta
+                        response = await stream.get_final_message()
+                    timing = self._record_timing(started, first_token_at)
+                    self._record_usage(
+                        response, call_site, prompt_chars, len(segment_request["messages"]), timing, reservation,
+                        continuation=continuation
+                    )
+                    span.update(_usage_args(response.usage))
+                    if first_token_at is not None:
+                        span["time_to_first_token_ms"] = round((first_token_at - started) * 1000, 1)
+                if log_payload:
+                    self.logger.debug("Response: %s", response)
+
+                output_tokens += response.usage.output_tokens or 0
+                add_usage(usage, response.usage)
+                if response.stop_reason != "max_tokens":
+                    break
+            else:
+                self.logger.warning(f"{call_site} response still truncated after {self.max_continuations} continuations")
+
+            self.sizer.observe(call_site, output_tokens)
+            if memo_key is not None:
+                self.memoizer.store(memo_key, call_site, text, self.model, usage)
+
+        except Exception as e:
+            self.logger.error(f"Error streaming from Claude API: {e}")
+            self.call_errors.inc(call_site=call_site, error_type=type(e).__name__)
+            self.ledger.record_error()
+            raise
+
+    async def _send_batched(self, request: Dict[str, Any], call_site: str, prompt_chars: int,
+                            reservation: BudgetReservation, continuation: int = 0) -> Any:
+        """Queue a request into the batch backend and wait for its result message"""
+        with self.tracer.span("claude.batch", "llm", call_site=call_site, model=self.model,
+                              continuation=continuation) as span:
+            started = time.perf_counter()
+            response = await self.batch_backend.submit(request)
+            timing = self._record_timing(started, None)
+            self._record_usage(
+                response, call_site, prompt_chars, len(request["messages"]), timing, reservation, batch=True,
+                continuation=continuation
+            )
+            span.update(_usage_args(response.usage))
+        return response
+
+    def _build_request(self, messages: List[Dict[str, Any]], max_tokens: int, system: Optional[str],
+                       stop_sequences: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Build Messages API parameters, sending the system prompt as a cached prefix"""
+        request = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": messages
+        }
+        if system:
+            request["system"] = system_blocks(system)
+        if stop_sequences:
+            request["stop_sequences"] = stop_sequences
+        return request
+
+    def _record_timing(self, started: float, first_token_at: Optional[float]) -> Dict[str, Optional[float]]:
+        """Log and return time-to-first-token and total latency for one call
+
+        Returned rather than stored on the client, which concurrent calls share.
+        """
+        finished = time.perf_counter()
+        timing = {
+            "time_to_first_token": first_token_at - started if first_token_at else None,
+            "total_latency": finished - started
+        }
+        ttft = timing["time_to_first_token"]
+        self.logger.info(
+            f"Claude call latency: total={timing['total_latency']:.3f}s"
+            + (f" ttft={ttft:.3f}s" if ttft is not None else "")
+        )
+        return timing
+
+    def fit_context(self, fields: List[Dict[str, Any]], template: str = "", max_tokens: int = 1000,
+                    system: Optional[str] = None) -> Dict[str, str]:
+        """Serialize prompt context fields, trimming low-priority ones to fit the token budget"""
+        available = self.budget.available_input(get_usage_tags().get("session"), max_tokens)
+        if available is not None:
+            # Everything else in the request counts against the same budget
+            available -= (
+                self.estimator.estimate(template)
+                + self.estimator.estimate(system or "")
+                + self.estimator.message_overhead
+            )
+        return trim_context(fields, available, self.estimator)
+
+    def _reserve_budget(self, request: Dict[str, Any]) -> Tuple[int, int, BudgetReservation]:
+        """Reject a request that would exceed the token budget, else hold its size against the session
+
+        Returns the request's size in chars and tokens and the reservation,
+        which _record_usage settles with the tokens the call actually used.
+        """
+        prompt_chars = self.estimator.estimate_chars(request["messages"], request.get("system"))
+        estimated_tokens = self.estimator.estimate_messages(request["messages"], request.get("system"))
+        reservation = self.budget.reserve(get_usage_tags().get("session"), estimated_tokens, request["max_tokens"])
+        return prompt_chars, estimated_tokens, reservation
+
+    def _record_usage(self, response: Any, call_site: str, prompt_chars: int, message_count: int,
+                      timing: Dict[str, Optional[float]], reservation: BudgetReservation,
+                      batch: bool = False, continuation: int = 0):
+        """Write the response's token usage to the ledger and settle the token budget"""
+        usage = response.usage
+        input_tokens = (
+            (usage.input_tokens or 0)
+            + (getattr(usage, "cache_read_input_tokens", 0) or 0)
+            + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+        )
+        self.estimator.calibrate(prompt_chars, input_tokens, message_count)
+        reservation.settle(input_tokens + (usage.output_tokens or 0))
+        try:
+            self.ledger.record(
+                model=getattr(response, "model", None) or self.model,
+                call_site=call_site,
+                usage=response.usage,
+                latency=timing["total_latency"],
+                time_to_first_token=timing["time_to_first_token"],
+                batch=batch,
+                stop_reason=getattr(response, "stop_reason", None),
+                continuation=continuation
+            )
+        except Exception as e:
+            self.logger.error(f"Error recording token usage: {e}")
+        self._record_metrics(usage, call_site, timing)
+
+    def _record_coalesced(self, call_site: str, usage: Dict[str, int], latency: float,
+                          reservation: BudgetReservation):
+        """Charge a caller that shared another caller's API call with the tokens that call used
+
+        Its session's budget and ledger see the call like any other; the ledger
+        marks it coalesced so the single API call's cost is not counted twice.
+        """
+        reservation.settle(sum(usage.values()))
+        try:
+            self.ledger.record(
                 model=self.model,
-                max_tokens=max_tokens,
-                messages=messages
+                call_site=call_site,
+                usage=SimpleNamespace(
+                    input_tokens=usage.get("input_tokens", 0),
+                    output_tokens=usage.get("output_tokens", 0),
+                    cache_read_input_tokens=usage.get("cache_read_tokens", 0),
+                    cache_creation_input_tokens=usage.get("cache_write_tokens", 0)
+                ),
+                latency=latency,
+                coalesced=True
             )
-            
-            # Log response for debugging
-            self.logger.debug(f"Response: {response}")
-            
-            # Return the response content
-            return response.content[0].text
-            
         except Exception as e:
-            self.logger.error(f"Error calling Claude API: {e}")
-            raise
\ No newline at end of file
+            self.logger.error(f"Error recording token usage: {e}")
+
+    def _record_metrics(self, usage: Any, call_site: str, timing: Dict[str, Optional[float]]):
+        """Update latency, throughput, token and prompt cache metrics for one API call"""
+        total = timing["total_latency"]
+        ttft = timing["time_to_first_token"]
+        output_tokens = usage.output_tokens or 0
+        self.calls.inc(call_site=call_site)
+        self.call_latency.observe(total, call_site=call_site)
+        if ttft is not None:
+            self.call_ttft.observe(ttft, call_site=call_site)
+        generation_time = total - ttft if ttft is not None else total
+        if output_tokens and generation_time > 0:
+            self.call_throughput.observe(output_tokens / generation_time, call_site=call_site)
+
+        for kind, tokens in [
+            ("input", usage.input_tokens or 0),
+            ("output", output_tokens),
+            ("cache_read", getattr(usage, "cache_read_input_tokens", 0) or 0),
+            ("cache_write", getattr(usage, "cache_creation_input_tokens", 0) or 0)
+        ]:
+            self.call_tokens.inc(tokens, call_site=call_site, kind=kind)
+        prompt_tokens = sum(self.call_tokens.value(call_site=call_site, kind=kind)
+                            for kind in ["input", "cache_read", "cache_write"])
+        if prompt_tokens:
+            self.cache_hit_ratio.set(
+                self.call_tokens.value(call_site=call_site, kind="cache_read") / prompt_tokens, call_site=call_site
+            )
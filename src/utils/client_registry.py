@@ -0,0 +1,51 @@
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import threading
+from src.utils.claude_client import ClaudeClient, DEFAULT_MODEL
+from src.utils.batch_backend import BatchBackend, batch_mode_enabled, message_batches
+
+class ClientRegistry:
+    """Hands out one configured ClaudeClient per (model, API key) for the whole process"""
+
+    def __init__(self, batch: Optional[bool] = None):
+        self.logger = logging.getLogger(__name__)
+        # Offline bulk runs send every call through Message Batches at half price, trading latency
+        self.batch = batch if batch is not None else batch_mode_enabled()
+        self._clients: Dict[Tuple[str, str], ClaudeClient] = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, model: Optional[str] = None, api_key: Optional[str] = None) -> ClaudeClient:
+        """Get the shared client for a model and API key, creating it on first use"""
+        model = model or os.getenv("CLAUDE_MODEL", DEFAULT_MODEL)
+        api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+        key = (model, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = ClaudeClient(api_key=api_key, model=model)
+                if self.batch:
+                    client.batch_backend = BatchBackend(message_batches(client.client))
+                self._clients[key] = client
+                self.logger.info(f"Created shared Claude client for {model}" + (" (batch mode)" if self.batch else ""))
+            return client
+
+    def clear(self):
+        """Forget every client so the next lookup builds a fresh one"""
+        with self._lock:
+            self._clients.clear()
+
+_default_registry: Optional[ClientRegistry] = None
+
+def get_client_registry() -> ClientRegistry:
+    """Get the process-wide client registry"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ClientRegistry()
+    return _default_registry
+
+def get_claude_client(model: Optional[str] = None, api_key: Optional[str] = None) -> ClaudeClient:
+    """Get the shared Claude client for a model and API key"""
+    return get_client_registry().get_client(model, api_key)
@@ -0,0 +1,95 @@
+from typing import Dict, List, Any, Optional
+import argparse
+import asyncio
+import time
+from src.utils.client_registry import get_claude_client
+from src.utils.claude_client import close_shared_http_client
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def run_load(requests: int, concurrency: int, stream: bool, max_tokens: int) -> Dict[str, Any]:
+    """Send `requests` distinct calls through the shared client, at most `concurrency` at a time"""
+    claude = get_claude_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def one(i: int):
+        # Distinct prompts so single-flight coalescing does not merge the calls
+        messages = [{"role": "user", "content": f"Load test request {i}: summarize a career plan."}]
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if stream:
+                    first = None
+                    async for _ in claude.stream_response(messages, max_tokens=max_tokens, call_site="load_test"):
+                        if first is None:
+                            first = time.perf_counter()
+                    ttfts.append(first - started if first else time.perf_counter() - started)
+                else:
+                    await claude.get_response(messages, max_tokens=max_tokens, call_site="load_test")
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": {p: percentile(latencies, p) for p in (50, 95, 99)},
+        "ttft": {p: percentile(ttfts, p) for p in (50, 95, 99)} if stream else None,
+        "rate_limiter": dict(claude.rate_limiter.stats),
+        "concurrency_limit": claude.rate_limiter.concurrency.limit
+    }
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Format a load test report as plain text"""
+    def fmt(value: Optional[float]) -> str:
+        return f"{value:.3f}s" if value is not None else "-"
+
+    lines = [
+        f"Requests: {report['succeeded']}/{report['requests']} succeeded in {report['elapsed']:.2f}s "
+        f"({report['throughput']:.2f} req/s)",
+        "Latency: " + " ".join(f"p{p}={fmt(v)}" for p, v in report["latency"].items())
+    ]
+    if report["ttft"]:
+        lines.append("Time to first token: " + " ".join(f"p{p}={fmt(v)}" for p, v in report["ttft"].items()))
+    if report["errors"]:
+        lines.append("Errors: " + ", ".join(f"{name}={count}" for name, count in report["errors"].items()))
+    lines.append(
+        f"Retries: {report['rate_limiter']['retries']}, throttled: {report['rate_limiter']['throttled']}, "
+        f"final concurrency limit: {report['concurrency_limit']:.1f}"
+    )
+    return "\n".join(lines)
+
+def main():
+    """Measure throughput and tail latency against ANTHROPIC_BASE_URL (e.g. the mock server)"""
+    parser = argparse.ArgumentParser(description="Load test the Claude client")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--stream", action="store_true", help="Use streaming responses")
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            return await run_load(args.requests, args.concurrency, args.stream, args.max_tokens)
+        finally:
+            await close_shared_http_client()
+
+    print(format_report(asyncio.run(run())))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from typing import Any, Dict, Optional
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+from src.utils.usage_ledger import get_usage_tags
+
+_listener: Optional[QueueListener] = None
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format each record as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, "usage_tags", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue records unformatted so message formatting happens on the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The calling task's session/phase/principal are only visible here, not on the listener thread
+        record.usage_tags = get_usage_tags()
+        return record
+
+class LazyJson:
+    """Serialize a value to JSON only if the log record is actually written"""
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, default=str)
+
+def configure_logging(path: Optional[str] = None) -> QueueListener:
+    """Route all logging through a queue to a rotating JSON-lines file; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    file_handler = RotatingFileHandler(
+        path or os.getenv("LOG_FILE", "career_planner.log"),
+        maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backupCount=int(os.getenv("LOG_BACKUP_COUNT", "3"))
+    )
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    # Keep HTTP request logs out of the file
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("anthropic").setLevel(logging.WARNING)
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Flush queued records to disk and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def should_log_payload(logger: logging.Logger) -> bool:
+    """Whether to log the full request/response of this call (LOG_PAYLOADS, sampled)"""
+    if os.getenv("LOG_PAYLOADS", "false").lower() != "true" or not logger.isEnabledFor(logging.DEBUG):
+        return False
+    return random.random() < float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
@@ -0,0 +1,146 @@
+from typing import Dict, List, Any, Optional
+import json
+import logging
+import os
+import threading
+from src.utils.metrics import get_metrics
+from src.utils.response_cache import ResponseCache
+from src.utils.usage_ledger import estimate_cost, get_usage_tags
+
+USAGE_FIELDS = ["input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens"]
+
+def add_usage(totals: Dict[str, int], usage: Any):
+    """Add one API response's usage block to running token totals"""
+    totals["input_tokens"] = totals.get("input_tokens", 0) + (usage.input_tokens or 0)
+    totals["output_tokens"] = totals.get("output_tokens", 0) + (usage.output_tokens or 0)
+    totals["cache_read_tokens"] = (
+        totals.get("cache_read_tokens", 0) + (getattr(usage, "cache_read_input_tokens", 0) or 0)
+    )
+    totals["cache_write_tokens"] = (
+        totals.get("cache_write_tokens", 0) + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+    )
+
+class MemoPolicy:
+    """Which call sites have their responses memoized, and for how long
+
+    Memoization is opt-in: nothing is memoized unless LLM_MEMOIZE_TTL sets a
+    default TTL or LLM_MEMOIZE_TTLS names a call site, e.g.
+    "BaseAgent.analyze=86400,_discuss_topic=3600,_build_consensus=0".
+    A TTL of 0 turns memoization off for that call site.
+    """
+
+    def __init__(self, default_ttl: float = 0, ttls: Optional[Dict[str, float]] = None):
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+
+    @classmethod
+    def from_env(cls) -> "MemoPolicy":
+        ttls = {}
+        for item in os.getenv("LLM_MEMOIZE_TTLS", "").split(","):
+            if "=" in item:
+                call_site, ttl = item.split("=", 1)
+                ttls[call_site.strip()] = float(ttl)
+        return cls(float(os.getenv("LLM_MEMOIZE_TTL", "0")), ttls)
+
+    @property
+    def enabled(self) -> bool:
+        return self.default_ttl > 0 or any(ttl > 0 for ttl in self.ttls.values())
+
+    def ttl_for(self, call_site: str) -> Optional[float]:
+        """Seconds to keep this call site's responses, or None if it is not memoized"""
+        ttl = self.ttls.get(call_site, self.default_ttl)
+        return ttl if ttl > 0 else None
+
+class Memoizer:
+    """Replays responses to identical Claude requests and accounts for what that saved
+
+    Each memoized response is stored with the tokens and cost it took to
+    produce, so a hit can report exactly what it saved.
+    """
+
+    def __init__(self, policy: MemoPolicy, cache_dir: Optional[str] = None):
+        self.policy = policy
+        self.cache_dir = cache_dir or os.getenv("LLM_MEMOIZE_DIR", os.path.join("cache", "llm"))
+        self.logger = logging.getLogger(__name__)
+        self.savings: Dict[str, Dict[str, Any]] = {}
+        self._cache: Optional[ResponseCache] = None
+        self._lock = threading.Lock()
+        metrics = get_metrics()
+        self.lookups = metrics.counter("claude_memo_lookups_total", "Memoized Claude call lookups by result")
+        self.saved_tokens = metrics.counter("claude_memo_saved_tokens_total", "Tokens not spent thanks to memoization")
+        self.saved_usd = metrics.counter("claude_memo_saved_usd_total", "Estimated USD not spent thanks to memoization")
+
+    @property
+    def cache(self) -> ResponseCache:
+        # Opened on first use so processes that never memoize do not touch the cache directory
+        with self._lock:
+            if self._cache is None:
+                self._cache = ResponseCache(self.cache_dir)
+            return self._cache
+
+    def _session_savings(self) -> Dict[str, Any]:
+        session = get_usage_tags().get("session") or "unknown"
+        return self.savings.setdefault(session, {
+            "hits": 0,
+            "misses": 0,
+            **{field: 0 for field in USAGE_FIELDS},
+            "cost_usd": 0.0
+        })
+
+    def lookup(self, key: str, call_site: str) -> Optional[str]:
+        """Get the memoized response for a request, counting the hit or miss"""
+        value = self.cache.get(key)
+        with self._lock:
+            savings = self._session_savings()
+            if value is None:
+                savings["misses"] += 1
+                self.lookups.inc(call_site=call_site, result="miss")
+                return None
+            entry = json.loads(value)
+            usage = entry["usage"]
+            savings["hits"] += 1
+            for field in USAGE_FIELDS:
+                savings[field] += usage.get(field, 0)
+            savings["cost_usd"] += usage.get("cost_usd", 0.0)
+        self.lookups.inc(call_site=call_site, result="hit")
+        for field in USAGE_FIELDS:
+            if usage.get(field):
+                self.saved_tokens.inc(usage[field], call_site=call_site, kind=field[:-len("_tokens")])
+        self.saved_usd.inc(usage.get("cost_usd", 0.0), call_site=call_site)
+        self.logger.debug(f"Memoized {call_site} response replayed, saving ${usage.get('cost_usd', 0.0):.4f}")
+        return entry["text"]
+
+    def store(self, key: str, call_site: str, text: str, model: str, usage: Dict[str, int], batch: bool = False):
+        """Memoize a response along with the usage it took to produce"""
+        ttl = self.policy.ttl_for(call_site)
+        if ttl is None:
+            return
+        usage = {**usage, "cost_usd": estimate_cost({**usage, "model": model, "batch": batch})}
+        self.cache.set(key, json.dumps({"text": text, "usage": usage}), ttl=ttl)
+
+    def session_savings(self, session: str) -> Dict[str, Any]:
+        """Hits, misses, tokens and USD saved by memoization in a session"""
+        with self._lock:
+            return dict(self.savings.get(session, {}))
+
+    def release_session(self, session: str):
+        """Forget a finished session's savings"""
+        with self._lock:
+            self.savings.pop(session, None)
+
+def format_savings(savings: Dict[str, Any]) -> str:
+    """Format a session's memoization savings as one line"""
+    tokens = sum(savings.get(field, 0) for field in USAGE_FIELDS)
+    return (
+        f"memoization: {savings.get('hits', 0)} hits, {savings.get('misses', 0)} misses, "
+        f"{tokens} tokens and ${savings.get('cost_usd', 0.0):.4f} saved"
+    )
+
+_default_memoizer: Optional[Memoizer] = None
+
+def get_memoizer() -> Memoizer:
+    """Get the process-wide memoizer, configured by LLM_MEMOIZE_TTL / LLM_MEMOIZE_TTLS"""
+    global _default_memoizer
+    if _default_memoizer is None:
+        _default_memoizer = Memoizer(MemoPolicy.from_env())
+    return _default_memoizer
@@ -0,0 +1,210 @@
+from typing import Dict, List, Any, Optional, Tuple, Iterator, Deque
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> LabelValues:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(labels: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """Monotonically increasing count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in items]
+
+class Gauge(Counter):
+    """Value that can go up and down per label set"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self.values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: Any):
+        self.inc(-amount, **labels)
+
+class Summary:
+    """Count, sum and p50/p95/p99 over a sliding window of recent observations per label set"""
+
+    kind = "summary"
+    quantiles = (0.5, 0.95, 0.99)
+
+    def __init__(self, name: str, help_text: str, window: int = 1024):
+        self.name = name
+        self.help = help_text
+        self.window = window
+        self.observations: Dict[LabelValues, Deque[float]] = {}
+        self.counts: Dict[LabelValues, int] = {}
+        self.sums: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            self.observations.setdefault(key, deque(maxlen=self.window)).append(value)
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.sums[key] = self.sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe how long the block takes, in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def quantile(self, q: float, **labels: Any) -> Optional[float]:
+        with self._lock:
+            values = sorted(self.observations.get(_label_key(labels), ()))
+        return _quantile(values, q)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            snapshot = [(key, sorted(values), self.counts[key], self.sums[key])
+                        for key, values in self.observations.items()]
+        lines = []
+        for labels, values, count, total in snapshot:
+            for q in self.quantiles:
+                lines.append(f"{self.name}{_format_labels(labels, ('quantile', str(q)))} "
+                             f"{_format_value(_quantile(values, q))}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+def _quantile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+class MetricsRegistry:
+    """Named metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs: Any):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, **kwargs)
+                self.metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def summary(self, name: str, help_text: str, window: int = 1024) -> Summary:
+        return self._get_or_create(Summary, name, help_text, window=window)
+
+    def render(self) -> str:
+        """Render every metric as Prometheus text"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Write the current metrics to a file, replacing it atomically"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+def start_metrics_server(registry: "MetricsRegistry", port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics for a local Prometheus scraper from a background thread"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.getLogger(__name__).info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+_default_registry: Optional[MetricsRegistry] = None
+
+def get_metrics() -> MetricsRegistry:
+    """Get the process-wide metrics registry, exporting it as configured by METRICS_PORT / METRICS_FILE"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = MetricsRegistry()
+        port = int(os.getenv("METRICS_PORT", "0"))
+        if port:
+            start_metrics_server(_default_registry, port)
+        metrics_file = os.getenv("METRICS_FILE")
+        if metrics_file:
+            _start_file_dumps(_default_registry, metrics_file, float(os.getenv("METRICS_DUMP_INTERVAL", "15")))
+    return _default_registry
+
+def _start_file_dumps(registry: MetricsRegistry, path: str, interval: float):
+    """Rewrite the metrics file every `interval` seconds and once more at exit"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                registry.dump(path)
+            except OSError as e:
+                logging.getLogger(__name__).error(f"Error writing metrics file {path}: {e}")
+
+    threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+    atexit.register(registry.dump, path)
@@ -0,0 +1,296 @@
+from typing import Dict, List, Any, Optional, Tuple
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from aiohttp import web
+
+LOREM_WORDS = (
+    "career growth requires clear goals steady practice honest feedback and a plan that connects "
+    "today's skills with tomorrow's opportunities across roles teams and industries"
+).split()
+
+class MockMessagesServer:
+    """Local stand-in for the Messages API with realistic usage, rate-limit headers and injected faults"""
+
+    def __init__(self, latency_median: float = 0.5, latency_sigma: float = 0.5, token_interval: float = 0.02,
+                 output_tokens: int = 200, error_429_rate: float = 0.0, error_529_rate: float = 0.0,
+                 requests_per_minute: int = 50, input_tokens_per_minute: int = 40000, chars_per_token: float = 3.5):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.token_interval = token_interval
+        self.output_tokens = output_tokens
+        self.error_429_rate = error_429_rate
+        self.error_529_rate = error_529_rate
+        self.requests_per_minute = requests_per_minute
+        self.input_tokens_per_minute = input_tokens_per_minute
+        self.chars_per_token = chars_per_token
+        self._cached_prefixes: set = set()
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._window_tokens = 0
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._batch_results: Dict[str, List[Dict[str, Any]]] = {}
+        self.stats = {"requests": 0, "streamed": 0, "rate_limited": 0, "overloaded": 0, "batches": 0}
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/messages", self.handle_messages)
+        app.router.add_post("/v1/messages/batches", self.handle_create_batch)
+        app.router.add_get("/v1/messages/batches/{batch_id}", self.handle_retrieve_batch)
+        app.router.add_get("/v1/messages/batches/{batch_id}/results", self.handle_batch_results)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def handle_messages(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.stats["requests"] += 1
+        input_tokens, cache_read, cache_write = self._count_input(body)
+
+        rejected = self._admit(input_tokens + cache_read + cache_write)
+        if rejected is not None:
+            return rejected
+        if random.random() < self.error_529_rate:
+            self.stats["overloaded"] += 1
+            return self._error(529, "overloaded_error", "Overloaded", retry_after=None)
+        if random.random() < self.error_429_rate:
+            self.stats["rate_limited"] += 1
+            return self._error(429, "rate_limit_error", "Injected rate limit", retry_after=1)
+
+        message = self._build_message(body, input_tokens, cache_read, cache_write)
+        await asyncio.sleep(self._sample_latency())
+        if body.get("stream"):
+            self.stats["streamed"] += 1
+            return await self._stream(request, message)
+        return web.json_response(message, headers=self._rate_limit_headers())
+
+    def _build_message(self, body: Dict[str, Any], input_tokens: int, cache_read: int,
+                       cache_write: int) -> Dict[str, Any]:
+        """Generate a response message to a Messages API request body"""
+        # The natural answer length ignores max_tokens; longer answers are cut off like the real API
+        max_tokens = body.get("max_tokens", 1024)
+        natural_tokens = random.randint(max(1, self.output_tokens // 2), max(1, self.output_tokens))
+        text = self._generate_text(min(max_tokens, natural_tokens))
+        output_tokens = self._estimate(text)
+        stop_reason = "max_tokens" if natural_tokens > max_tokens else "end_turn"
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_creation_input_tokens": cache_write,
+            "cache_read_input_tokens": cache_read
+        }
+        message = {
+            "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage
+        }
+        return message
+
+    async def handle_create_batch(self, request: web.Request) -> web.Response:
+        """Accept a message batch; it ends after one sampled latency, without rate limits or faults"""
+        body = await request.json()
+        self.stats["batches"] += 1
+        batch_id = f"msgbatch_mock_{uuid.uuid4().hex[:24]}"
+        requests = body.get("requests", [])
+        self._batches[batch_id] = {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "in_progress",
+            "request_counts": {"processing": len(requests), "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "expires_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 86400)),
+            "ended_at": None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": None
+        }
+        asyncio.create_task(self._process_batch(batch_id, requests, str(request.url)))
+        return web.json_response(self._batches[batch_id])
+
+    async def _process_batch(self, batch_id: str, requests: List[Dict[str, Any]], base_url: str):
+        await asyncio.sleep(self._sample_latency())
+        results = []
+        for entry in requests:
+            message = self._build_message(entry["params"], *self._count_input(entry["params"]))
+            results.append({"custom_id": entry["custom_id"], "result": {"type": "succeeded", "message": message}})
+        self._batch_results[batch_id] = results
+        batch = self._batches[batch_id]
+        batch["request_counts"].update(processing=0, succeeded=len(results))
+        batch["processing_status"] = "ended"
+        batch["ended_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        batch["results_url"] = f"{base_url.split('?')[0]}/{batch_id}/results"
+
+    async def handle_retrieve_batch(self, request: web.Request) -> web.Response:
+        batch = self._batches.get(request.match_info["batch_id"])
+        if batch is None:
+            return self._error(404, "not_found_error", "No such batch", retry_after=None)
+        return web.json_response(batch)
+
+    async def handle_batch_results(self, request: web.Request) -> web.Response:
+        results = self._batch_results.get(request.match_info["batch_id"])
+        if results is None:
+            return self._error(404, "not_found_error", "Batch results are not available yet", retry_after=None)
+        return web.Response(
+            text="".join(json.dumps(result) + "\n" for result in results),
+            content_type="application/x-jsonl"
+        )
+
+    async def _stream(self, request: web.Request, message: Dict[str, Any]) -> web.StreamResponse:
+        """Send a message as server-sent events, one word per delta"""
+        response = web.StreamResponse(headers={"content-type": "text/event-stream", **self._rate_limit_headers()})
+        await response.prepare(request)
+        usage = message["usage"]
+        start = {**message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 1}}
+        await self._send_event(response, "message_start", {"type": "message_start", "message": start})
+        await self._send_event(response, "content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}
+        })
+        words = message["content"][0]["text"].split(" ")
+        for i, word in enumerate(words):
+            delta = word if i == 0 else " " + word
+            await self._send_event(response, "content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": delta}
+            })
+            await asyncio.sleep(self.token_interval)
+        await self._send_event(response, "content_block_stop", {"type": "content_block_stop", "index": 0})
+        await self._send_event(response, "message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+            "usage": {"output_tokens": usage["output_tokens"]}
+        })
+        await self._send_event(response, "message_stop", {"type": "message_stop"})
+        await response.write_eof()
+        return response
+
+    async def _send_event(self, response: web.StreamResponse, event: str, data: Dict[str, Any]):
+        await response.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    def _count_input(self, body: Dict[str, Any]) -> Tuple[int, int, int]:
+        """Split input tokens into uncached, cache-read and cache-write like the real API"""
+        blocks: List[Dict[str, Any]] = []
+        system = body.get("system")
+        if isinstance(system, str):
+            blocks.append({"text": system})
+        elif isinstance(system, list):
+            blocks.extend(system)
+        for message in body.get("messages", []):
+            content = message.get("content", "")
+            blocks.extend([{"text": content}] if isinstance(content, str) else content)
+
+        # Everything up to the last cache breakpoint is one cacheable prefix
+        prefix_end = max((i + 1 for i, block in enumerate(blocks) if block.get("cache_control")), default=0)
+        prefix_text = "".join(block.get("text", "") for block in blocks[:prefix_end])
+        rest_tokens = self._estimate("".join(block.get("text", "") for block in blocks[prefix_end:]))
+        rest_tokens += 4 * len(body.get("messages", []))
+        if not prefix_text:
+            return rest_tokens, 0, 0
+
+        prefix_tokens = self._estimate(prefix_text)
+        prefix_key = hashlib.sha256((body.get("model", "") + prefix_text).encode("utf-8")).hexdigest()
+        if prefix_key in self._cached_prefixes:
+            return rest_tokens, prefix_tokens, 0
+        self._cached_prefixes.add(prefix_key)
+        return rest_tokens, 0, prefix_tokens
+
+    def _admit(self, input_tokens: int) -> Optional[web.Response]:
+        """Apply per-minute request and input token limits"""
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_requests = 0
+            self._window_tokens = 0
+        if self._window_requests + 1 > self.requests_per_minute or \
+                self._window_tokens + input_tokens > self.input_tokens_per_minute:
+            self.stats["rate_limited"] += 1
+            retry_after = max(1, math.ceil(60 - (now - self._window_start)))
+            return self._error(429, "rate_limit_error", "Rate limit exceeded", retry_after=retry_after)
+        self._window_requests += 1
+        self._window_tokens += input_tokens
+        return None
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        reset = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 60 - (time.monotonic() - self._window_start)))
+        return {
+            "request-id": f"req_mock_{uuid.uuid4().hex[:24]}",
+            "anthropic-ratelimit-requests-limit": str(self.requests_per_minute),
+            "anthropic-ratelimit-requests-remaining": str(max(0, self.requests_per_minute - self._window_requests)),
+            "anthropic-ratelimit-requests-reset": reset,
+            "anthropic-ratelimit-input-tokens-limit": str(self.input_tokens_per_minute),
+            "anthropic-ratelimit-input-tokens-remaining": str(max(0, self.input_tokens_per_minute - self._window_tokens)),
+            "anthropic-ratelimit-input-tokens-reset": reset
+        }
+
+    def _error(self, status: int, error_type: str, message: str, retry_after: Optional[int]) -> web.Response:
+        headers = self._rate_limit_headers()
+        if retry_after is not None:
+            headers["retry-after"] = str(retry_after)
+        return web.json_response(
+            {"type": "error", "error": {"type": error_type, "message": message}},
+            status=status,
+            headers=headers
+        )
+
+    def _sample_latency(self) -> float:
+        """Time to first byte, log-normally distributed around the configured median"""
+        if self.latency_sigma <= 0:
+            return self.latency_median
+        return random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+    def _generate_text(self, tokens: int) -> str:
+        """Filler text of about the given number of tokens"""
+        target_chars = int(max(1, tokens) * self.chars_per_token)
+        words: List[str] = []
+        length = 0
+        while True:
+            word = random.choice(LOREM_WORDS)
+            if words and length + 1 + len(word) > target_chars:
+                break
+            words.append(word)
+            length += len(word) + (1 if len(words) > 1 else 0)
+        return " ".join(words)
+
+    def _estimate(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+def main():
+    """Run the mock Messages API server"""
+    parser = argparse.ArgumentParser(description="Local mock of the Anthropic Messages API for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-median", type=float, default=0.5, help="Median seconds to first byte")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread; 0 for constant latency")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="Seconds between streamed deltas")
+    parser.add_argument("--output-tokens", type=int, default=200, help="Upper bound on generated tokens")
+    parser.add_argument("--error-429-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-529-rate", type=float, default=0.0, help="Fraction of requests answered with 529")
+    parser.add_argument("--rpm", type=int, default=50, help="Requests per minute before 429")
+    parser.add_argument("--input-tpm", type=int, default=40000, help="Input tokens per minute before 429")
+    args = parser.parse_args()
+
+    server = MockMessagesServer(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        token_interval=args.token_interval,
+        output_tokens=args.output_tokens,
+        error_429_rate=args.error_429_rate,
+        error_529_rate=args.error_529_rate,
+        requests_per_minute=args.rpm,
+        input_tokens_per_minute=args.input_tpm
+    )
+    print(f"Mock Messages API on http://{args.host}:{args.port} (set ANTHROPIC_BASE_URL to use it)")
+    web.run_app(server.build_app(), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
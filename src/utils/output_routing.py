@@ -0,0 +1,57 @@
+from typing import Any, Callable, Iterator, Optional, TextIO
+from contextlib import contextmanager
+from contextvars import ContextVar
+import sys
+import threading
+
+# Where text printed in the current task goes; None prints to the real stdout
+_output_sink: ContextVar[Optional[Callable[[str], Any]]] = ContextVar("output_sink", default=None)
+
+class RoutedStdout:
+    """sys.stdout stand-in that sends text printed in a redirected context to that context's sink"""
+
+    def __init__(self, target: TextIO):
+        self.target = target
+
+    def write(self, text: str) -> int:
+        sink = _output_sink.get()
+        if sink is None:
+            return self.target.write(text)
+        sink(text)
+        return len(text)
+
+    def flush(self):
+        if _output_sink.get() is None:
+            self.target.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.target, name)
+
+_routed_users = 0
+_routed_lock = threading.Lock()
+
+@contextmanager
+def routed_stdout() -> Iterator[None]:
+    """Keep sys.stdout routed while any caller needs it, however their lifetimes overlap"""
+    global _routed_users
+    with _routed_lock:
+        if _routed_users == 0 and not isinstance(sys.stdout, RoutedStdout):
+            sys.stdout = RoutedStdout(sys.stdout)
+        _routed_users += 1
+    try:
+        yield
+    finally:
+        with _routed_lock:
+            _routed_users -= 1
+            if _routed_users == 0 and isinstance(sys.stdout, RoutedStdout):
+                sys.stdout = sys.stdout.target
+
+@contextmanager
+def redirect_output(write: Callable[[str], Any]) -> Iterator[None]:
+    """Send everything printed in this context, and in tasks started from it, to `write`"""
+    token = _output_sink.set(write)
+    try:
+        with routed_stdout():
+            yield
+    finally:
+        _output_sink.reset(token)
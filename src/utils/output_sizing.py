@@ -0,0 +1,81 @@
+from typing import Dict, List, Any, Optional, Deque
+from collections import deque
+import math
+import os
+import threading
+from src.utils.transport import transport_mode
+from src.utils.usage_ledger import get_usage_ledger
+
+DEFAULT_MAX_TOKENS = 1000
+
+class OutputSizer:
+    """Per-call-site max_tokens learned from the output lengths each call site actually produces
+
+    Until a call site has `min_samples` observations its caller's hint (or
+    DEFAULT_MAX_TOKENS) is used. After that the limit is the observed
+    percentile plus headroom, rounded up and clamped. Continuation covers the
+    rare response that still runs past it.
+
+    A disabled sizer always uses the hint. Sizing is off when recording or
+    replaying (CLAUDE_TRANSPORT), since a learned limit changes the request
+    body from run to run and a replay would no longer find its recording.
+    """
+
+    def __init__(self, percentile: Optional[float] = None, headroom: Optional[float] = None,
+                 min_samples: Optional[int] = None, window: int = 200,
+                 floor: int = 64, ceiling: Optional[int] = None, enabled: Optional[bool] = None):
+        self.percentile = percentile if percentile is not None else float(os.getenv("OUTPUT_SIZING_PERCENTILE", "95"))
+        self.headroom = headroom if headroom is not None else float(os.getenv("OUTPUT_SIZING_HEADROOM", "1.25"))
+        self.min_samples = min_samples if min_samples is not None else int(os.getenv("OUTPUT_SIZING_MIN_SAMPLES", "5"))
+        self.floor = floor
+        self.ceiling = ceiling or int(os.getenv("OUTPUT_SIZING_CEILING", "8192"))
+        self.window = window
+        if enabled is None:
+            enabled = os.getenv("OUTPUT_SIZING", "true").lower() == "true" and transport_mode() == "live"
+        self.enabled = enabled
+        self.samples: Dict[str, Deque[int]] = {}
+        self._lock = threading.Lock()
+
+    def load_records(self, records: List[Dict[str, Any]]):
+        """Seed the distributions from usage ledger records"""
+        for record in records:
+            # Later segments of a continued response are not whole responses
+            if record.get("continuation", 0):
+                continue
+            tokens = record.get("output_tokens", 0)
+            # A truncated response only shows a lower bound; assume it needed about twice as much
+            if record.get("stop_reason") == "max_tokens":
+                tokens *= 2
+            self.observe(record.get("call_site") or "unknown", tokens)
+
+    def observe(self, call_site: str, output_tokens: int):
+        """Record the full output length of one logical call"""
+        if output_tokens <= 0:
+            return
+        with self._lock:
+            self.samples.setdefault(call_site, deque(maxlen=self.window)).append(output_tokens)
+
+    def max_tokens_for(self, call_site: str, hint: Optional[int] = None) -> int:
+        """max_tokens to request for the next call from this call site"""
+        fallback = hint or DEFAULT_MAX_TOKENS
+        if not self.enabled:
+            return fallback
+        with self._lock:
+            samples = sorted(self.samples.get(call_site, ()))
+        if len(samples) < self.min_samples:
+            return fallback
+        index = min(len(samples) - 1, max(0, math.ceil(self.percentile / 100 * len(samples)) - 1))
+        sized = math.ceil(samples[index] * self.headroom / 64) * 64
+        return max(self.floor, min(self.ceiling, sized))
+
+_default_sizer: Optional[OutputSizer] = None
+
+def get_output_sizer() -> OutputSizer:
+    """Get the process-wide output sizer, seeded from the most recent usage ledger records"""
+    global _default_sizer
+    if _default_sizer is None:
+        _default_sizer = OutputSizer()
+        # Only the tail is read: the ledger only grows, and old samples would fall out of the window anyway
+        history_bytes = int(os.getenv("OUTPUT_SIZING_HISTORY_BYTES", str(2 * 1024 * 1024)))
+        _default_sizer.load_records(get_usage_ledger().load_recent_records(history_bytes))
+    return _default_sizer
@@ -0,0 +1,49 @@
+from typing import Dict, List, Any, Optional
+import json
+
+# Marks the end of a prefix the API should cache
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Prompt caching allows at most four breakpoints per request, one of them on the system prompt
+MAX_CACHED_CONTEXT_BLOCKS = 3
+
+# Fields that differ on every run; left in a prompt they make each request unique
+VOLATILE_FIELDS = frozenset({"timestamp"})
+
+def system_blocks(system_prompt: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """Build the `system` parameter with a cache breakpoint on the system prompt"""
+    if not system_prompt:
+        return None
+    return [{"type": "text", "text": system_prompt, "cache_control": CACHE_CONTROL}]
+
+def cached_context_message(context_blocks: List[str], prompt: str) -> Dict[str, Any]:
+    """Build a user message whose stable context blocks come first, each ending a cached prefix"""
+    if len(context_blocks) > MAX_CACHED_CONTEXT_BLOCKS:
+        raise ValueError(f"At most {MAX_CACHED_CONTEXT_BLOCKS} cached context blocks are allowed")
+    content = [
+        {"type": "text", "text": block, "cache_control": CACHE_CONTROL}
+        for block in context_blocks if block
+    ]
+    content.append({"type": "text", "text": prompt})
+    return {"role": "user", "content": content}
+
+def without_volatile_fields(value: Any) -> Any:
+    """Copy a value to be serialized into a prompt, leaving out volatile fields such as timestamps"""
+    if isinstance(value, dict):
+        return {key: without_volatile_fields(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [without_volatile_fields(item) for item in value]
+    return value
+
+def format_session_context(user_info: Dict[str, Any], conversation_history: List[Dict[str, Any]]) -> str:
+    """Serialize the user profile and interview transcript as a deterministic prompt prefix"""
+    lines = ["User Profile:"]
+    lines.append(json.dumps(user_info, sort_keys=True, ensure_ascii=False))
+    lines.append("")
+    lines.append("Interview Transcript:")
+    for entry in conversation_history:
+        if "response" not in entry:
+            continue
+        lines.append(f"[{entry.get('section', '')}] Q: {entry.get('question', '')}")
+        lines.append(f"A: {entry.get('response', '')}")
+    return "\n".join(lines)
@@ -0,0 +1,210 @@
+from typing import Optional, Mapping, AsyncIterator
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+import random
+import time
+import anthropic
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception, stop_after_attempt
+from src.utils.metrics import get_metrics
+from src.utils.tracing import get_tracer
+
+# Status codes worth retrying: rate limited, overloaded, transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLE_STATUS_CODES = {429, 529}
+
+class TokenBucket:
+    """Bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` units are available and take them"""
+        # A request larger than the bucket would never fit; let it drain a full bucket
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float]):
+        """Align the bucket with the limit and remaining count reported by the API"""
+        self._refill()
+        if limit:
+            self.capacity = float(limit)
+            self.rate = limit / 60.0
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+
+class AdaptiveConcurrency:
+    """Concurrency limit adjusted by additive increase / multiplicative decrease"""
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        """Wait for a free slot under the current limit"""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        """Free a slot and wake a waiter"""
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def increase(self):
+        """Grow the limit by roughly one slot per window of successful calls"""
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def decrease(self, factor: float = 0.5):
+        """Shrink the limit after the API pushed back"""
+        self.limit = max(self.minimum, self.limit * factor)
+
+class AdaptiveRateLimiter:
+    """Requests/min and tokens/min limits plus AIMD concurrency, shared by all principals"""
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, max_retries: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        rpm = requests_per_minute or int(os.getenv("RATE_LIMIT_RPM", "50"))
+        tpm = tokens_per_minute or int(os.getenv("RATE_LIMIT_TPM", "40000"))
+        maximum = max_concurrency or int(os.getenv("MAX_CONCURRENCY", "8"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("MAX_RETRIES", "3"))
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(initial=max(1, maximum // 2), maximum=maximum)
+        self.stats = {"retries": 0, "throttled": 0}
+        metrics = get_metrics()
+        self.in_flight = metrics.gauge("claude_requests_in_flight", "Claude API calls currently holding a slot")
+        self.concurrency_limit = metrics.gauge("claude_concurrency_limit", "Current adaptive concurrency limit")
+        self.retries = metrics.counter("claude_retries_total", "Retried Claude API calls")
+        self.throttled = metrics.counter("claude_throttled_total", "Claude API calls rejected with 429 or 529")
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator[None]:
+        """Hold a concurrency slot and rate budget for one API call"""
+        with get_tracer().span("rate_limiter.concurrency_wait", "wait"):
+            await self.concurrency.acquire()
+        self.in_flight.inc()
+        try:
+            with get_tracer().span("rate_limiter.bucket_wait", "wait", estimated_tokens=estimated_tokens):
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimated_tokens)
+            yield
+        except Exception as e:
+            if _status_code(e) in THROTTLE_STATUS_CODES:
+                self.stats["throttled"] += 1
+                self.throttled.inc(status=_status_code(e))
+                self.concurrency.decrease()
+                self.logger.warning(
+                    f"API throttled ({_status_code(e)}); concurrency limit now {self.concurrency.limit:.1f}"
+                )
+            raise
+        else:
+            self.concurrency.increase()
+        finally:
+            self.in_flight.dec()
+            self.concurrency_limit.set(self.concurrency.limit)
+            await self.concurrency.release()
+
+    def observe_headers(self, headers: Mapping[str, str]):
+        """Update the buckets from anthropic-ratelimit-* response headers"""
+        self.requests.sync(
+            _header_number(headers, "anthropic-ratelimit-requests-limit"),
+            _header_number(headers, "anthropic-ratelimit-requests-remaining")
+        )
+        token_prefix = "anthropic-ratelimit-input-tokens" if "anthropic-ratelimit-input-tokens-limit" in headers \
+            else "anthropic-ratelimit-tokens"
+        self.tokens.sync(
+            _header_number(headers, f"{token_prefix}-limit"),
+            _header_number(headers, f"{token_prefix}-remaining")
+        )
+        # Back off before the API has to reject anything
+        if _header_number(headers, "anthropic-ratelimit-requests-remaining") == 0 or \
+                _header_number(headers, f"{token_prefix}-remaining") == 0:
+            self.concurrency.decrease(0.75)
+
+    def retrying(self) -> AsyncRetrying:
+        """Retry policy for one logical call: jittered exponential backoff honoring retry-after"""
+        return AsyncRetrying(
+            stop=stop_after_attempt(self.max_retries + 1),
+            wait=self._wait,
+            retry=retry_if_exception(is_retryable),
+            before_sleep=self._before_sleep,
+            reraise=True
+        )
+
+    def _wait(self, retry_state: RetryCallState) -> float:
+        exception = retry_state.outcome.exception() if retry_state.outcome else None
+        retry_after = _retry_after(exception)
+        backoff = random.uniform(0, min(30.0, 0.5 * 2 ** retry_state.attempt_number))
+        return retry_after + random.uniform(0, 0.5) if retry_after is not None else backoff
+
+    def _before_sleep(self, retry_state: RetryCallState):
+        self.stats["retries"] += 1
+        self.retries.inc()
+        exception = retry_state.outcome.exception() if retry_state.outcome else None
+        self.logger.warning(
+            f"Retrying Claude call (attempt {retry_state.attempt_number + 1}) after {exception!r}; "
+            f"sleeping {retry_state.next_action.sleep:.2f}s"
+        )
+
+def is_retryable(exception: BaseException) -> bool:
+    """Whether a failed call should be retried"""
+    if isinstance(exception, anthropic.APIConnectionError):
+        return True
+    return _status_code(exception) in RETRYABLE_STATUS_CODES
+
+def _status_code(exception: BaseException) -> Optional[int]:
+    return getattr(exception, "status_code", None)
+
+def _retry_after(exception: Optional[BaseException]) -> Optional[float]:
+    response = getattr(exception, "response", None)
+    if response is None:
+        return None
+    return _header_number(response.headers, "retry-after")
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+_default_limiter: Optional[AdaptiveRateLimiter] = None
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """Get the process-wide rate limiter"""
+    global _default_limiter
+    if _default_limiter is None:
+        _default_limiter = AdaptiveRateLimiter()
+    return _default_limiter
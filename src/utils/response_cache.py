@@ -1,69 +1,201 @@
-from typing import Dict, Any
-import json
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+import asyncio
+import atexit
+import logging
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
+from src.utils.metrics import get_metrics
+from src.utils.cache_store import (
+    JsonCacheStore, SqliteCacheStore, CacheCompactor, MemoryTier, WriteBehindWriter, entry_expires_at
+)
+from src.utils.cache_snapshot import CacheSnapshot, snapshot_path
 
 class ResponseCache:
-    def __init__(self, cache_dir: str = "cache"):
+    """Two-tier response cache: a bounded in-memory LRU in front of a persistent store
+
+    Reads are served from memory when possible. Writes land in memory and are
+    persisted by a background write-behind thread, so set() never touches disk.
+    Within CACHE_STALE_GRACE seconds of expiring, get_or_refresh() still serves
+    an entry immediately while refreshing it in the background. A read-only
+    snapshot (see cache_snapshot) in the cache directory is consulted last.
+    """
+
+    def __init__(self, cache_dir: str = "cache", backend: Optional[str] = None):
         self.cache_dir = cache_dir
-        self.cache: Dict[str, Dict[str, Any]] = {}
-        self.cache_duration = timedelta(hours=24)
+        self.logger = logging.getLogger(__name__)
+        self.cache_duration = timedelta(seconds=float(os.getenv("CACHE_EXPIRY", str(24 * 3600))))
+        self.stale_grace = timedelta(seconds=float(os.getenv("CACHE_STALE_GRACE", "0")))
+        # One refresh per key at a time; concurrent callers share it
+        self._refreshes: Dict[str, asyncio.Future] = {}
+        # "sqlite" (default) or "json" for the original whole-file format
+        self.backend = backend or os.getenv("CACHE_BACKEND", "sqlite")
+        self.lookups = get_metrics().counter("response_cache_lookups_total", "Response cache lookups by result")
+        self.dropped_writes = get_metrics().counter(
+            "response_cache_dropped_writes_total", "Cache writes not persisted because the write-behind queue was full"
+        )
+        self.memory = MemoryTier(
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        )
         self._init_cache()
 
     def _init_cache(self):
-        """Initialize cache directory and load existing cache"""
+        """Initialize cache directory and open the storage backend"""
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
-        self._load_cache()
-
-    def _load_cache(self):
-        """Load cache from disk"""
-        cache_file = os.path.join(self.cache_dir, "response_cache.json")
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r') as f:
-                    cached_data = json.load(f)
-                    # Convert string timestamps back to datetime
-                    for key, value in cached_data.items():
-                        value['timestamp'] = datetime.fromisoformat(value['timestamp'])
-                    self.cache = cached_data
-            except Exception as e:
-                print(f"Error loading cache: {e}")
-                self.cache = {}
-
-    def _save_cache(self):
-        """Save cache to disk"""
-        cache_file = os.path.join(self.cache_dir, "response_cache.json")
-        try:
-            # Convert datetime to string for JSON serialization
-            cache_to_save = {}
-            for key, value in self.cache.items():
-                cache_to_save[key] = {
-                    **value,
-                    'timestamp': value['timestamp'].isoformat()
-                }
-            with open(cache_file, 'w') as f:
-                json.dump(cache_to_save, f, indent=2)
-        except Exception as e:
-            print(f"Error saving cache: {e}")
+        json_path = os.path.join(self.cache_dir, "response_cache.json")
+        if self.backend == "json":
+            self.store = JsonCacheStore(json_path)
+        elif self.backend == "sqlite":
+            # An existing JSON cache is imported on first open
+            self.store = SqliteCacheStore(
+                os.path.join(self.cache_dir, "response_cache.sqlite3"),
+                legacy_json_path=json_path
+            )
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {self.backend}")
+
+        # Memory-mapped, so opening it is instant however many entries it holds
+        path = snapshot_path(self.cache_dir)
+        self.snapshot = CacheSnapshot(path) if os.path.exists(path) else None
+
+        self.writer = WriteBehindWriter(self.store)
+        # Expired entries are deleted in the background rather than on the request path
+        self.compactor = CacheCompactor(
+            self.store,
+            default_ttl=self.cache_duration.total_seconds(),
+            interval=float(os.getenv("CACHE_COMPACTION_INTERVAL", "300")),
+            grace=self.stale_grace.total_seconds()
+        ).start()
+        # Pending writes would otherwise be lost with the daemon writer thread
+        atexit.register(self.close)
+        self._closed = False
+
+    def _lookup(self, key: str, now: float) -> Optional[Tuple[str, float, str]]:
+        """Get (response, expires_at, tier) for an entry that is fresh or within the stale grace period"""
+        grace = self.stale_grace.total_seconds()
+        cached = self.memory.get(key, now, grace)
+        if cached is not None:
+            return cached[0], cached[1], "memory"
+
+        # An entry evicted from memory may still be waiting for the writer
+        entry, tier = self.writer.get_pending(key) or self.store.get(key), "store"
+        snapshot = self._current_snapshot() if entry is None else None
+        if snapshot is not None:
+            entry, tier = snapshot.get(key), "snapshot"
+        if entry is not None:
+            expires_at = entry_expires_at(entry, self.cache_duration.total_seconds())
+            if now < expires_at + grace:
+                self.memory.put(key, entry[0], entry[1], expires_at)
+                return entry[0], expires_at, tier
+        return None
+
+    def _current_snapshot(self) -> Optional[CacheSnapshot]:
+        """The snapshot to consult: dropped once its file is deleted (by clear() in any process), reopened once rebuilt"""
+        if self.snapshot is not None and not self.snapshot.is_current():
+            self.snapshot.close()
+            path = snapshot_path(self.cache_dir)
+            self.snapshot = CacheSnapshot(path) if os.path.exists(path) else None
+        return self.snapshot
 
     def get(self, key: str) -> str | None:
         """Get cached response if valid"""
-        if key in self.cache:
-            entry = self.cache[key]
-            if datetime.now() - entry['timestamp'] < self.cache_duration:
-                return entry['response']
+        now = time.time()
+        cached = self._lookup(key, now)
+        if cached is not None and now < cached[1]:
+            self.lookups.inc(result="hit", tier=cached[2])
+            return cached[0]
+        self.lookups.inc(result="miss")
         return None
 
-    def set(self, key: str, response: str):
-        """Cache a response"""
-        self.cache[key] = {
-            'response': response,
-            'timestamp': datetime.now()
-        }
-        self._save_cache()
+    async def get_or_refresh(self, key: str, fetch: Callable[[], Awaitable[str]], ttl: Optional[float] = None) -> str:
+        """Get a cached response, calling `fetch` to produce it on a miss (stale-while-revalidate)
+
+        A fresh entry is returned as is. An entry within the stale grace period
+        is returned immediately and refreshed in the background. Otherwise the
+        caller waits for `fetch`. Concurrent fetches of one key share a call.
+        """
+        now = time.time()
+        cached = self._lookup(key, now)
+        if cached is not None:
+            response, expires_at, tier = cached
+            if now < expires_at:
+                self.lookups.inc(result="hit", tier=tier)
+            else:
+                self.lookups.inc(result="stale", tier=tier)
+                self._refresh(key, fetch, ttl)
+            return response
+        self.lookups.inc(result="miss")
+        return await asyncio.shield(self._refresh(key, fetch, ttl))
+
+    def _refresh(self, key: str, fetch: Callable[[], Awaitable[str]], ttl: Optional[float]) -> asyncio.Future:
+        """Start fetching a fresh response for a key, or join the fetch already running"""
+        refresh = self._refreshes.get(key)
+        if refresh is None:
+            refresh = asyncio.ensure_future(self._run_refresh(key, fetch, ttl))
+            self._refreshes[key] = refresh
+            refresh.add_done_callback(lambda done: self._refresh_done(key, done))
+        return refresh
+
+    def _refresh_done(self, key: str, refresh: asyncio.Future):
+        self._refreshes.pop(key, None)
+        # A failed background refresh has no one awaiting it; the stale entry stays until the next try
+        if not refresh.cancelled():
+            refresh.exception()
+
+    async def _run_refresh(self, key: str, fetch: Callable[[], Awaitable[str]], ttl: Optional[float]) -> str:
+        try:
+            response = await fetch()
+        except Exception as e:
+            self.logger.warning(f"Error refreshing cached response: {e}")
+            raise
+        self.set(key, response, ttl)
+        return response
+
+    def set(self, key: str, response: str, ttl: Optional[float] = None):
+        """Cache a response, for `ttl` seconds or CACHE_EXPIRY by default"""
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.cache_duration.total_seconds())
+        self.memory.put(key, response, now, expires_at)
+        if not self.writer.submit(key, (response, now, expires_at)):
+            self.dropped_writes.inc()
+            self.logger.warning("Response cache write-behind queue is full; entry kept in memory only")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every cached response has been persisted"""
+        return self.writer.flush(timeout)
 
     def clear(self):
-        """Clear the cache"""
-        self.cache = {}
-        self._save_cache() 
\ No newline at end of file
+        """Clear the cache, deleting the snapshot too so no cleared entry is served from it"""
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+        path = snapshot_path(self.cache_dir)
+        if os.path.exists(path):
+            os.remove(path)
+        self.memory.clear()
+        self.writer.discard_pending()
+        self.writer.flush()
+        self.store.clear()
+
+    def close(self):
+        """Persist pending writes, stop background compaction and release the storage backend"""
+        if self._closed:
+            return
+        self._closed = True
+        self.writer.close()
+        # Joins the compaction thread, so it is not left using a closed store
+        self.compactor.stop()
+        self.store.close()
+        if self.snapshot is not None:
+            self.snapshot.close()
+
+_default_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache, shared by every session"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
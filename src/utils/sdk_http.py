@@ -0,0 +1,7 @@
+import importlib
+import anthropic
+
+# The HTTP library the installed anthropic SDK is built on: httpx in older
+# releases, httpx2 in newer ones. Limits, timeouts and transports handed to the
+# SDK must be this library's types; the SDK rejects the other library's objects.
+http = importlib.import_module(type(anthropic.DEFAULT_CONNECTION_LIMITS).__module__.partition(".")[0])
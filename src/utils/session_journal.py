@@ -0,0 +1,52 @@
+from typing import Dict, List, Any, Optional
+from datetime import datetime
+import json
+import logging
+import os
+import threading
+
+class SessionJournal:
+    """Append-only JSON-lines record of a session's answers and completed steps, for crash recovery
+
+    Every entry is flushed and fsynced before append() returns, so a crash
+    loses at most the step that was running.
+    """
+
+    def __init__(self, session_id: str, journal_dir: Optional[str] = None):
+        self.session_id = session_id
+        self.journal_dir = journal_dir or os.getenv("SESSION_JOURNAL_DIR", "sessions")
+        self.path = os.path.join(self.journal_dir, f"{session_id}.jsonl")
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def append(self, event: str, **data: Any) -> Dict[str, Any]:
+        """Durably record one event"""
+        entry = {"timestamp": datetime.now().isoformat(), "event": event, **data}
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            if not os.path.exists(self.journal_dir):
+                os.makedirs(self.journal_dir)
+            with open(self.path, "a") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        return entry
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Load every recorded event, ignoring a last line torn by a crash"""
+        entries = []
+        if not self.exists():
+            return entries
+        with open(self.path, "r") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    self.logger.warning(f"Ignoring unreadable line {line_number} of {self.path}")
+        return entries
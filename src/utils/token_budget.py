@@ -0,0 +1,212 @@
+from typing import Dict, List, Any, Optional
+import json
+import math
+import os
+import threading
+
+class TokenBudgetExceededError(Exception):
+    """Raised when a request cannot be made to fit the token budget"""
+    pass
+
+class TokenEstimator:
+    """Fast local token estimate, calibrated against the usage the API reports"""
+
+    def __init__(self, chars_per_token: float = 3.5, smoothing: float = 0.2):
+        self.chars_per_token = chars_per_token
+        self.smoothing = smoothing
+        self.message_overhead = 4
+        self.samples = 0
+
+    def estimate(self, text: str) -> int:
+        """Estimate the number of tokens in a piece of text"""
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def estimate_messages(self, messages: List[Dict[str, Any]], system: Any = None) -> int:
+        """Estimate the input tokens of a Messages API request"""
+        chars = self.estimate_chars(messages, system)
+        return math.ceil(chars / self.chars_per_token) + self.message_overhead * len(messages)
+
+    def estimate_chars(self, messages: List[Dict[str, Any]], system: Any = None) -> int:
+        """Count the prompt characters in a Messages API request"""
+        return sum(len(_content_text(m.get("content", ""))) for m in messages) + len(_content_text(system or ""))
+
+    def calibrate(self, prompt_chars: int, actual_tokens: int, message_count: int = 1):
+        """Move the chars-per-token ratio towards the ratio observed in a real response"""
+        text_tokens = actual_tokens - self.message_overhead * message_count
+        if prompt_chars <= 0 or text_tokens <= 0:
+            return
+        # Clamp so one odd response cannot throw the estimate far off
+        observed = min(max(prompt_chars / text_tokens, 1.5), 8.0)
+        self.chars_per_token += self.smoothing * (observed - self.chars_per_token)
+        self.samples += 1
+
+class BudgetReservation:
+    """Tokens held against a session's budget for one call in flight
+
+    Settled with the tokens the call actually used, or released if it failed;
+    leaving the `with` block releases a reservation that was never settled.
+    """
+
+    def __init__(self, budget: "TokenBudget", session: Optional[str], tokens: int):
+        self.budget = budget
+        self.session = session
+        self.tokens = tokens
+        self.open = True
+
+    def settle(self, used: int):
+        """Replace the reservation with the tokens the call used"""
+        if self.open:
+            self.open = False
+            self.budget._settle(self.session, self.tokens, used)
+
+    def release(self):
+        """Drop the reservation of a call that used nothing"""
+        self.settle(0)
+
+    def __enter__(self) -> "BudgetReservation":
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        self.release()
+
+class TokenBudget:
+    """Per-session and per-call token limits, enforced before a request is sent"""
+
+    def __init__(self, session_limit: Optional[int] = None, call_limit: Optional[int] = None):
+        # A limit of 0 disables that check
+        self.session_limit = session_limit if session_limit is not None else int(os.getenv("SESSION_TOKEN_BUDGET", "250000"))
+        self.call_limit = call_limit if call_limit is not None else int(os.getenv("CALL_TOKEN_BUDGET", "20000"))
+        self.session_usage: Dict[str, int] = {}
+        # Worst-case size of calls checked but not finished yet, so concurrent calls cannot overrun together
+        self.session_reserved: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def available_input(self, session: Optional[str], max_tokens: int) -> Optional[int]:
+        """Input tokens still available to the next call, or None if unlimited"""
+        limits = []
+        if self.call_limit:
+            limits.append(self.call_limit)
+        if self.session_limit and session:
+            limits.append(
+                self.session_limit - self.session_usage.get(session, 0) - self.session_reserved.get(session, 0) - max_tokens
+            )
+        return min(limits) if limits else None
+
+    def check(self, session: Optional[str], estimated_input: int, max_tokens: int):
+        """Raise if a call of this size would exceed the per-call or per-session budget"""
+        available = self.available_input(session, max_tokens)
+        if available is not None and estimated_input > available:
+            raise TokenBudgetExceededError(
+                f"Request needs ~{estimated_input} input tokens but only {max(available, 0)} "
+                f"are available (session={session})"
+            )
+
+    def reserve(self, session: Optional[str], estimated_input: int, max_tokens: int) -> BudgetReservation:
+        """Check a call against the budget and hold its worst-case size until it is settled"""
+        with self._lock:
+            self.check(session, estimated_input, max_tokens)
+            tokens = estimated_input + max_tokens if session else 0
+            if tokens:
+                self.session_reserved[session] = self.session_reserved.get(session, 0) + tokens
+        return BudgetReservation(self, session, tokens)
+
+    def _settle(self, session: Optional[str], reserved: int, used: int):
+        if not session:
+            return
+        with self._lock:
+            remaining = self.session_reserved.get(session, 0) - reserved
+            if remaining > 0:
+                self.session_reserved[session] = remaining
+            else:
+                self.session_reserved.pop(session, None)
+            if used:
+                self.session_usage[session] = self.session_usage.get(session, 0) + used
+
+    def charge(self, session: Optional[str], tokens: int):
+        """Charge tokens spent by a completed call to its session"""
+        if not session:
+            return
+        with self._lock:
+            self.session_usage[session] = self.session_usage.get(session, 0) + tokens
+
+    def reset_session(self, session: str):
+        """Forget the usage recorded for a session"""
+        with self._lock:
+            self.session_usage.pop(session, None)
+            self.session_reserved.pop(session, None)
+
+def context_field(name: str, value: Any, priority: int) -> Dict[str, Any]:
+    """Describe a prompt context field; higher priority fields are trimmed last"""
+    return {"name": name, "value": value, "priority": priority}
+
+def serialize_field(value: Any) -> str:
+    """Serialize a context value compactly"""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+TRUNCATED_SUFFIX = " ...[truncated]"
+OMITTED_PLACEHOLDER = "[omitted to fit token budget]"
+
+def trim_context(fields: List[Dict[str, Any]], budget_tokens: Optional[int],
+                 estimator: TokenEstimator, min_field_tokens: int = 50) -> Dict[str, str]:
+    """Serialize context fields and shorten or drop the lowest-priority ones until they fit
+
+    Fields are visited from lowest to highest priority, largest first within a
+    priority, so the result only depends on the input. A field is shortened if
+    enough of it would survive to be useful, otherwise it is dropped.
+    """
+    serialized = {field["name"]: serialize_field(field["value"]) for field in fields}
+    if budget_tokens is None:
+        return serialized
+
+    sizes = {name: estimator.estimate(text) for name, text in serialized.items()}
+    total = sum(sizes.values())
+    trim_order = sorted(fields, key=lambda f: (f["priority"], -sizes[f["name"]], f["name"]))
+
+    for field in trim_order:
+        overage = total - budget_tokens
+        if overage <= 0:
+            break
+        name = field["name"]
+        # The suffix marking the cut counts against the budget too
+        keep_tokens = sizes[name] - overage - estimator.estimate(TRUNCATED_SUFFIX)
+        if keep_tokens >= min_field_tokens:
+            keep_chars = int(keep_tokens * estimator.chars_per_token)
+            serialized[name] = serialized[name][:keep_chars] + TRUNCATED_SUFFIX
+        else:
+            serialized[name] = OMITTED_PLACEHOLDER
+        new_size = estimator.estimate(serialized[name])
+        total -= sizes[name] - new_size
+        sizes[name] = new_size
+
+    if total > budget_tokens:
+        raise TokenBudgetExceededError(
+            f"Context needs ~{total} tokens after trimming; budget is {budget_tokens}"
+        )
+    return serialized
+
+def _content_text(content: Any) -> str:
+    """Flatten a message content string or list of content blocks to text"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return str(content)
+
+_default_estimator: Optional[TokenEstimator] = None
+_default_budget: Optional[TokenBudget] = None
+
+def get_token_estimator() -> TokenEstimator:
+    """Get the process-wide token estimator"""
+    global _default_estimator
+    if _default_estimator is None:
+        _default_estimator = TokenEstimator()
+    return _default_estimator
+
+def get_token_budget() -> TokenBudget:
+    """Get the process-wide token budget"""
+    global _default_budget
+    if _default_budget is None:
+        _default_budget = TokenBudget()
+    return _default_budget
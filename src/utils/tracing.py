@@ -0,0 +1,135 @@
+from typing import Dict, List, Any, Optional, Iterator, Callable
+from collections import deque
+from contextlib import contextmanager
+import asyncio
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+from src.utils.usage_ledger import get_usage_tags
+
+class Tracer:
+    """Collects nested timing spans as Chrome trace events (viewable in Perfetto or chrome://tracing)
+
+    Each asyncio task gets its own track, so spans of principals running
+    concurrently appear side by side instead of overlapping on one row.
+    Events are kept per session (the usage_context session tag) until that
+    session's trace is exported; events outside any session are capped.
+    """
+
+    def __init__(self, enabled: bool = True, max_unscoped_events: int = 10000):
+        self.enabled = enabled
+        self.events: Dict[Optional[str], Any] = {None: deque(maxlen=max_unscoped_events)}
+        # Keyed by the task or thread itself: ids are reused once an object is freed
+        self._tracks: "weakref.WeakKeyDictionary[Any, int]" = weakref.WeakKeyDictionary()
+        self._track_ids = itertools.count(1)
+        self._named: Dict[Optional[str], set] = {}
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _track(self, session: Optional[str]) -> int:
+        """Track id for the running asyncio task (or thread outside the event loop)"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        owner = task if task is not None else threading.current_thread()
+        with self._lock:
+            track = self._tracks.get(owner)
+            if track is None:
+                track = next(self._track_ids)
+                self._tracks[owner] = track
+            # Each session's trace names the tracks it uses
+            named = self._named.setdefault(session, set())
+            if track not in named:
+                named.add(track)
+                name = task.get_name() if task is not None else owner.name
+                self._session_events(session).append({
+                    "name": "thread_name", "ph": "M", "pid": self._pid, "tid": track, "args": {"name": name}
+                })
+            return track
+
+    def _session_events(self, session: Optional[str]) -> Any:
+        events = self.events.get(session)
+        if events is None:
+            events = self.events[session] = []
+        return events
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1_000_000
+
+    @contextmanager
+    def span(self, name: str, category: str = "app", **args: Any) -> Iterator[Dict[str, Any]]:
+        """Time a block as one span; the yielded dict can be updated with extra args"""
+        if not self.enabled:
+            yield args
+            return
+        session = get_usage_tags().get("session")
+        track = self._track(session)
+        started = self._now_us()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round(started, 1),
+                "dur": round(self._now_us() - started, 1),
+                "pid": self._pid,
+                "tid": track,
+                "args": {key: value for key, value in args.items() if value is not None}
+            }
+            with self._lock:
+                self._session_events(session).append(event)
+
+    def export(self, path: str, session: Optional[str] = None):
+        """Write a session's spans as Chrome trace-event JSON and stop holding them"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._lock:
+            if session is None:
+                events = list(self.events[None])
+            else:
+                events = self.events.pop(session, [])
+                self._named.pop(session, None)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+def traced(name: Optional[str] = None, category: str = "app") -> Callable:
+    """Wrap an async function in a span named after it"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with get_tracer().span(span_name, category):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+_default_tracer: Optional[Tracer] = None
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer; spans are only collected when TRACE_DIR is set"""
+    global _default_tracer
+    if _default_tracer is None:
+        _default_tracer = Tracer(enabled=bool(os.getenv("TRACE_DIR")))
+    return _default_tracer
+
+def export_session_trace(session_id: str) -> Optional[str]:
+    """Write the trace for a session to TRACE_DIR, returning its path"""
+    tracer = get_tracer()
+    if not tracer.enabled:
+        return None
+    path = os.path.join(os.getenv("TRACE_DIR", "traces"), f"{session_id}.trace.json")
+    tracer.export(path, session_id)
+    return path
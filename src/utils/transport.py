@@ -0,0 +1,199 @@
+from typing import Dict, List, Any, Optional, AsyncIterator
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from src.utils.sdk_http import http
+
+# Response headers that describe the original wire encoding and must not be replayed
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# The Messages API request fields that decide the response; anything else in the body is left out of the key
+MESSAGE_KEY_FIELDS = (
+    "model", "system", "messages", "max_tokens", "stop_sequences", "stream",
+    "temperature", "top_p", "top_k", "tools", "tool_choice"
+)
+
+def transport_request_key(request: http.Request) -> str:
+    """Hash a request's method, path and JSON body into a key that is the same on every run
+
+    A Messages API call is keyed on the fields in MESSAGE_KEY_FIELDS only, so
+    per-run extras such as `metadata` cannot make a replayed request miss.
+    """
+    try:
+        body: Any = json.loads(request.content or b"null")
+    except ValueError:
+        body = request.content.decode("utf-8", errors="replace")
+    if isinstance(body, dict) and request.url.path.endswith("/v1/messages"):
+        body = {field: body[field] for field in MESSAGE_KEY_FIELDS if field in body}
+    canonical = json.dumps(
+        {"method": request.method, "path": request.url.path, "body": body},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class RecordingStore:
+    """JSON-lines file of recorded responses, grouped by request key"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict[str, Any]):
+        """Append one recorded response"""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+    def load(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Load recorded responses, in recording order for each request key"""
+        recordings: Dict[str, List[Dict[str, Any]]] = {}
+        if not os.path.exists(self.path):
+            return recordings
+        with open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    recordings.setdefault(entry["key"], []).append(entry)
+        return recordings
+
+class _RecordingStream(http.AsyncByteStream):
+    """Passes response bytes through unchanged and records them with their arrival times"""
+
+    def __init__(self, stream: http.AsyncByteStream, on_complete):
+        self.stream = stream
+        self.on_complete = on_complete
+        self.started = time.perf_counter()
+        self.chunks: List[List[Any]] = []
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            offset = round(time.perf_counter() - self.started, 4)
+            self.chunks.append([offset, chunk.decode("utf-8", errors="surrogateescape")])
+            yield chunk
+        self.on_complete(self.chunks)
+
+    async def aclose(self):
+        await self.stream.aclose()
+
+class RecordingTransport(http.AsyncBaseTransport):
+    """Sends requests through a real transport and records each response to a RecordingStore"""
+
+    def __init__(self, store: RecordingStore, transport: Optional[http.AsyncBaseTransport] = None,
+                 limits: Optional[http.Limits] = None):
+        self.logger = logging.getLogger(__name__)
+        self.store = store
+        self.transport = transport or http.AsyncHTTPTransport(limits=limits or http.Limits())
+
+    async def handle_async_request(self, request: http.Request) -> http.Response:
+        # Record readable bodies rather than compressed bytes
+        request.headers["Accept-Encoding"] = "identity"
+        key = transport_request_key(request)
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        first_byte_latency = time.perf_counter() - started
+
+        def on_complete(chunks: List[List[Any]]):
+            self.store.append({
+                "key": key,
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": response.status_code,
+                "headers": [[k, v] for k, v in response.headers.multi_items() if k.lower() not in _HOP_HEADERS],
+                "first_byte_latency": round(first_byte_latency, 4),
+                "latency": round(time.perf_counter() - started, 4),
+                "chunks": chunks
+            })
+            self.logger.debug(f"Recorded {request.method} {request.url.path} response {key[:12]}")
+
+        return http.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, on_complete),
+            extensions=response.extensions
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+class _ReplayStream(http.AsyncByteStream):
+    """Yields recorded chunks, optionally at their recorded arrival times"""
+
+    def __init__(self, chunks: List[List[Any]], realtime: bool):
+        self.chunks = chunks
+        self.realtime = realtime
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        previous = self.chunks[0][0] if self.chunks else 0.0
+        for offset, text in self.chunks:
+            if self.realtime and offset > previous:
+                await asyncio.sleep(offset - previous)
+            previous = offset
+            yield text.encode("utf-8", errors="surrogateescape")
+
+class ReplayTransport(http.AsyncBaseTransport):
+    """Serves recorded responses by request key without touching the network
+
+    Repeated identical requests get the recorded responses in order; once they
+    run out, the last one is served again. With `realtime`, the recorded
+    latency (first byte and per-chunk timing) is reproduced.
+    """
+
+    def __init__(self, store: RecordingStore, realtime: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.recordings = store.load()
+        self.realtime = realtime
+        self._served: Dict[str, int] = {}
+
+    async def handle_async_request(self, request: http.Request) -> http.Response:
+        key = transport_request_key(request)
+        entries = self.recordings.get(key)
+        if not entries:
+            self.logger.error(f"No recorded response for {request.method} {request.url.path} {key[:12]}")
+            # A 400 is not retried, so a missing recording fails fast
+            return http.Response(
+                status_code=400,
+                json={
+                    "type": "error",
+                    "error": {
+                        "type": "invalid_request_error",
+                        "message": f"No recorded response for request {key}"
+                    }
+                }
+            )
+
+        index = self._served.get(key, 0)
+        self._served[key] = index + 1
+        entry = entries[min(index, len(entries) - 1)]
+        if self.realtime:
+            await asyncio.sleep(entry.get("first_byte_latency", 0))
+        return http.Response(
+            status_code=entry["status_code"],
+            headers=entry["headers"],
+            stream=_ReplayStream(entry["chunks"], self.realtime)
+        )
+
+def transport_mode() -> str:
+    """The CLAUDE_TRANSPORT mode: live, record or replay"""
+    return os.getenv("CLAUDE_TRANSPORT", "live").lower()
+
+def build_transport(limits: http.Limits) -> Optional[http.AsyncBaseTransport]:
+    """Build the transport selected by CLAUDE_TRANSPORT (live, record or replay)"""
+    mode = transport_mode()
+    if mode == "live":
+        return None
+    store = RecordingStore(os.getenv("CLAUDE_RECORDING_PATH", "recordings/claude_recording.jsonl"))
+    if mode == "record":
+        return RecordingTransport(store, limits=limits)
+    if mode == "replay":
+        return ReplayTransport(store, realtime=os.getenv("CLAUDE_REPLAY_LATENCY", "false").lower() == "true")
+    raise ValueError(f"Unknown CLAUDE_TRANSPORT mode: {mode}")
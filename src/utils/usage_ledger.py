@@ -0,0 +1,254 @@
+from typing import Dict, List, Any, Optional, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+import argparse
+import json
+import os
+import threading
+
+# Price per million tokens, in USD
+MODEL_PRICING = {
+    "claude-3-5-sonnet-20241022": {
+        "input": 3.00,
+        "output": 15.00,
+        "cache_write": 3.75,
+        "cache_read": 0.30
+    },
+    "claude-3-5-haiku-20241022": {
+        "input": 0.80,
+        "output": 4.00,
+        "cache_write": 1.00,
+        "cache_read": 0.08
+    }
+}
+
+# Message Batches are billed at half the interactive price
+BATCH_DISCOUNT = 0.5
+
+SUMMARY_DIMENSIONS = ["session", "phase", "principal", "call_site", "model"]
+
+# Tags (session, phase, principal) applied to every call made in the current task
+_usage_tags: ContextVar[Dict[str, str]] = ContextVar("usage_tags", default={})
+
+@contextmanager
+def usage_context(**tags: Optional[str]) -> Iterator[Dict[str, str]]:
+    """Tag every Claude call made inside this block with the given session, phase or principal"""
+    merged = {**_usage_tags.get(), **{k: v for k, v in tags.items() if v is not None}}
+    token = _usage_tags.set(merged)
+    try:
+        yield merged
+    finally:
+        _usage_tags.reset(token)
+
+def get_usage_tags() -> Dict[str, str]:
+    """Get the usage tags active in the current task"""
+    return dict(_usage_tags.get())
+
+def estimate_cost(record: Dict[str, Any]) -> float:
+    """Estimate the USD cost of a single ledger record"""
+    # A coalesced call shared another call's response, which is already billed
+    if record.get("coalesced"):
+        return 0.0
+    pricing = MODEL_PRICING.get(record.get("model"))
+    if not pricing:
+        return 0.0
+    cost = (
+        record.get("input_tokens", 0) * pricing["input"]
+        + record.get("output_tokens", 0) * pricing["output"]
+        + record.get("cache_write_tokens", 0) * pricing["cache_write"]
+        + record.get("cache_read_tokens", 0) * pricing["cache_read"]
+    ) / 1_000_000
+    return cost * BATCH_DISCOUNT if record.get("batch") else cost
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_read_tokens": 0,
+        "cache_write_tokens": 0,
+        "cost_usd": 0.0
+    }
+
+class UsageLedger:
+    """Append-only JSON-lines record of token usage for every Claude call"""
+
+    def __init__(self, ledger_dir: str = "usage", filename: str = "usage_ledger.jsonl"):
+        self.ledger_dir = ledger_dir
+        self.path = os.path.join(ledger_dir, filename)
+        self._lock = threading.Lock()
+        # Running totals per session since this process started, so callers need not reread the file
+        self._session_totals: Dict[str, Dict[str, Any]] = {}
+        # Calls that raised instead of returning a response, per session
+        self._session_errors: Dict[str, int] = {}
+        if not os.path.exists(self.ledger_dir):
+            os.makedirs(self.ledger_dir)
+
+    def record(self, model: str, call_site: str, usage: Any, latency: float,
+               time_to_first_token: Optional[float] = None, batch: bool = False,
+               stop_reason: Optional[str] = None, continuation: int = 0,
+               coalesced: bool = False) -> Dict[str, Any]:
+        """Record the usage block of one API response"""
+        tags = get_usage_tags()
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "session": tags.get("session"),
+            "phase": tags.get("phase"),
+            "principal": tags.get("principal"),
+            "call_site": call_site,
+            "model": model,
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "latency": round(latency, 4),
+            "time_to_first_token": round(time_to_first_token, 4) if time_to_first_token is not None else None,
+            "batch": batch,
+            "stop_reason": stop_reason,
+            # 0 for the first response; n for the n-th continuation of a truncated one
+            "continuation": continuation,
+            # True when the caller shared an identical call already in flight
+            "coalesced": coalesced
+        }
+        entry["cost_usd"] = round(estimate_cost(entry), 6)
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+            if entry["session"]:
+                totals = self._session_totals.setdefault(entry["session"], _empty_totals())
+                totals["calls"] += 1
+                for field in ["input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens", "cost_usd"]:
+                    totals[field] += entry[field]
+        return entry
+
+    def record_error(self):
+        """Count a failed call against the current session; failures have no usage to record"""
+        session = get_usage_tags().get("session")
+        if session:
+            with self._lock:
+                self._session_errors[session] = self._session_errors.get(session, 0) + 1
+
+    def session_totals(self, session: str) -> Dict[str, Any]:
+        """Calls, tokens and cost recorded for a session by this process"""
+        with self._lock:
+            totals = dict(self._session_totals.get(session) or _empty_totals())
+            totals["failed_calls"] = self._session_errors.get(session, 0)
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        return totals
+
+    def release_session(self, session: str):
+        """Forget a finished session's running totals; its records stay in the ledger file"""
+        with self._lock:
+            self._session_totals.pop(session, None)
+            self._session_errors.pop(session, None)
+
+    def load_records(self) -> List[Dict[str, Any]]:
+        """Load every record in the ledger"""
+        records = []
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+        return records
+
+    def load_recent_records(self, max_bytes: int) -> List[Dict[str, Any]]:
+        """Load the records in the last `max_bytes` of the ledger, so the cost stays flat as it grows"""
+        records = []
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            start = max(0, f.tell() - max_bytes)
+            if start:
+                # Skip the partial line the window starts in; from the byte before, a window
+                # starting right after a newline only skips that newline
+                f.seek(start - 1)
+                f.readline()
+            else:
+                f.seek(0)
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        return records
+
+def summarize(records: List[Dict[str, Any]], by: str) -> Dict[str, Dict[str, Any]]:
+    """Aggregate ledger records by session, phase, principal, call site or model"""
+    summary: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        group = record.get(by) or "unknown"
+        totals = summary.setdefault(group, {
+            "calls": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_tokens": 0,
+            "cache_write_tokens": 0,
+            "latency": 0.0,
+            "cost_usd": 0.0
+        })
+        totals["calls"] += 1
+        for field in ["input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens"]:
+            totals[field] += record.get(field, 0)
+        totals["latency"] += record.get("latency", 0.0)
+        totals["cost_usd"] += record.get("cost_usd", estimate_cost(record))
+
+    for totals in summary.values():
+        totals["avg_latency"] = totals.pop("latency") / totals["calls"]
+    return dict(sorted(summary.items(), key=lambda item: item[1]["cost_usd"], reverse=True))
+
+def format_summary(summary: Dict[str, Dict[str, Any]], by: str) -> str:
+    """Format a summary as a plain-text table"""
+    header = f"{by:<40} {'calls':>6} {'input':>10} {'output':>10} {'cache_rd':>10} {'cache_wr':>10} {'avg_s':>7} {'cost_usd':>10}"
+    lines = [header, "-" * len(header)]
+    for group, totals in summary.items():
+        lines.append(
+            f"{str(group)[:40]:<40} {totals['calls']:>6} {totals['input_tokens']:>10} "
+            f"{totals['output_tokens']:>10} {totals['cache_read_tokens']:>10} "
+            f"{totals['cache_write_tokens']:>10} {totals['avg_latency']:>7.2f} {totals['cost_usd']:>10.4f}"
+        )
+    return "\n".join(lines)
+
+_default_ledger: Optional[UsageLedger] = None
+
+def get_usage_ledger() -> UsageLedger:
+    """Get the process-wide usage ledger"""
+    global _default_ledger
+    if _default_ledger is None:
+        _default_ledger = UsageLedger(os.getenv("USAGE_LEDGER_DIR", "usage"))
+    return _default_ledger
+
+def main():
+    """Summarize the usage ledger from the command line"""
+    parser = argparse.ArgumentParser(description="Summarize Claude token usage and cost")
+    parser.add_argument("--ledger-dir", default=os.getenv("USAGE_LEDGER_DIR", "usage"),
+                        help="Directory containing usage_ledger.jsonl")
+    parser.add_argument("--by", nargs="+", choices=SUMMARY_DIMENSIONS,
+                        default=["session", "phase", "call_site"],
+                        help="Dimensions to summarize by")
+    parser.add_argument("--session", help="Only include records from this session")
+    args = parser.parse_args()
+
+    records = UsageLedger(args.ledger_dir).load_records()
+    if args.session:
+        records = [r for r in records if r.get("session") == args.session]
+    if not records:
+        print("No usage records found.")
+        return
+
+    for dimension in args.by:
+        print(f"\n=== Usage by {dimension} ===")
+        print(format_summary(summarize(records, dimension), dimension))
+
+    total_cost = sum(r.get("cost_usd", estimate_cost(r)) for r in records)
+    print(f"\nTotal: {len(records)} calls, ${total_cost:.4f}")
+
+if __name__ == "__main__":
+    main()